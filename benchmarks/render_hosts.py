@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: template compilation and per-host render time
+
+Measures per host count:
+
+    - compiling all templates without cache (previous behaviour: a fresh
+      Environment per NginxManager / per Tab completion)
+    - loading all templates from the on-disk bytecode cache
+    - per-host time of render_files() in a loop vs. render_many()
+
+Nothing is written outside a temporary directory.
+
+Usage:
+    python benchmarks/render_hosts.py
+    python benchmarks/render_hosts.py --hosts 1000 10000 50000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nrp.config import TEMPLATE_DIR  # noqa: E402
+from nrp.core import templates  # noqa: E402
+from nrp.core.nginx import NginxManager  # noqa: E402
+
+TEMPLATE_NAMES = sorted(path.name for path in TEMPLATE_DIR.glob("*.j2"))
+
+
+def _load_all(cache_dir) -> float:
+    templates.environment.cache_clear()
+    started = time.perf_counter()
+    env = templates.environment(str(TEMPLATE_DIR), cache_dir)
+    for name in TEMPLATE_NAMES:
+        env.get_template(name)
+    return time.perf_counter() - started
+
+
+def _specs(count: int) -> list:
+    return [
+        {
+            "fqdn": f"host{index:05d}.bench.example.com",
+            "internal_ip": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+            "internal_port": 8080,
+            "websockets_enabled": index % 3 == 0,
+            "cache_profile": "small" if index % 5 == 0 else None,
+        }
+        for index in range(count)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, nargs="+", default=[1000, 10000], help="Anzahl Hosts pro Durchlauf")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="nrp-bench-") as cache_dir:
+        cold = _load_all(None)
+        _load_all(cache_dir)  # fill the bytecode cache
+        warm = _load_all(cache_dir)
+        print(f"{len(TEMPLATE_NAMES)} Templates kompilieren: {cold * 1000:.1f} ms, aus Bytecode-Cache: {warm * 1000:.1f} ms\n")
+
+        nginx = NginxManager()
+        nginx.conf_dir = Path(cache_dir) / "conf.d"
+        print(f"{'HOSTS':>8}{'render_files µs/Host':>24}{'render_many µs/Host':>24}")
+        for count in args.hosts:
+            specs = _specs(count)
+
+            started = time.perf_counter()
+            for spec in specs:
+                nginx.render_files(**spec)
+            single = (time.perf_counter() - started) / count
+
+            started = time.perf_counter()
+            nginx.render_many(specs)
+            batch = (time.perf_counter() - started) / count
+
+            print(f"{count:>8}{single * 1e6:>24.0f}{batch * 1e6:>24.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Benchmark: config load time and memory of ROUTING_MODE "files" vs. "map"
+
+Renders N synthetic proxy hosts in both modes into a temporary NGINX
+prefix (self-signed certificate per host, listeners moved to unprivileged
+ports) and measures per mode:
+
+    - rendered size and number of server blocks
+    - time of 'nginx -t'
+    - time until a single-process NGINX accepts connections, and its RSS
+
+Without an NGINX binary only the rendering figures are reported.
+
+Usage:
+    python benchmarks/routing_modes.py --hosts 2000
+    python benchmarks/routing_modes.py --hosts 5000 --nginx /usr/sbin/nginx
+"""
+import argparse
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nrp.core import nginx as nginx_module  # noqa: E402
+from nrp.core import routing, snippets, tls  # noqa: E402
+from nrp.core.nginx import NginxManager  # noqa: E402
+
+HTTP_PORT = 18080
+HTTPS_PORT = 18443
+
+NGINX_CONF = """\
+pid {prefix}/nginx.pid;
+error_log {prefix}/error.log;
+worker_processes 1;
+events {{
+    worker_connections 1024;
+}}
+http {{
+    access_log off;
+    client_body_temp_path {prefix}/tmp/body;
+    proxy_temp_path {prefix}/tmp/proxy;
+    fastcgi_temp_path {prefix}/tmp/fastcgi;
+    uwsgi_temp_path {prefix}/tmp/uwsgi;
+    scgi_temp_path {prefix}/tmp/scgi;
+    server_names_hash_bucket_size 128;
+    server_names_hash_max_size {hash_size};
+    include {prefix}/conf.d/*.conf;
+}}
+"""
+
+
+def _prepare_prefix(prefix: Path, fqdns: list) -> None:
+    """Certificates, TLS options and dhparam inside prefix, NRP paths pointed there."""
+    for name in ("conf.d", "upstreams", "live", "tmp"):
+        (prefix / name).mkdir(parents=True, exist_ok=True)
+    cert, key = prefix / "cert.pem", prefix / "key.pem"
+    subprocess.run([
+        "openssl", "req", "-x509", "-nodes", "-days", "1",
+        "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+        "-keyout", str(key), "-out", str(cert), "-subj", "/CN=nrp-benchmark",
+    ], check=True, capture_output=True)
+    subprocess.run([
+        "openssl", "genpkey", "-genparam", "-algorithm", "DH",
+        "-pkeyopt", "dh_param:ffdhe2048", "-out", str(prefix / "dhparam.pem"),
+    ], check=True, capture_output=True)
+    (prefix / "options-ssl.conf").write_text("ssl_protocols TLSv1.2 TLSv1.3;\n")
+    for fqdn in fqdns:
+        live = prefix / "live" / fqdn
+        live.mkdir()
+        (live / "fullchain.pem").symlink_to(cert)
+        (live / "privkey.pem").symlink_to(key)
+
+    nginx_module.LETSENCRYPT_LIVE_DIR = prefix / "live"
+    nginx_module.LETSENCRYPT_SSL_DHPARAM = prefix / "dhparam.pem"
+    tls.TLS_SNIPPET = prefix / "options-ssl.conf"
+
+
+def _unprivileged(content: str) -> str:
+    content = re.sub(r"listen 80\b", f"listen 127.0.0.1:{HTTP_PORT}", content)
+    return re.sub(r"listen 443\b", f"listen 127.0.0.1:{HTTPS_PORT}", content)
+
+
+def render_mode(prefix: Path, mode: str, fqdns: list) -> dict:
+    """Render all hosts of one mode into prefix/conf.d, return size figures."""
+    conf_dir = prefix / "conf.d"
+    shutil.rmtree(conf_dir)
+    conf_dir.mkdir()
+
+    manager = NginxManager()
+    manager.conf_dir = conf_dir
+    manager.upstream_dir = prefix / "upstreams"
+    manager.snippet_dir = prefix / "snippets"
+    manager.routing_mode = mode
+    manager.snippet_dir.mkdir(exist_ok=True)
+    for name in snippets.NAMES:
+        manager.snippet_path(name).write_text(manager.render_snippet(name))
+
+    started = time.perf_counter()
+    routed = {}
+    for index, fqdn in enumerate(fqdns):
+        files = manager.render_files(fqdn, f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}", 8080)
+        for path, content in files.items():
+            path.write_text(_unprivileged(content))
+        host = files[manager.config_path(fqdn)]
+        if routing.is_routed(host):
+            routed[fqdn] = nginx_module.parse_host_header(host)
+    routes = manager.render_routes(routed)
+    if routes:
+        manager.routes_conf.write_text(_unprivileged(routes))
+    redirects = manager.render_redirects(fqdns)
+    if redirects:
+        manager.redirect_conf.write_text(_unprivileged(redirects))
+    render_seconds = time.perf_counter() - started
+
+    contents = [path.read_text() for path in conf_dir.glob("*.conf")]
+    return {
+        "render_s": render_seconds,
+        "bytes": sum(len(content) for content in contents),
+        "server_blocks": sum(len(re.findall(r"^server \{", content, re.MULTILINE)) for content in contents),
+    }
+
+
+def measure_nginx(nginx: str, prefix: Path) -> dict:
+    """Time 'nginx -t' and the startup of a single-process NGINX, read its RSS."""
+    conf = str(prefix / "nginx.conf")
+    started = time.perf_counter()
+    test = subprocess.run([nginx, "-t", "-q", "-p", str(prefix), "-c", conf], capture_output=True, text=True)
+    test_seconds = time.perf_counter() - started
+    if test.returncode != 0:
+        raise RuntimeError(test.stderr.strip())
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [nginx, "-p", str(prefix), "-c", conf, "-g", "daemon off; master_process off;"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", HTTPS_PORT), timeout=0.1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.perf_counter() - started > 300:
+                    raise RuntimeError(f"NGINX nicht gestartet, siehe {prefix / 'error.log'}")
+                time.sleep(0.02)
+        start_seconds = time.perf_counter() - started
+        status = Path(f"/proc/{process.pid}/status").read_text()
+        rss_kb = int(re.search(r"^VmRSS:\s+(\d+) kB", status, re.MULTILINE).group(1))
+    finally:
+        process.terminate()
+        process.wait()
+    return {"test_s": test_seconds, "start_s": start_seconds, "rss_mb": rss_kb / 1024}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, default=1000, help="Anzahl synthetischer Hosts")
+    parser.add_argument("--nginx", default="nginx", help="NGINX-Binary")
+    args = parser.parse_args()
+
+    fqdns = [f"host{index:05d}.bench.example.com" for index in range(args.hosts)]
+    nginx = shutil.which(args.nginx)
+    with tempfile.TemporaryDirectory(prefix="nrp-bench-") as tmp:
+        prefix = Path(tmp)
+        _prepare_prefix(prefix, fqdns)
+        hash_size = 1 << max(9, (2 * args.hosts - 1).bit_length())
+        (prefix / "nginx.conf").write_text(NGINX_CONF.format(prefix=prefix, hash_size=hash_size))
+
+        print(f"{args.hosts} Hosts, NGINX: {nginx or 'nicht gefunden (nur Rendering)'}\n")
+        print(f"{'MODUS':<8}{'SERVER':>8}{'KB':>10}{'RENDER s':>10}{'TEST s':>10}{'START s':>10}{'RSS MB':>10}")
+        for mode in ("files", "map"):
+            figures = render_mode(prefix, mode, fqdns)
+            if nginx:
+                figures.update(measure_nginx(nginx, prefix))
+            print(
+                f"{mode:<8}{figures['server_blocks']:>8}{figures['bytes'] // 1024:>10}{figures['render_s']:>10.2f}"
+                + "".join(
+                    f"{figures[key]:>10.2f}" if key in figures else f"{'-':>10}"
+                    for key in ("test_s", "start_s", "rss_mb")
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,18 @@ from nrp.commands import add, remove, list_cmd, setup, remote_setup, status, com
 from nrp.commands import site
 from nrp.commands import f2b
 from nrp.commands import waf
+from nrp.commands import apply
+from nrp.commands import backend
+from nrp.commands import cache
+from nrp.commands import tls
+from nrp.commands import profile
+from nrp.commands import static
+from nrp.commands import limits
+from nrp.commands import tune
+from nrp.commands import routing
+from nrp.commands import registry
+from nrp.commands import migrate
+from nrp.commands import cert
 
 cli.add_command(add.add)
 cli.add_command(remove.remove)
@@ -35,6 +47,18 @@ cli.add_command(completion.completion)
 cli.add_command(site.site)
 cli.add_command(f2b.f2b)
 cli.add_command(waf.waf)
+cli.add_command(apply.apply)
+cli.add_command(backend.backend)
+cli.add_command(cache.cache)
+cli.add_command(tls.tls)
+cli.add_command(profile.profile)
+cli.add_command(static.static)
+cli.add_command(limits.limits)
+cli.add_command(tune.tune)
+cli.add_command(routing.routing)
+cli.add_command(registry.registry)
+cli.add_command(migrate.migrate)
+cli.add_command(cert.cert)
 
 
 if __name__ == '__main__':
@@ -14,7 +14,24 @@ from nrp.core.validation import (
 )
 from nrp.core.nginx import NginxManager
 from nrp.core.certbot import CertbotManager
-from nrp.config import NGINX_CONF_DIR
+from nrp.core import certqueue
+from nrp.core import upstream as upstream_core
+from nrp.core.cache import CACHE_PROFILES, MICROCACHE_MAX_SECONDS
+from nrp.core.tls import KEY_TYPES
+from nrp.core.compression import COMPRESSION_PROFILES, is_brotli_available
+from nrp.core import traffic as traffic_core
+from nrp.core.traffic import TRAFFIC_PROFILES
+from nrp.core import static as static_core
+from nrp.core import limits as limits_core
+from nrp.config import (
+    NGINX_CONF_DIR,
+    DEFAULT_UPSTREAM_KEEPALIVE,
+    DEFAULT_LB_METHOD,
+    DEFAULT_BACKEND_MAX_FAILS,
+    DEFAULT_BACKEND_FAIL_TIMEOUT,
+    DEFAULT_HTTP3,
+    DEFAULT_KEY_TYPE
+)
 
 
 @click.command()
@@ -29,7 +46,28 @@ from nrp.config import NGINX_CONF_DIR
 @click.option('--overwrite', '-o', is_flag=True, help='Bestehende Konfiguration überschreiben')
 @click.option('--full-interactive', '-f', is_flag=True, help='Alle Optionen interaktiv abfragen')
 @click.option('--site', 'site_name', default=None, help='WireGuard-Site-Name (Tunnel-Upstream)')
-def add(fqdn, internal_ip, internal_port, external_port, protocol, websockets, waf, email, overwrite, full_interactive, site_name):
+@click.option('--keepalive', type=click.IntRange(min=0), default=DEFAULT_UPSTREAM_KEEPALIVE, show_default=True, help='Offene Keepalive-Verbindungen zum Backend pro Worker (0 = aus)')
+@click.option('--backend', '-b', 'backend_values', multiple=True, metavar='IP:PORT[:GEWICHT]', help='Backend-Server (mehrfach angebbar, ersetzt -i/-p)')
+@click.option('--lb-method', type=click.Choice(upstream_core.LB_METHODS), default=DEFAULT_LB_METHOD, show_default=True, help='Load-Balancing-Methode')
+@click.option('--hash-key', default=None, help='Schlüssel für --lb-method hash (Standard: $remote_addr)')
+@click.option('--max-fails', type=click.IntRange(min=0), default=DEFAULT_BACKEND_MAX_FAILS, show_default=True, help='Fehlversuche bis ein Backend als down gilt')
+@click.option('--fail-timeout', default=DEFAULT_BACKEND_FAIL_TIMEOUT, show_default=True, help='Zeitraum für max_fails und Pause eines ausgefallenen Backends')
+@click.option('--cache', 'cache_profile', type=click.Choice(list(CACHE_PROFILES)), default=None, help='Response-Cache mit Profil aktivieren (siehe: nrp cache profiles)')
+@click.option('--microcache', type=click.IntRange(1, MICROCACHE_MAX_SECONDS), default=None, metavar='SEKUNDEN',
+              help='Dynamische Antworten kurz cachen (z.B. 1-5 s); Anfragen mit Cookies/Authorization und POST gehen direkt zum Backend')
+@click.option('--http2/--no-http2', default=None, help='HTTP/2 aktivieren (Standard: DEFAULT_HTTP2 in config.py)')
+@click.option('--http3/--no-http3', default=None, help='HTTP/3 (QUIC) aktivieren (Standard: DEFAULT_HTTP3 in config.py)')
+@click.option('--key-type', type=click.Choice(KEY_TYPES), default=DEFAULT_KEY_TYPE, show_default=True, help='Schlüsseltyp des Zertifikats (ecdsa = P-256, günstigere Handshakes)')
+@click.option('--compression', type=click.Choice(list(COMPRESSION_PROFILES)), default=None, help='Kompression mit gzip (und brotli, falls das Modul installiert ist)')
+@click.option('--profile', 'traffic_profile', type=click.Choice(list(TRAFFIC_PROFILES)), default=None, help='Pufferung und Timeouts für streaming, api oder upload (siehe: nrp profile --help)')
+@click.option('--static', 'static_values', multiple=True, metavar='PRÄFIX[=VERZEICHNIS]', help='URL-Präfix direkt von Disk ausliefern, z.B. /assets/=/srv/app/dist (mehrfach angebbar)')
+@click.option('--rate-limit', 'rate_value', default=None, metavar='RATE[:BURST]', help='Anfragen pro Sekunde und Client, Überschuss bis BURST sofort bedient, danach 429')
+@click.option('--conn-limit', type=click.IntRange(min=1), default=None, metavar='N', help='Maximal N gleichzeitige Verbindungen pro Client')
+@click.option('--queue', 'queue_cert', is_flag=True, default=False, help='Zertifikat nicht sofort anfordern, sondern einreihen (aktivieren mit: nrp cert run)')
+def add(fqdn, internal_ip, internal_port, external_port, protocol, websockets, waf, email, overwrite, full_interactive, site_name, keepalive,
+        backend_values, lb_method, hash_key, max_fails, fail_timeout, cache_profile,
+        microcache, http2, http3, key_type, compression, traffic_profile, static_values,
+        rate_value, conn_limit, queue_cert):
     """
     Erstellt einen neuen Proxy-Host
 
@@ -44,6 +82,12 @@ def add(fqdn, internal_ip, internal_port, external_port, protocol, websockets, w
 
         nrp add app.example.com --site home -i 10.240.12.10 -p 3000
 
+        nrp add shop.example.com --site home -i 10.240.12.11 -p 80 --microcache 2
+
+        nrp add api.example.com -b 192.168.1.10:8080 -b 192.168.1.11:8080:2 --lb-method least_conn
+
+        nrp add bulk1.example.com -i 192.168.1.40 -p 80 --queue   (danach: nrp cert run)
+
         nrp add (interaktiv - nur Basis-Optionen)
 
         nrp add --full-interactive (interaktiv - alle Optionen)
@@ -71,8 +115,21 @@ def add(fqdn, internal_ip, internal_port, external_port, protocol, websockets, w
             if choice == 'n':
                 click.echo('Abgebrochen.')
                 return
-        # Remove old config
-        nginx.remove_config(fqdn)
+        # Old config stays live until it is atomically replaced below
+
+    # Backend pool: first backend doubles as internal_ip/internal_port
+    backends = None
+    if backend_values:
+        try:
+            backends = [
+                upstream_core.parse_backend(value, max_fails=max_fails, fail_timeout=fail_timeout)
+                for value in backend_values
+            ]
+        except ValueError as e:
+            click.echo(click.style(str(e), fg='red'))
+            return
+        internal_ip = backends[0]['address']
+        internal_port = backends[0]['port']
 
     # Get remaining parameters interactively if not provided
     if not internal_ip:
@@ -164,52 +221,125 @@ def add(fqdn, internal_ip, internal_port, external_port, protocol, websockets, w
             fg='yellow'
         ))
 
+    # HTTP/3 requires an NGINX built with the QUIC module
+    http3 = DEFAULT_HTTP3 if http3 is None else http3
+    if http3:
+        from nrp.core.protocols import nginx_build
+        build = nginx_build()
+        if build is not None and not build['http3']:
+            click.echo(click.style(
+                'Die installierte NGINX-Version unterstützt kein HTTP/3 (--with-http_v3_module fehlt). '
+                'Ohne --http3 erneut ausführen.',
+                fg='red'
+            ))
+            return
+
     # Validate external port if provided
     if external_port and not validate_port(external_port):
         click.echo(click.style(f'Ungültiger externer Port: {external_port}', fg='red'))
         return
 
-    click.echo(f'\nErstelle Proxy-Host für {fqdn}...')
-
-    # Step 1: Create temporary HTTP config
-    click.echo('Erstelle temporäre HTTP-Konfiguration...')
-    nginx.create_temp_config(fqdn, external_port)
-
-    if not nginx.reload():
-        click.echo(click.style('Fehler beim Neuladen der NGINX-Konfiguration', fg='red'))
+    if backends is None:
+        backends = [upstream_core.make_backend(
+            internal_ip, internal_port, max_fails=max_fails, fail_timeout=fail_timeout
+        )]
+    try:
+        upstream_core.make_spec(backends, lb_method, hash_key, keepalive)
+        traffic_core.check_compatible(traffic_profile, bool(cache_profile or microcache))
+        static_locations = dict(static_core.parse_static(value, fqdn) for value in static_values)
+        rate_limit, rate_burst = limits_core.parse_rate_limit(rate_value) if rate_value else (None, None)
+    except ValueError as e:
+        click.echo(click.style(str(e), fg='red'))
         return
 
-    # Step 2: Request SSL certificate
-    click.echo('Fordere SSL-Zertifikat an...')
-    if not certbot.request_certificate(fqdn, email):
-        click.echo(click.style('Fehler bei der Zertifikatsanforderung', fg='red'))
-        nginx.remove_config(fqdn)
-        nginx.reload()
-        return
+    click.echo(f'\nErstelle Proxy-Host für {fqdn}...')
 
-    # Step 3: Create final configuration
-    click.echo('Erstelle finale HTTPS-Konfiguration...')
-    nginx.create_config(
+    spec = dict(
         fqdn=fqdn,
         internal_ip=internal_ip,
         internal_port=internal_port,
         external_port=external_port,
         forward_scheme=protocol.lower(),
         websockets_enabled=websockets,
-        waf_enabled=waf
+        waf_enabled=waf,
+        backends=backends,
+        lb_method=lb_method,
+        hash_key=hash_key,
+        upstream_keepalive=keepalive,
+        cache_profile=cache_profile,
+        microcache=microcache,
+        http2=http2,
+        http3=http3,
+        compression=compression,
+        traffic_profile=traffic_profile,
+        static_locations=static_locations,
+        rate_limit=rate_limit,
+        rate_burst=rate_burst,
+        conn_limit=conn_limit,
+        site=site_name
     )
+    files = nginx.render_files(**spec)
 
-    # Step 4: Test and reload
-    if not nginx.test_config():
-        click.echo(click.style('NGINX-Konfiguration ist ungültig', fg='red'))
-        return
+    # Certificate first: the challenge is answered by the ACME location on port 80
+    # (catch-all.conf / nrp-redirect.conf), so issuing it needs no reload
+    if certbot.has_certificate(fqdn):
+        click.echo('Zertifikat vorhanden...')
+    else:
+        if not nginx.acme_ready():
+            click.echo(click.style(
+                f'Fehler: {nginx.catch_all_conf} beantwortet keine ACME-Challenges - '
+                'einmalig ausführen: sudo nrp migrate',
+                fg='red'
+            ))
+            return
 
-    if not nginx.reload():
-        click.echo(click.style('Fehler beim Neuladen der NGINX-Konfiguration', fg='red'))
+        if queue_cert:
+            certqueue.CertQueue().enqueue(fqdn, spec, email, key_type)
+            click.echo(click.style(f'\n✓ {fqdn} in die Zertifikats-Warteschlange eingereiht', fg='green'))
+            click.echo('Zertifikat anfordern und Host aktivieren mit: sudo nrp cert run')
+            return
+
+        # Step 1: Request SSL certificate
+        click.echo('Fordere SSL-Zertifikat an...')
+        if not certbot.request_certificate(fqdn, email, key_type):
+            click.echo(click.style('Fehler bei der Zertifikatsanforderung', fg='red'))
+            return
+
+    # Step 2: Create final configuration
+    click.echo('Erstelle finale HTTPS-Konfiguration...')
+    for directory in static_locations.values():
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+    # Step 3: Swap in atomically, test and reload once - rolled back on failure.
+    # Files identical to the live ones are skipped; without changes, no test and no reload.
+    with nginx.transaction() as tx:
+        for path, content in files.items():
+            tx.write(path, content)
+        if not tx.commit():
+            click.echo(click.style('NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen', fg='red'))
+            return
+    if not tx.targets:
+        click.echo(click.style(f'\n✓ Konfiguration für {fqdn} unverändert - kein Reload nötig', fg='green'))
         return
 
     click.echo(click.style(f'\n✓ Proxy-Host {fqdn} erfolgreich erstellt!', fg='green'))
     click.echo(f'\nKonfiguration: /etc/nginx/conf.d/{fqdn}.conf')
     click.echo(f'Zertifikat: /etc/letsencrypt/live/{fqdn}/')
+    if len(backends) > 1:
+        click.echo(f'Backends: {len(backends)} ({lb_method})')
+    if microcache:
+        click.echo(f'Cache: Microcache {microcache}s (nrp cache stats {fqdn})')
+    elif cache_profile:
+        click.echo(f'Cache: Profil {cache_profile} (nrp cache stats {fqdn})')
+    for prefix, directory in static_locations.items():
+        click.echo(f'Statisch: {prefix} → {directory} (nrp static sync {fqdn} <QUELLE> --prefix {prefix})')
+    if traffic_profile and traffic_profile != 'default':
+        click.echo(f'Traffic-Profil: {traffic_profile}')
+    if rate_limit:
+        click.echo(f'Rate-Limit: {rate_limit}/s pro Client (Burst {rate_burst})')
+    if conn_limit:
+        click.echo(f'Verbindungs-Limit: {conn_limit} pro Client')
+    if compression:
+        click.echo(f"Kompression: {compression} ({'gzip + brotli' if is_brotli_available() else 'gzip'})")
     if waf:
         click.echo(click.style('WAF: aktiv (Coraza + OWASP Core Rule Set)', fg='green'))
@@ -0,0 +1,159 @@
+"""
+Apply command - Declarative bulk configuration from a host manifest
+"""
+import sys
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.config import ACME_ENGINE, CERT_QUEUE_PATH, CERT_WORKERS
+from nrp.core.certbot import CertbotManager
+from nrp.core import acme, certqueue
+from nrp.core import manifest as manifest_core
+
+
+@click.command()
+@click.argument('manifest_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', '-n', is_flag=True, help='Nur Änderungen anzeigen, nichts schreiben')
+@click.option('--prune', is_flag=True, help='Hosts entfernen, die nicht im Manifest stehen')
+@click.option('--yes', '-y', is_flag=True, help='Ohne Bestätigungsfrage anwenden')
+@click.option('--acme-engine', type=click.Choice(['certbot', 'native']), default=ACME_ENGINE, show_default=True,
+              help='Engine für fehlende Zertifikate (siehe nrp cert run)')
+def apply(manifest_file, dry_run, prune, yes, acme_engine):
+    """
+    Wendet ein Host-Manifest (JSON/YAML) in einem Durchlauf an
+
+    Rendert alle Hosts, vergleicht sie mit den bestehenden
+    Konfigurationen und schreibt nur Änderungen. NGINX wird
+    für den gesamten Batch genau einmal getestet und neu geladen.
+    Fehlende Zertifikate werden vorab parallel über die
+    Zertifikats-Warteschlange angefordert (siehe nrp cert).
+
+    Beispiele:
+
+    \b
+        nrp apply hosts.yaml --dry-run
+        nrp apply hosts.json
+        nrp apply hosts.yaml --prune -y
+    """
+    nginx = NginxManager()
+    certbot = CertbotManager()
+
+    try:
+        hosts = manifest_core.normalize_hosts(manifest_core.load_manifest(manifest_file))
+    except (OSError, ValueError) as e:
+        click.echo(click.style(f'Manifest ungültig:\n{e}', fg='red'))
+        sys.exit(1)
+
+    sites = {spec['site'] for spec in hosts if spec['site']}
+    if sites:
+        from nrp.core.wireguard import get_site
+        missing = sorted(name for name in sites if get_site(name) is None)
+        if missing:
+            click.echo(click.style(f"Unbekannte Site(s): {', '.join(missing)}", fg='red'))
+            sys.exit(1)
+
+    try:
+        rendered = nginx.render_many(manifest_core.render_kwargs(spec) for spec in hosts)
+    except ValueError as e:
+        click.echo(click.style(f'Manifest ungültig:\n{e}', fg='red'))
+        sys.exit(1)
+    existing = {
+        fqdn: {path: path.read_text() for path in nginx.host_files(fqdn) if path.exists()}
+        for fqdn in nginx.list_configs()
+    }
+    changes = manifest_core.plan(hosts, rendered, existing, prune=prune)
+
+    click.echo(f'\nManifest: {len(hosts)} Host(s)')
+    for key, label, color in (
+        ('create', 'Neu', 'green'),
+        ('update', 'Geändert', 'yellow'),
+        ('remove', 'Entfernt', 'red'),
+    ):
+        for fqdn in changes[key]:
+            click.echo(click.style(f'  {label + ":":<10} {fqdn}', fg=color))
+    click.echo(f"  Unverändert: {len(changes['unchanged'])}")
+
+    pending = changes['create'] + changes['update']
+    if not pending and not changes['remove']:
+        click.echo(click.style('\n✓ Keine Änderungen - NGINX wird nicht neu geladen.', fg='green'))
+        return
+
+    if dry_run:
+        click.echo('\nDry-Run: keine Änderungen geschrieben.')
+        return
+
+    if not yes and not click.confirm('\nÄnderungen anwenden?', default=True):
+        click.echo('Abgebrochen.')
+        return
+
+    specs = {spec['fqdn']: spec for spec in hosts}
+
+    # Step 1: Request missing certificates in parallel via the certificate queue -
+    # answered from the ACME webroot, no reload
+    failed = []
+    need_cert = [fqdn for fqdn in pending if not certbot.has_certificate(fqdn)]
+    if need_cert:
+        if not nginx.acme_ready():
+            click.echo(click.style(
+                f'Fehler: {nginx.catch_all_conf} beantwortet keine ACME-Challenges - '
+                'einmalig ausführen: sudo nrp migrate',
+                fg='red'
+            ))
+            sys.exit(1)
+        click.echo(f'\nFordere {len(need_cert)} Zertifikat(e) an...')
+        queue = certqueue.CertQueue()
+        with certqueue.run_lock(CERT_QUEUE_PATH.with_suffix('.lock')) as locked:
+            if not locked:
+                click.echo(click.style('Fehler: nrp cert run läuft bereits', fg='red'))
+                sys.exit(1)
+            queue.recover()
+            for fqdn in need_cert:
+                queue.enqueue(
+                    fqdn, manifest_core.render_kwargs(specs[fqdn]), specs[fqdn]['email'], specs[fqdn]['key_type']
+                )
+            try:
+                issuer_context = acme.open_issuer(acme_engine)
+            except ValueError as e:
+                click.echo(click.style(f'Fehler: {e}', fg='red'))
+                sys.exit(1)
+            with issuer_context as issuer:
+                certqueue.run(
+                    queue,
+                    lambda job: issuer.issue(job['fqdn'], job['email'], job['key_type'], job['sans']),
+                    workers=acme.pool_size(issuer, CERT_WORKERS),
+                    fqdns=need_cert,
+                    report=lambda job, state: click.echo(
+                        f"  ✓ {job['fqdn']}" if state == certqueue.ISSUED
+                        else click.style(f"  ✗ {job['fqdn']}", fg='red')
+                    )
+                )
+        issued = {job['fqdn'] for job in queue.jobs([certqueue.ISSUED])}
+        failed = [fqdn for fqdn in need_cert if fqdn not in issued]
+        pending = [fqdn for fqdn in pending if fqdn not in failed]
+
+    # Step 2: Stage all final configurations, then swap in, test and reload once
+    click.echo('\nSchreibe Konfigurationen...')
+    with nginx.transaction() as tx:
+        for fqdn in pending:
+            for path, content in rendered[fqdn].items():
+                tx.write(path, content)
+        for fqdn in changes['remove']:
+            for path in nginx.host_files(fqdn):
+                tx.remove(path)
+        if not tx.commit():
+            click.echo(click.style('NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen', fg='red'))
+            sys.exit(1)
+    if need_cert:
+        queue.mark_active(pending)
+
+    click.echo(click.style(
+        f"\n✓ Manifest angewendet: {len(pending)} geschrieben, "
+        f"{len(changes['remove'])} entfernt, 1 Reload",
+        fg='green'
+    ))
+    if failed:
+        click.echo(click.style(
+            f"Ohne Zertifikat übersprungen: {', '.join(failed)} "
+            "(bleiben eingereiht: nrp cert queue, aktivieren mit: sudo nrp cert run)",
+            fg='yellow'
+        ))
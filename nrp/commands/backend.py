@@ -0,0 +1,195 @@
+"""
+backend command group - manage the backend pool of a proxy host
+"""
+import sys
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core import upstream as upstream_core
+from nrp.commands.remove import complete_domains
+from nrp.config import DEFAULT_BACKEND_MAX_FAILS, DEFAULT_BACKEND_FAIL_TIMEOUT
+
+
+@click.group()
+def backend():
+    """
+    Verwaltet die Backend-Server eines Proxy-Hosts
+
+    Änderungen rendern nur die Upstream-Datei des Hosts
+    (/etc/nginx/nrp/upstreams/<FQDN>.conf) neu und laden
+    NGINX einmal neu.
+
+    Typischer Workflow:
+
+    \b
+        nrp backend list api.example.com
+        nrp backend add api.example.com 192.168.1.12:8080 --weight 2
+        nrp backend policy api.example.com least_conn
+        nrp backend remove api.example.com 192.168.1.10:8080
+    """
+    pass
+
+
+# ── list ──────────────────────────────────────────────────────────────────────
+
+@backend.command(name="list")
+@click.argument("fqdn", shell_complete=complete_domains)
+def backend_list(fqdn):
+    """
+    Zeigt Backends und Balancing-Methode eines Hosts
+
+    Beispiel:
+
+    \b
+        nrp backend list api.example.com
+    """
+    nginx = NginxManager()
+    spec = _load_spec(nginx, fqdn)
+
+    method = spec["lb_method"]
+    if spec.get("hash_key"):
+        method += f" ({spec['hash_key']})"
+    click.echo(f"\nMethode:    {method}")
+    click.echo(f"Keepalive:  {spec['keepalive'] or 'aus'}")
+
+    col = (24, 8, 11, 14, 8)
+    click.echo("\n" + (
+        f"{'BACKEND':<{col[0]}}{'WEIGHT':<{col[1]}}{'MAX_FAILS':<{col[2]}}"
+        f"{'FAIL_TIMEOUT':<{col[3]}}{'BACKUP':<{col[4]}}"
+    ))
+    click.echo("─" * sum(col))
+    for b in spec["backends"]:
+        click.echo(
+            f"{upstream_core.backend_label(b):<{col[0]}}{b['weight']:<{col[1]}}"
+            f"{b['max_fails']:<{col[2]}}{b['fail_timeout']:<{col[3]}}"
+            f"{'ja' if b['backup'] else '-':<{col[4]}}"
+        )
+    click.echo()
+
+
+# ── add ───────────────────────────────────────────────────────────────────────
+
+@backend.command(name="add")
+@click.argument("fqdn", shell_complete=complete_domains)
+@click.argument("address", metavar="IP:PORT")
+@click.option("--weight", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Gewichtung des Backends")
+@click.option("--max-fails", type=click.IntRange(min=0), default=DEFAULT_BACKEND_MAX_FAILS,
+              show_default=True, help="Fehlversuche bis das Backend als down gilt")
+@click.option("--fail-timeout", default=DEFAULT_BACKEND_FAIL_TIMEOUT, show_default=True,
+              help="Zeitraum für max_fails und Pause nach Ausfall")
+@click.option("--backup", is_flag=True, default=False,
+              help="Nur nutzen, wenn alle anderen Backends ausgefallen sind")
+def backend_add(fqdn, address, weight, max_fails, fail_timeout, backup):
+    """
+    Fügt einem Host ein Backend hinzu
+
+    Beispiele:
+
+    \b
+        nrp backend add api.example.com 192.168.1.12:8080
+        nrp backend add api.example.com 192.168.1.13:8080 --weight 3
+        nrp backend add api.example.com 192.168.1.99:8080 --backup
+    """
+    nginx = NginxManager()
+    spec = _load_spec(nginx, fqdn)
+
+    try:
+        new = upstream_core.parse_backend(
+            address, weight=weight, max_fails=max_fails, fail_timeout=fail_timeout, backup=backup
+        )
+    except ValueError as e:
+        _fail(str(e))
+
+    _commit(nginx, fqdn, spec, spec["backends"] + [new])
+    click.echo(click.style(f"✓ Backend {address} zu {fqdn} hinzugefügt", fg="green"))
+
+
+# ── remove ────────────────────────────────────────────────────────────────────
+
+@backend.command(name="remove")
+@click.argument("fqdn", shell_complete=complete_domains)
+@click.argument("address", metavar="IP:PORT")
+def backend_remove(fqdn, address):
+    """
+    Entfernt ein Backend von einem Host
+
+    Beispiel:
+
+    \b
+        nrp backend remove api.example.com 192.168.1.10:8080
+    """
+    nginx = NginxManager()
+    spec = _load_spec(nginx, fqdn)
+
+    remaining = [b for b in spec["backends"] if upstream_core.backend_label(b) != address]
+    if len(remaining) == len(spec["backends"]):
+        _fail(f"Backend {address} ist für {fqdn} nicht konfiguriert.")
+
+    _commit(nginx, fqdn, spec, remaining)
+    click.echo(click.style(f"✓ Backend {address} von {fqdn} entfernt", fg="green"))
+
+
+# ── policy ────────────────────────────────────────────────────────────────────
+
+@backend.command(name="policy")
+@click.argument("fqdn", shell_complete=complete_domains)
+@click.argument("lb_method", type=click.Choice(upstream_core.LB_METHODS))
+@click.option("--hash-key", default=None, help="Schlüssel für 'hash' (Standard: $remote_addr)")
+@click.option("--keepalive", type=click.IntRange(min=0), default=None,
+              help="Keepalive-Verbindungen pro Worker (0 = aus)")
+def backend_policy(fqdn, lb_method, hash_key, keepalive):
+    """
+    Setzt die Load-Balancing-Methode eines Hosts
+
+    \b
+        round-robin  – gewichtete Rundverteilung (NGINX-Standard)
+        least_conn   – Backend mit den wenigsten aktiven Verbindungen
+        ip_hash      – Client-IP bleibt auf demselben Backend
+        hash         – konsistentes Hashing über --hash-key
+
+    Beispiele:
+
+    \b
+        nrp backend policy api.example.com least_conn
+        nrp backend policy api.example.com hash --hash-key '$cookie_session'
+    """
+    nginx = NginxManager()
+    spec = _load_spec(nginx, fqdn)
+    spec["lb_method"] = lb_method
+    spec["hash_key"] = hash_key
+    if keepalive is not None:
+        spec["keepalive"] = keepalive
+
+    _commit(nginx, fqdn, spec, spec["backends"])
+    click.echo(click.style(f"✓ Balancing-Methode für {fqdn}: {lb_method}", fg="green"))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _load_spec(nginx: NginxManager, fqdn: str) -> dict:
+    spec = nginx.read_upstream(fqdn)
+    if spec is None:
+        _fail(
+            f"Keine NRP-Upstream-Datei für {fqdn} gefunden. "
+            f"Host einmalig neu anlegen mit: nrp add {fqdn} --overwrite ..."
+        )
+    return spec
+
+
+def _commit(nginx: NginxManager, fqdn: str, spec: dict, backends: list) -> None:
+    """Validate the changed pool and activate only the host's upstream file."""
+    try:
+        spec = upstream_core.make_spec(backends, spec["lb_method"], spec.get("hash_key"), spec["keepalive"])
+    except ValueError as e:
+        _fail(str(e))
+
+    with nginx.transaction() as tx:
+        tx.write(nginx.upstream_path(fqdn), nginx.render_upstream(fqdn, spec))
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
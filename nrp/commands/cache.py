@@ -0,0 +1,107 @@
+"""
+cache command group - inspect and purge the response cache of proxy hosts
+"""
+import sys
+import click
+
+from nrp.core import cache as cache_core
+from nrp.commands.remove import complete_domains
+
+
+@click.group()
+def cache():
+    """
+    Verwaltet den Response-Cache der Proxy-Hosts
+
+    Caching wird pro Host mit 'nrp add ... --cache <PROFIL>' aktiviert.
+    Jeder Host hat eine eigene Zone und ein eigenes Verzeichnis unter
+    /var/cache/nginx/nrp/<FQDN>.
+
+    Typischer Workflow:
+
+    \b
+        nrp cache profiles
+        nrp cache stats app.example.com
+        nrp cache purge app.example.com --prefix /static/
+    """
+    pass
+
+
+# ── profiles ──────────────────────────────────────────────────────────────────
+
+@cache.command(name="profiles")
+def cache_profiles():
+    """
+    Zeigt die verfügbaren Cache-Profile
+    """
+    col = (10, 10, 10, 10, 8)
+    click.echo("\n" + (
+        f"{'PROFIL':<{col[0]}}{'ZONE':<{col[1]}}{'MAX_SIZE':<{col[2]}}"
+        f"{'INACTIVE':<{col[3]}}{'VALID':<{col[4]}}BESCHREIBUNG"
+    ))
+    click.echo("─" * (sum(col) + 40))
+    for name, profile in cache_core.CACHE_PROFILES.items():
+        click.echo(
+            f"{name:<{col[0]}}{profile['keys_zone_size']:<{col[1]}}{profile['max_size']:<{col[2]}}"
+            f"{profile['inactive']:<{col[3]}}{profile['valid']:<{col[4]}}{profile['description']}"
+        )
+    click.echo()
+
+
+# ── stats ─────────────────────────────────────────────────────────────────────
+
+@cache.command(name="stats")
+@click.argument("fqdn", shell_complete=complete_domains)
+def cache_stats(fqdn):
+    """
+    Zeigt Einträge und Speicherbedarf des Caches eines Hosts
+
+    Beispiel:
+
+    \b
+        nrp cache stats app.example.com
+    """
+    stats = cache_core.get_stats(fqdn)
+    if not stats["exists"]:
+        click.echo(click.style(f"Kein Cache-Verzeichnis für {fqdn} vorhanden ({stats['path']}).", fg="yellow"))
+        return
+
+    click.echo(f"\nVerzeichnis: {stats['path']}")
+    click.echo(f"Einträge:    {stats['entries']}")
+    click.echo(f"Belegt:      {cache_core.format_size(stats['size_bytes'])}\n")
+
+
+# ── purge ─────────────────────────────────────────────────────────────────────
+
+@cache.command(name="purge")
+@click.argument("fqdn", shell_complete=complete_domains)
+@click.option("--prefix", default=None, help="Nur URIs mit diesem Präfix löschen (z.B. /static/)")
+@click.option("--yes", "-y", is_flag=True, default=False, help="Ohne Rückfrage ausführen")
+def cache_purge(fqdn, prefix, yes):
+    """
+    Löscht gecachte Antworten eines Hosts
+
+    Ohne --prefix wird der komplette Cache des Hosts geleert. Ein
+    NGINX-Reload ist nicht nötig.
+
+    Beispiele:
+
+    \b
+        nrp cache purge app.example.com
+        nrp cache purge app.example.com --prefix /api/v1/
+    """
+    if prefix is not None and not prefix.startswith("/"):
+        click.echo(click.style("Fehler: --prefix muss mit '/' beginnen", fg="red"))
+        sys.exit(1)
+
+    target = f"{fqdn}{prefix}*" if prefix else f"gesamten Cache von {fqdn}"
+    if not yes and not click.confirm(f"{target} löschen?", default=True):
+        click.echo("Abgebrochen.")
+        return
+
+    try:
+        removed = cache_core.purge(fqdn, prefix)
+    except PermissionError as e:
+        click.echo(click.style(f"Fehler: {e} (als root ausführen)", fg="red"))
+        sys.exit(1)
+    click.echo(click.style(f"✓ {removed} Cache-Einträge gelöscht", fg="green"))
@@ -0,0 +1,334 @@
+"""
+cert command group - certificate job queue (CERT_QUEUE_PATH)
+"""
+import sys
+import time
+from datetime import datetime
+
+import click
+
+from nrp.config import ACME_ENGINE, ACME_RENEW_DAYS, CERT_QUEUE_PATH, CERT_WORKERS
+from nrp.core import acme, certqueue
+from nrp.core.certbot import CertbotManager
+from nrp.core.certindex import CertIndex
+from nrp.core.nginx import NginxManager
+
+ENGINE_OPTION = click.option(
+    "--acme-engine", type=click.Choice(["certbot", "native"]), default=ACME_ENGINE, show_default=True,
+    help="certbot (nacheinander) oder eingebauter ACME-Client (parallel, pip install 'nrp[acme]')"
+)
+
+
+@click.group()
+def cert():
+    """
+    Verwaltet die Zertifikats-Warteschlange
+
+    Mit nrp add --queue bzw. nrp apply eingereihte Hosts erhalten ihr
+    Zertifikat parallel (Worker-Pool) unter Beachtung der Let's-Encrypt-
+    Rate-Limits. Ausgestellte Zertifikate werden gesammelt aktiviert
+    (ein Reload pro Batch).
+
+    Typischer Workflow:
+
+    \b
+        nrp add app.example.com -i 192.168.1.10 -p 8080 --queue
+        sudo nrp cert run
+        nrp cert queue
+    """
+    pass
+
+
+# ── queue ─────────────────────────────────────────────────────────────────────
+
+@cert.command(name="queue")
+@click.option("--all", "show_all", is_flag=True, default=False, help="Auch abgeschlossene (aktive) Jobs anzeigen")
+@click.option("--clear", is_flag=True, default=False, help="Abgeschlossene Jobs entfernen")
+def cert_queue(show_all, clear):
+    """
+    Zeigt wartende, laufende und fehlgeschlagene Zertifikats-Jobs
+
+    Wartezeit: von Einreihung bis Start des letzten Versuchs,
+    Dauer: letzter Versuch.
+
+    Beispiele:
+
+    \b
+        nrp cert queue
+        nrp cert queue --all
+        sudo nrp cert queue --clear
+    """
+    queue = certqueue.CertQueue()
+    if clear:
+        click.echo(click.style(f"✓ {queue.clear()} abgeschlossene(r) Job(s) entfernt", fg="green"))
+        return
+
+    states = () if show_all else (certqueue.PENDING, certqueue.RUNNING, certqueue.ISSUED, certqueue.FAILED)
+    jobs = queue.jobs(states)
+    if not jobs:
+        click.echo("Keine Zertifikats-Jobs in der Warteschlange.")
+        return
+
+    now = time.time()
+    colors = {certqueue.FAILED: "red", certqueue.RUNNING: "cyan", certqueue.ISSUED: "yellow", certqueue.ACTIVE: "green"}
+    click.echo(f"\n{'FQDN':<36}{'STATUS':<10}{'VERSUCHE':>9}{'WARTEZEIT':>11}{'DAUER':>9}  NÄCHSTER VERSUCH")
+    click.echo("─" * 96)
+    for job in jobs:
+        waited = (job["started"] or now) - job["created"]
+        duration = (job["finished"] or now) - job["started"] if job["started"] else None
+        retry = ""
+        if job["state"] == certqueue.PENDING and job["not_before"] > now:
+            retry = datetime.fromtimestamp(job["not_before"]).strftime("%d.%m. %H:%M")
+        click.echo(
+            f"{job['fqdn']:<36}" + click.style(f"{job['state']:<10}", fg=colors.get(job["state"]))
+            + f"{job['attempts']:>9}{_seconds(waited):>11}{_seconds(duration):>9}  {retry}"
+        )
+        if job["error"] and job["state"] in (certqueue.PENDING, certqueue.FAILED):
+            click.echo(f"    {_last_line(job['error'])}")
+    click.echo()
+
+
+# ── run ───────────────────────────────────────────────────────────────────────
+
+@cert.command(name="run")
+@click.option("--workers", "-w", type=click.IntRange(1, 32), default=CERT_WORKERS, show_default=True,
+              help="Parallele Zertifikatsanforderungen (certbot: immer eine)")
+@ENGINE_OPTION
+def cert_run(workers, acme_engine):
+    """
+    Arbeitet die Warteschlange ab und aktiviert die Hosts
+
+    Jobs, die ein Rate-Limit oder die Wartezeit nach einem Fehler
+    zurückhält, bleiben für den nächsten Lauf stehen (z.B. per Cron).
+
+    certbot erlaubt nur einen Lauf gleichzeitig; mit --acme-engine native
+    laufen die Bestellungen der Worker wirklich parallel über ein
+    ACME-Konto und gemeinsame Verbindungen.
+
+    Beispiel:
+
+    \b
+        sudo nrp cert run
+        sudo nrp cert run --workers 8 --acme-engine native
+    """
+    nginx = NginxManager()
+    queue = certqueue.CertQueue()
+
+    with certqueue.run_lock(CERT_QUEUE_PATH.with_suffix(".lock")) as locked:
+        if not locked:
+            click.echo(click.style("Fehler: nrp cert run läuft bereits", fg="red"))
+            sys.exit(1)
+        queue.recover()
+        if queue.jobs([certqueue.PENDING]) and not nginx.acme_ready():
+            click.echo(click.style(
+                f"Fehler: {nginx.catch_all_conf} beantwortet keine ACME-Challenges - "
+                "einmalig ausführen: sudo nrp migrate",
+                fg="red"
+            ))
+            sys.exit(1)
+
+        with _issuer(acme_engine) as issuer:
+            pool_size = acme.pool_size(issuer, workers)
+            if pool_size < workers:
+                click.echo(click.style(
+                    "Hinweis: certbot stellt nacheinander aus - parallel mit --acme-engine native", fg="yellow"
+                ))
+            summary = certqueue.run(
+                queue,
+                lambda job: issuer.issue(job["fqdn"], job["email"], job["key_type"], job["sans"]),
+                activate=certqueue.activator(nginx),
+                workers=pool_size,
+                report=_report
+            )
+
+    click.echo(click.style(
+        f"\n✓ {summary[certqueue.ACTIVE]} Host(s) aktiviert ({summary['batches']} Reload(s))", fg="green"
+    ))
+    _summary(summary)
+
+
+# ── renew ─────────────────────────────────────────────────────────────────────
+
+@cert.command(name="renew")
+@click.option("--days", type=click.IntRange(1, 89), default=ACME_RENEW_DAYS, show_default=True,
+              help="Zertifikate erneuern, die innerhalb dieser Tage ablaufen")
+@click.option("--workers", "-w", type=click.IntRange(1, 32), default=CERT_WORKERS, show_default=True,
+              help="Parallele Zertifikatsanforderungen")
+def cert_renew(days, workers):
+    """
+    Erneuert Zertifikate der nativen ACME-Engine
+
+    certbot renew kennt nur von certbot ausgestellte Zertifikate. Dieser
+    Befehl erneuert die übrigen Zertifikate in /etc/letsencrypt/live
+    über den eingebauten ACME-Client und lädt NGINX danach einmal neu.
+    Für einen täglichen Cron-Job gedacht.
+
+    Beispiel:
+
+    \b
+        sudo nrp cert renew
+    """
+    nginx = NginxManager()
+    queue = certqueue.CertQueue()
+
+    try:
+        expiring = [entry for entry in CertIndex().certificates(expiring=days) if not entry["certbot"]]
+    except ValueError as e:
+        click.echo(click.style(f"Fehler: {e}", fg="red"))
+        sys.exit(1)
+    if not expiring:
+        click.echo(f"Keine Zertifikate laufen in den nächsten {days} Tagen ab.")
+        return
+
+    with certqueue.run_lock(CERT_QUEUE_PATH.with_suffix(".lock")) as locked:
+        if not locked:
+            click.echo(click.style("Fehler: nrp cert run läuft bereits", fg="red"))
+            sys.exit(1)
+        queue.recover()
+        if not nginx.acme_ready():
+            click.echo(click.style(
+                f"Fehler: {nginx.catch_all_conf} beantwortet keine ACME-Challenges - "
+                "einmalig ausführen: sudo nrp migrate",
+                fg="red"
+            ))
+            sys.exit(1)
+        click.echo(f"Erneuere {len(expiring)} Zertifikat(e)...")
+        names = certqueue.enqueue_renewals(queue, expiring)
+        with _issuer("native") as issuer:
+            summary = certqueue.run(
+                queue,
+                lambda job: issuer.issue(job["fqdn"], job["email"], job["key_type"], job["sans"]),
+                workers=workers,
+                report=_report,
+                fqdns=names
+            )
+
+    # Renewed files replace the symlink targets; one reload picks all of them up
+    if summary[certqueue.ACTIVE]:
+        if not nginx.test_config() or not nginx.reload():
+            click.echo(click.style("Fehler: NGINX nicht neu geladen - sudo nginx -t", fg="red"))
+            sys.exit(1)
+    click.echo(click.style(f"\n✓ {summary[certqueue.ACTIVE]} Zertifikat(e) erneuert", fg="green"))
+    _summary(summary)
+
+
+# ── list ──────────────────────────────────────────────────────────────────────
+
+@cert.command(name="list")
+@click.option("--expiring", type=click.IntRange(0), default=None, metavar="TAGE",
+              help="Nur Zertifikate, die innerhalb dieser Tage ablaufen")
+def cert_list(expiring):
+    """
+    Listet die Zertifikate in /etc/letsencrypt/live nach Ablaufdatum
+
+    Gelesen direkt aus den PEM-Dateien (Index in /var/lib/nrp/cert-index.db,
+    nur geänderte Zertifikate werden neu eingelesen) - ohne certbot.
+    Ohne nrp[acme] (cryptography) werden nur die Namen gelistet.
+
+    Beispiele:
+
+    \b
+        sudo nrp cert list
+        sudo nrp cert list --expiring 30
+    """
+    try:
+        certs = CertIndex().certificates(expiring=expiring)
+    except ValueError as e:
+        if expiring is not None:
+            click.echo(click.style(f"Fehler: {e}", fg="red"))
+            sys.exit(1)
+        # Without cryptography: names from the live directory only
+        names = CertbotManager().list_certificates()
+        click.echo("\n".join(names) if names else "Keine Zertifikate gefunden.")
+        click.echo(click.style(f"Hinweis: Ablaufdaten, SANs und Schlüsseltyp - {e}", fg="yellow"))
+        return
+    if not certs:
+        click.echo("Keine Zertifikate gefunden." if expiring is None
+                   else f"Keine Zertifikate laufen in den nächsten {expiring} Tagen ab.")
+        return
+
+    click.echo(f"\n{'NAME':<36}{'ABLAUF':<12}{'TAGE':>5}  {'SCHLÜSSEL':<10}{'ERNEUERUNG':<12}AUSSTELLER")
+    click.echo("─" * 100)
+    for cert in certs:
+        click.echo(
+            f"{cert['name']:<36}{datetime.fromtimestamp(cert['not_after']).strftime('%d.%m.%Y'):<12}"
+            + click.style(f"{cert['days']:>5}", fg=_expiry_color(cert["days"]))
+            + f"  {cert['key_type'] or '?':<10}{'certbot' if cert['certbot'] else 'nrp':<12}{cert['issuer'] or ''}"
+        )
+        others = [san for san in cert["sans"] if san != cert["name"]]
+        if others:
+            click.echo(f"    {', '.join(others)}")
+    click.echo()
+
+
+# ── retry ─────────────────────────────────────────────────────────────────────
+
+@cert.command(name="retry")
+@click.argument("fqdns", nargs=-1)
+def cert_retry(fqdns):
+    """
+    Setzt fehlgeschlagene Jobs zurück (ohne FQDN: alle)
+
+    Beispiel:
+
+    \b
+        sudo nrp cert retry app.example.com
+    """
+    count = certqueue.CertQueue().retry(fqdns)
+    click.echo(click.style(f"✓ {count} Job(s) wieder eingereiht - abarbeiten mit: sudo nrp cert run", fg="green"))
+
+
+def _issuer(engine: str):
+    try:
+        return acme.open_issuer(engine)
+    except ValueError as e:
+        click.echo(click.style(f"Fehler: {e}", fg="red"))
+        sys.exit(1)
+
+
+def _summary(summary: dict) -> None:
+    if summary.get("activation_failed"):
+        click.echo(click.style(
+            f"Aktivierung fehlgeschlagen (NGINX-Konfiguration ungültig), weitere Batches übersprungen - "
+            f"{summary[certqueue.ISSUED]} Zertifikat(e) ausgestellt, nicht aktiviert; "
+            "nach der Korrektur erneut: sudo nrp cert run",
+            fg="red"
+        ))
+    if summary[certqueue.PENDING]:
+        click.echo(click.style(f"{summary[certqueue.PENDING]} Job(s) warten auf einen neuen Versuch", fg="yellow"))
+    if summary[certqueue.FAILED]:
+        click.echo(click.style(
+            f"{summary[certqueue.FAILED]} Job(s) endgültig fehlgeschlagen - nrp cert queue, nrp cert retry",
+            fg="red"
+        ))
+
+
+def _expiry_color(days: int) -> str:
+    if days < 7:
+        return "red"
+    if days < ACME_RENEW_DAYS:
+        return "yellow"
+    return "green"
+
+
+def _report(job: dict, state: str) -> None:
+    duration = _seconds(job["finished"] - job["started"])
+    if state in (certqueue.ISSUED, certqueue.ACTIVE):
+        click.echo(f"  ✓ {job['fqdn']} ({duration})")
+    elif state == certqueue.PENDING:
+        click.echo(click.style(f"  ✗ {job['fqdn']} ({duration}) - neuer Versuch später", fg="yellow"))
+    else:
+        click.echo(click.style(f"  ✗ {job['fqdn']} ({duration}) - {_last_line(job['error'])}", fg="red"))
+
+
+def _seconds(value) -> str:
+    if value is None:
+        return "-"
+    if value < 120:
+        return f"{value:.1f}s"
+    return f"{value / 60:.0f}min"
+
+
+def _last_line(text: str) -> str:
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    return lines[-1][:120] if lines else ""
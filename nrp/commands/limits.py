@@ -0,0 +1,141 @@
+"""
+limits command group - shared rate/connection limit zones and allowlist
+"""
+import sys
+
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core import limits as limits_core
+
+
+@click.group()
+def limits():
+    """
+    Verwaltet Rate- und Verbindungs-Limits aller Proxy-Hosts
+
+    Limits pro Host werden mit 'nrp add ... --rate-limit RATE[:BURST]'
+    und '--conn-limit N' gesetzt. Die Zonen teilen sich alle Hosts; sie
+    werden bei jeder Änderung automatisch neu erzeugt.
+
+    Typischer Workflow:
+
+    \b
+        nrp limits show
+        nrp limits allow 192.168.0.0/16
+        nrp limits deny 192.168.0.0/16
+    """
+    pass
+
+
+# ── show ──────────────────────────────────────────────────────────────────────
+
+@limits.command(name="show")
+def limits_show():
+    """
+    Zeigt die Limits aller Hosts und die Allowlist
+
+    Beispiel:
+
+    \b
+        nrp limits show
+    """
+    nginx = NginxManager()
+    rows = []
+    for host in nginx.hosts():
+        params = host["params"] or {}
+        if params.get("rate_limit") or params.get("conn_limit"):
+            rows.append((host["fqdn"], params))
+
+    if rows:
+        click.echo(f"\n{'HOST':<36}{'RATE/S':<10}{'BURST':<10}VERBINDUNGEN")
+        click.echo("─" * 70)
+        for fqdn, params in rows:
+            click.echo(
+                f"{fqdn:<36}{params.get('rate_limit') or '-':<10}"
+                f"{params.get('rate_burst') or '-':<10}{params.get('conn_limit') or '-'}"
+            )
+    else:
+        click.echo("\nKein Host hat Rate- oder Verbindungs-Limits.")
+
+    allowlist = _allowlist(nginx)
+    click.echo(f"\nAllowlist: {', '.join(allowlist) if allowlist else '(leer)'}")
+    click.echo(f"Zonen: {nginx.limits_conf}\n")
+
+
+# ── allow / deny ──────────────────────────────────────────────────────────────
+
+@limits.command(name="allow")
+@click.argument("network")
+def limits_allow(network):
+    """
+    Nimmt eine IP-Adresse oder ein Netz von allen Limits aus
+
+    Beispiele:
+
+    \b
+        nrp limits allow 10.0.0.0/8
+        nrp limits allow 203.0.113.7
+    """
+    try:
+        network = limits_core.validate_allow(network)
+    except ValueError as e:
+        _fail(str(e))
+
+    nginx = NginxManager()
+    allowlist = _allowlist(nginx)
+    if network in allowlist:
+        click.echo(f"{network} steht bereits in der Allowlist.")
+        return
+    _write_allowlist(nginx, allowlist + [network])
+    click.echo(click.style(f"✓ {network} wird nicht mehr begrenzt", fg="green"))
+
+
+@limits.command(name="deny")
+@click.argument("network")
+def limits_deny(network):
+    """
+    Entfernt eine IP-Adresse oder ein Netz aus der Allowlist
+
+    Beispiel:
+
+    \b
+        nrp limits deny 10.0.0.0/8
+    """
+    try:
+        network = limits_core.validate_allow(network)
+    except ValueError as e:
+        _fail(str(e))
+
+    nginx = NginxManager()
+    allowlist = _allowlist(nginx)
+    if network not in allowlist:
+        _fail(f"{network} steht nicht in der Allowlist")
+    _write_allowlist(nginx, [entry for entry in allowlist if entry != network])
+    click.echo(click.style(f"✓ {network} aus der Allowlist entfernt", fg="green"))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _allowlist(nginx: NginxManager) -> list:
+    if not nginx.limits_conf.exists():
+        return []
+    header = limits_core.parse_header(nginx.limits_conf.read_text()) or {}
+    return header.get("allowlist", [])
+
+
+def _write_allowlist(nginx: NginxManager, allowlist: list) -> None:
+    # Zones are re-derived from the host files on commit, only the allowlist counts here
+    content = limits_core.render(nginx.env, [], False, allowlist)
+    with nginx.transaction() as tx:
+        if content is None:
+            tx.remove(nginx.limits_conf)
+        else:
+            tx.write(nginx.limits_conf, content)
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
@@ -1,32 +1,95 @@
 """
 List command - Show all proxy hosts
 """
+import json
+import sys
+
 import click
 
 from nrp.core.nginx import NginxManager
 
 
 @click.command(name='list')
-def list_hosts():
+@click.option('--backend', default=None, metavar='IP|CIDR',
+              help='Nur Hosts mit Backend an dieser IP bzw. in diesem Netz')
+@click.option('--site', 'site_name', default=None,
+              help='Nur Hosts dieser Site (per --site angelegt oder Backend im Site-Subnetz/LAN)')
+@click.option('--waf', is_flag=True, default=False, help='Nur Hosts mit aktiver WAF')
+@click.option('--port', type=int, default=None, help='Nur Hosts mit diesem externen Port')
+@click.option('--json', 'as_json', is_flag=True, default=False,
+              help='Ausgabe als JSON Lines (ein Objekt pro Host)')
+def list_hosts(backend, site_name, waf, port, as_json):
     """
     Zeigt alle konfigurierten Proxy-Hosts an
 
-    Beispiel:
+    Filter werden kombiniert (UND) und aus der Host-Registry beantwortet.
+
+    Beispiele:
 
+    \b
         nrp list
+        nrp list --backend 192.168.1.20
+        nrp list --backend 10.240.12.0/24 --json
+        nrp list --site home
+        nrp list --waf --port 443
     """
     nginx = NginxManager()
-    configs = nginx.list_configs()
+    filters = {}
+    if waf:
+        filters['waf'] = True
+    if port is not None:
+        filters['external_port'] = port
+    if backend:
+        filters['backend'] = backend
+    if site_name:
+        filters['site'] = site_name
+        filters['site_networks'] = _site_networks(site_name)
 
-    if not configs:
-        click.echo('Keine Proxy-Hosts konfiguriert.')
+    try:
+        hosts = nginx.hosts(**filters)
+    except ValueError as e:
+        click.echo(click.style(f'Fehler: {e}', fg='red'), err=True)
+        sys.exit(1)
+
+    if as_json:
+        for host in hosts:
+            click.echo(json.dumps(host, sort_keys=True))
         return
 
-    click.echo(f'\nKonfigurierte Proxy-Hosts ({len(configs)}):')
+    if not hosts:
+        click.echo('Keine passenden Proxy-Hosts gefunden.' if filters else 'Keine Proxy-Hosts konfiguriert.')
+        return
+
+    click.echo(f'\nKonfigurierte Proxy-Hosts ({len(hosts)}):')
     click.echo('─' * 50)
 
-    for i, domain in enumerate(configs, 1):
-        click.echo(f'{i}. {domain}')
-        click.echo(f'   Konfiguration: /etc/nginx/conf.d/{domain}.conf')
-        click.echo(f'   Zertifikat: /etc/letsencrypt/live/{domain}/')
+    for i, host in enumerate(hosts, 1):
+        click.echo(f'{i}. {host["fqdn"]}')
+        backends = ', '.join(f'{b["address"]}:{b["port"]}' for b in host['backends'])
+        if backends:
+            click.echo(f'   Backend: {host["forward_scheme"] or "http"}://{backends}')
+        flags = [
+            label for label, enabled in (
+                (f'Port {host["external_port"]}', host['external_port'] not in (None, 443)),
+                ('WAF', host['waf']),
+                ('Websockets', host['websockets']),
+                (f'Site {host["site"]}', host['site']),
+            ) if enabled
+        ]
+        if flags:
+            click.echo(f'   {" · ".join(flags)}')
+        click.echo(f'   Konfiguration: {nginx.config_path(host["fqdn"])}')
+        click.echo(f'   Zertifikat: {host["cert"] + "/" if host["cert"] else "-"}')
         click.echo()
+
+
+def _site_networks(name: str) -> list:
+    """Overlay subnet and LAN of a site from the site DB (empty if unknown)."""
+    from nrp.core.wireguard import get_site
+    site = get_site(name)
+    if site is None:
+        click.echo(click.style(
+            f"Hinweis: Site '{name}' nicht in der Site-DB - nur per --site zugeordnete Hosts", fg='yellow'
+        ), err=True)
+        return []
+    return [network for network in (site.get('subnet'), site.get('lan_cidr')) if network]
@@ -0,0 +1,66 @@
+"""
+migrate command - re-render all proxy hosts after an update of nrp
+"""
+import sys
+
+import click
+
+from nrp.config import ACME_WEBROOT
+from nrp.core.certbot import CertbotManager
+from nrp.core.nginx import NginxManager
+
+
+@click.command()
+@click.option("--dry-run", is_flag=True, default=False, help="Nur anzeigen, welche Hosts sich ändern würden")
+def migrate(dry_run):
+    """
+    Rendert alle Proxy-Hosts mit den aktuellen Templates neu
+
+    Nach einem Update von nrp ausführen. Übernimmt neue Strukturen in
+    bestehende Hosts, z.B. den gemeinsamen Port-80-server-Block
+    (conf.d/nrp-redirect.conf) und die Snippets unter
+    /etc/nginx/nrp/snippets. catch-all.conf erhält die ACME-Location,
+    damit Zertifikate ohne Reload per Webroot ausgestellt werden. Alle
+    Dateien werden in einer Transaktion geschrieben, geprüft und einmal
+    neu geladen.
+
+    Hosts älterer Versionen ohne NRP-Parameter werden anhand von
+    proxy_pass, listen, coraza und den Websocket-Headern übernommen.
+
+    Beispiele:
+
+    \b
+        nrp migrate --dry-run
+        sudo nrp migrate
+    """
+    nginx = NginxManager()
+    with nginx.transaction() as tx:
+        changed, unparsed = nginx.rerender_hosts(tx)
+        for fqdn in changed:
+            click.echo(f"  ~ {fqdn}")
+        catch_all = nginx.migrate_catch_all()
+        if catch_all is not None:
+            click.echo(f"  ~ {nginx.catch_all_conf.name} (ACME-Challenges)")
+            tx.write(nginx.catch_all_conf, catch_all)
+        if dry_run:
+            click.echo(f"\n{len(changed)} Host(s) würden neu gerendert (--dry-run, nichts geschrieben)")
+            _report_unparsed(unparsed)
+            return
+
+        ACME_WEBROOT.mkdir(parents=True, exist_ok=True)
+        CertbotManager().install_deploy_hook()
+        if (changed or catch_all is not None) and not tx.commit():
+            click.echo(click.style("Fehler: NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen", fg="red"))
+            sys.exit(1)
+
+    click.echo(click.style(f"✓ {len(changed)} Host(s) neu gerendert", fg="green"))
+    _report_unparsed(unparsed)
+
+
+def _report_unparsed(fqdns: list) -> None:
+    for fqdn in fqdns:
+        click.echo(click.style(
+            f"Hinweis: {fqdn} nicht übernommen (kein proxy_pass auf Adresse:Port gefunden) - "
+            f"neu anlegen mit: nrp add {fqdn} --overwrite ...",
+            fg="yellow"
+        ))
@@ -0,0 +1,86 @@
+"""
+profile command - show or change the traffic profile of a proxy host
+"""
+import sys
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core.traffic import TRAFFIC_PROFILES
+from nrp.commands.remove import complete_domains
+
+
+@click.command()
+@click.argument("fqdn", required=False, shell_complete=complete_domains)
+@click.argument("name", required=False, type=click.Choice(list(TRAFFIC_PROFILES)))
+def profile(fqdn, name):
+    """
+    Zeigt oder ändert das Traffic-Profil eines Proxy-Hosts
+
+    \b
+        default    – NGINX-Standardwerte
+        streaming  – SSE/Long-Polling: Antworten ungepuffert, lange Timeouts
+        api        – kleine JSON-Requests im Speicher, kurze Timeouts
+        upload     – Request-Body direkt zum Backend streamen
+
+    Beim Ändern wird nur die Konfiguration dieses Hosts neu gerendert
+    (Upstream, Zertifikat und übrige Hosts bleiben unberührt).
+
+    Beispiele:
+
+    \b
+        nrp profile
+        nrp profile events.example.com
+        nrp profile events.example.com streaming
+    """
+    if fqdn is None:
+        _show_profiles()
+        return
+
+    nginx = NginxManager()
+    params = nginx.read_host(fqdn)
+    if params is None:
+        _fail(
+            f"Keine NRP-Parameter in der Konfiguration von {fqdn} gefunden. "
+            f"Host einmalig neu anlegen mit: nrp add {fqdn} --overwrite ..."
+        )
+
+    current = params.get("traffic_profile") or "default"
+    if name is None:
+        click.echo(f"{fqdn}: {current}")
+        return
+    if name == current:
+        click.echo(f"{fqdn} nutzt bereits das Profil '{name}'.")
+        return
+
+    params["traffic_profile"] = name
+    try:
+        content = nginx.render_config(fqdn, **params)
+    except ValueError as e:
+        _fail(str(e))
+
+    with nginx.transaction() as tx:
+        tx.write(nginx.config_path(fqdn), content)
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+    click.echo(click.style(f"✓ Traffic-Profil für {fqdn}: {current} → {name}", fg="green"))
+
+
+def _show_profiles() -> None:
+    click.echo()
+    for name, settings in TRAFFIC_PROFILES.items():
+        if settings is None:
+            click.echo(f"{name:<12}NGINX-Standardwerte")
+            continue
+        click.echo(f"{name:<12}{settings['description']}")
+        click.echo(
+            f"{'':<12}Pufferung: Request {'an' if settings['request_buffering'] else 'aus'}, "
+            f"Response {'an' if settings['buffering'] else 'aus'} · "
+            f"Timeouts: read {settings['read_timeout']}, send {settings['send_timeout']}"
+        )
+    click.echo()
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
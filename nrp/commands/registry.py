@@ -0,0 +1,80 @@
+"""
+registry command group - indexed host parameters (HOSTS_DB_PATH)
+"""
+import sqlite3
+import sys
+
+import click
+
+from nrp.core.nginx import NginxManager
+
+
+@click.group()
+def registry():
+    """
+    Verwaltet die Host-Registry
+
+    Die Registry enthält die Parameter aller Proxy-Hosts (Backend, Ports,
+    WAF, Site, Zertifikat) als Index. nrp list, nrp status und
+    nrp waf status lesen daraus statt jede Datei in conf.d zu öffnen.
+    nrp add/remove/apply halten sie automatisch aktuell.
+
+    Typischer Workflow:
+
+    \b
+        nrp registry show
+        sudo nrp registry import   # nach Upgrade oder manuellen Änderungen
+    """
+    pass
+
+
+# ── show ──────────────────────────────────────────────────────────────────────
+
+@registry.command(name="show")
+def registry_show():
+    """
+    Zeigt Pfad, Anzahl Hosts und ob die Registry aktuell ist
+
+    Beispiel:
+
+    \b
+        nrp registry show
+    """
+    nginx = NginxManager()
+    current = nginx.registry_current()
+    click.echo(f"\nRegistry: {nginx.registry.path}")
+    click.echo(f"Hosts: {len(nginx.registry.fqdns())}")
+    if current:
+        click.echo(click.style("✓ Aktuell", fg="green"))
+    else:
+        click.echo(click.style(
+            "Veraltet oder nicht vorhanden (conf.d außerhalb von nrp geändert) - "
+            "wird beim nächsten Zugriff neu aufgebaut, sofort mit: sudo nrp registry import",
+            fg="yellow"
+        ))
+    click.echo()
+
+
+# ── import ────────────────────────────────────────────────────────────────────
+
+@registry.command(name="import")
+def registry_import():
+    """
+    Baut die Registry aus den Dateien in conf.d neu auf
+
+    Liest alle Host-Konfigurationen und Upstream-Dateien. Hosts älterer
+    NRP-Versionen ohne Parameter-Kopfzeile werden aus proxy_pass,
+    listen, coraza und ssl_certificate erkannt.
+
+    Beispiel:
+
+    \b
+        sudo nrp registry import
+    """
+    nginx = NginxManager()
+    try:
+        count = nginx.rebuild_registry()
+    except (OSError, sqlite3.Error) as e:
+        click.echo(click.style(f"Fehler: Registry konnte nicht geschrieben werden: {e}", fg="red"))
+        sys.exit(1)
+    click.echo(click.style(f"✓ {count} Host(s) in {nginx.registry.path} importiert", fg="green"))
@@ -57,17 +57,16 @@ def remove(fqdn, keep_cert):
 
     click.echo(f'\nEntferne Proxy-Host {fqdn}...')
 
-    # Remove NGINX configuration
-    if nginx.remove_config(fqdn):
-        click.echo('✓ NGINX-Konfiguration entfernt')
-    else:
-        click.echo(click.style('Fehler beim Entfernen der NGINX-Konfiguration', fg='red'))
-
-    # Reload NGINX
-    if nginx.reload():
-        click.echo('✓ NGINX neu geladen')
-    else:
-        click.echo(click.style('Fehler beim Neuladen der NGINX-Konfiguration', fg='red'))
+    # Remove NGINX configuration and reload - restored if NGINX rejects the result
+    with nginx.transaction() as tx:
+        for path in nginx.host_files(fqdn):
+            tx.remove(path)
+        if tx.commit():
+            click.echo('✓ NGINX-Konfiguration entfernt')
+            click.echo('✓ NGINX neu geladen')
+        else:
+            click.echo(click.style('Fehler beim Entfernen der NGINX-Konfiguration - Änderungen zurückgenommen', fg='red'))
+            return
 
     # Remove certificate if requested
     if not keep_cert:
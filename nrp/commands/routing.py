@@ -0,0 +1,111 @@
+"""
+routing command group - consolidated routing for many proxy hosts
+"""
+import sys
+
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core import routing as routing_core
+
+
+@click.group()
+def routing():
+    """
+    Zeigt und aktualisiert den Routing-Modus (ROUTING_MODE in config.py)
+
+    \b
+        files  – jeder Host hat eigene server-Blöcke (Standard)
+        map    – Hosts ohne Sonderoptionen teilen sich einen server-Block
+                 pro Port und map-Tabellen in conf.d/nrp-routes.conf;
+                 empfohlen ab einigen hundert Hosts
+
+    Hosts mit eigenem Port, WAF, Cache, Limits, Websockets usw. behalten
+    auch im map-Modus ihre eigenen server-Blöcke.
+
+    Typischer Workflow:
+
+    \b
+        nrp routing show
+        # ROUTING_MODE = "map" in config.py setzen, dann:
+        sudo nrp routing rebuild
+    """
+    pass
+
+
+# ── show ──────────────────────────────────────────────────────────────────────
+
+@routing.command(name="show")
+def routing_show():
+    """
+    Zeigt Modus und Verteilung der Hosts
+
+    Beispiel:
+
+    \b
+        nrp routing show
+    """
+    nginx = NginxManager()
+    routed, own, routable = _classify(nginx)
+
+    click.echo(f"\nModus: {nginx.routing_mode}")
+    click.echo(f"Über Routing-Tabelle: {len(routed)}")
+    click.echo(f"Eigene server-Blöcke: {len(own)}")
+    if nginx.routing_mode == "files" and routable:
+        click.echo(f"\n{len(routable)} Host(s) könnten im map-Modus zusammengefasst werden.")
+    elif nginx.routing_mode == "map" and routable:
+        click.echo(click.style(
+            f"\n{len(routable)} Host(s) noch nicht umgestellt. Ausführen: sudo nrp routing rebuild",
+            fg="yellow"
+        ))
+    click.echo()
+
+
+# ── rebuild ───────────────────────────────────────────────────────────────────
+
+@routing.command(name="rebuild")
+def routing_rebuild():
+    """
+    Rendert alle Hosts im aktuellen Modus neu
+
+    Nach einer Änderung von ROUTING_MODE ausführen. Alle Dateien werden
+    in einer Transaktion geschrieben, getestet und einmal neu geladen.
+
+    Beispiel:
+
+    \b
+        sudo nrp routing rebuild
+    """
+    nginx = NginxManager()
+    with nginx.transaction() as tx:
+        changed, unparsed = nginx.rerender_hosts(tx)
+        if changed and not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+    click.echo(click.style(f"✓ Modus {nginx.routing_mode}: {len(changed)} Host(s) neu gerendert", fg="green"))
+    for fqdn in unparsed:
+        click.echo(click.style(
+            f"Hinweis: {fqdn} übersprungen (kein proxy_pass auf Adresse:Port gefunden) - "
+            f"neu anlegen mit: nrp add {fqdn} --overwrite ...",
+            fg="yellow"
+        ))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _classify(nginx: NginxManager):
+    """Split hosts into routed, own server blocks, and routable but not yet routed."""
+    routed, own, routable = [], [], []
+    for host in nginx.hosts():
+        if host["routed"]:
+            routed.append(host["fqdn"])
+            continue
+        own.append(host["fqdn"])
+        if host["params"] is not None and routing_core.is_routable(host["params"]):
+            routable.append(host["fqdn"])
+    return routed, own, routable
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
@@ -4,14 +4,16 @@ Setup command - Install environment on Debian system
 import click
 import subprocess
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
 
 from nrp.config import (
+    ACME_WEBROOT,
     NGINX_CONF_DIR,
     NGINX_HTML_DIR,
     NGINX_SSL_DIR,
     TEMPLATE_DIR
 )
+from nrp.core.certbot import CertbotManager
+from nrp.core.nginx import NginxManager
 
 
 @click.command()
@@ -75,6 +77,7 @@ def setup(ctx, skip_packages, with_wireguard, with_waf):
     NGINX_HTML_DIR.mkdir(parents=True, exist_ok=True)
     NGINX_CONF_DIR.mkdir(parents=True, exist_ok=True)
     NGINX_SSL_DIR.mkdir(parents=True, exist_ok=True)
+    ACME_WEBROOT.mkdir(parents=True, exist_ok=True)
     click.echo(click.style('  ✓ Verzeichnisse erstellt', fg='green'))
 
     # Step 4: Copy 404.html
@@ -84,7 +87,7 @@ def setup(ctx, skip_packages, with_wireguard, with_waf):
     dst_404.write_text(src_404.read_text())
     click.echo(click.style('  ✓ 404-Seite installiert', fg='green'))
 
-    # Step 5: Create dummy SSL certificate
+    # Step 5: Create dummy SSL certificate (ECDSA P-256 - cheaper handshakes for unknown hosts)
     click.echo('\n5. Erstelle selbstsigniertes Zertifikat...')
     dummy_cert = NGINX_SSL_DIR / 'dummy.crt'
     dummy_key = NGINX_SSL_DIR / 'dummy.key'
@@ -93,7 +96,7 @@ def setup(ctx, skip_packages, with_wireguard, with_waf):
         try:
             subprocess.run([
                 'openssl', 'req', '-x509', '-nodes', '-days', '365',
-                '-newkey', 'rsa:2048',
+                '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
                 '-keyout', str(dummy_key),
                 '-out', str(dummy_cert),
                 '-subj', '/C=DE/ST=RLP/L=Hauenstein/O=SoftENGINE GmbH/OU=IT/CN=SoftENGINE-Reverseproxy'
@@ -105,18 +108,14 @@ def setup(ctx, skip_packages, with_wireguard, with_waf):
     else:
         click.echo(click.style('  ✓ Zertifikat existiert bereits', fg='yellow'))
 
-    # Step 6: Create catch-all configuration
+    # Step 6: Create catch-all configuration (incl. ACME challenges for new hosts)
     click.echo('\n6. Erstelle Catch-All Konfiguration...')
-    env = Environment(loader=FileSystemLoader(str(TEMPLATE_DIR)))
-    template = env.get_template('catch-all.conf.j2')
-    content = template.render(
-        nginx_html_dir=NGINX_HTML_DIR,
-        dummy_cert=dummy_cert,
-        dummy_key=dummy_key
-    )
-
-    catch_all_conf = NGINX_CONF_DIR / 'catch-all.conf'
-    catch_all_conf.write_text(content)
+    nginx = NginxManager()
+    acme_snippet = nginx.snippet_path('acme')
+    acme_snippet.parent.mkdir(parents=True, exist_ok=True)
+    acme_snippet.write_text(nginx.render_snippet('acme'))
+    nginx.catch_all_conf.write_text(nginx.render_catch_all(dummy_cert, dummy_key))
+    CertbotManager().install_deploy_hook()
     click.echo(click.style('  ✓ Catch-All Konfiguration erstellt', fg='green'))
 
     # Step 7: Remove default configuration
@@ -0,0 +1,104 @@
+"""
+static command group - serve files of a proxy host directly from disk
+"""
+import sys
+from pathlib import Path
+
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core import static as static_core
+from nrp.commands.remove import complete_domains
+
+
+@click.group()
+def static():
+    """
+    Verwaltet statische Dateien, die NGINX direkt von Disk ausliefert
+
+    Statische Pfade werden mit 'nrp add ... --static PRÄFIX[=VERZEICHNIS]'
+    angelegt. Anfragen darunter erreichen weder Backend noch Tunnel.
+
+    Typischer Workflow:
+
+    \b
+        nrp static list app.example.com
+        nrp static sync app.example.com ./dist --delete
+    """
+    pass
+
+
+# ── list ──────────────────────────────────────────────────────────────────────
+
+@static.command(name="list")
+@click.argument("fqdn", shell_complete=complete_domains)
+def static_list(fqdn):
+    """
+    Zeigt die statischen Pfade eines Hosts
+
+    Beispiel:
+
+    \b
+        nrp static list app.example.com
+    """
+    locations = _load_locations(fqdn)
+    if not locations:
+        click.echo(f"Keine statischen Pfade für {fqdn} konfiguriert.")
+        return
+    click.echo(f"\n{'PRÄFIX':<24}VERZEICHNIS")
+    click.echo("─" * 64)
+    for prefix, directory in locations.items():
+        click.echo(f"{prefix:<24}{directory}")
+    click.echo()
+
+
+# ── sync ──────────────────────────────────────────────────────────────────────
+
+@static.command(name="sync")
+@click.argument("fqdn", shell_complete=complete_domains)
+@click.argument("src", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option("--prefix", default=None, help="Ziel-Präfix (nötig bei mehreren statischen Pfaden)")
+@click.option("--delete", is_flag=True, default=False, help="Dateien löschen, die in SRC nicht mehr vorhanden sind")
+def static_sync(fqdn, src, prefix, delete):
+    """
+    Kopiert neue und geänderte Dateien aus SRC in das statische Verzeichnis
+
+    Jede Datei wird atomar ersetzt; ein NGINX-Reload ist nicht nötig
+    (geänderte Dateien sind nach spätestens 60 s über open_file_cache
+    sichtbar).
+
+    Beispiele:
+
+    \b
+        nrp static sync app.example.com ./dist
+        nrp static sync app.example.com ./public --prefix /media/ --delete
+    """
+    try:
+        prefix, dest = static_core.resolve_target(_load_locations(fqdn), prefix)
+    except ValueError as e:
+        _fail(str(e))
+
+    try:
+        stats = static_core.sync(src, dest, delete=delete)
+    except OSError as e:
+        _fail(f"Synchronisation fehlgeschlagen: {e}")
+
+    click.echo(click.style(
+        f"✓ {prefix} → {dest}: {stats['copied']} kopiert, {stats['unchanged']} unverändert"
+        + (f", {stats['deleted']} gelöscht" if delete else ""),
+        fg="green"
+    ))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _load_locations(fqdn: str) -> dict:
+    params = NginxManager().read_host(fqdn)
+    if params is None:
+        _fail(f"Keine NRP-Konfiguration für {fqdn} gefunden.")
+    return params.get("static_locations") or {}
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
@@ -3,9 +3,12 @@ Status command - Show NGINX and certificate status
 """
 import click
 import subprocess
+from datetime import datetime
 
+from nrp.config import ACME_RENEW_DAYS
 from nrp.core.nginx import NginxManager
 from nrp.core.certbot import CertbotManager
+from nrp.core.certindex import CertIndex
 
 
 @click.command()
@@ -21,7 +24,6 @@ def status(detailed):
         nrp status --detailed
     """
     nginx = NginxManager()
-    certbot = CertbotManager()
 
     click.echo('\n=== NGINX Reverse Proxy Status ===\n')
 
@@ -47,6 +49,14 @@ def status(detailed):
     else:
         click.echo(click.style('  ✗ Ungültig', fg='red'))
 
+    # Reload coalescing counters
+    from nrp.core.reload import get_stats
+    reloads = get_stats()
+    click.echo(
+        f"  Reloads: {reloads['performed']} ausgeführt / {reloads['requested']} angefordert"
+        f" ({reloads['coalesced']} zusammengefasst, {reloads['failed']} fehlgeschlagen)"
+    )
+
     # Configured Hosts
     configs = nginx.list_configs()
     click.echo(f'\nKonfigurierte Hosts: {len(configs)}')
@@ -59,10 +69,20 @@ def status(detailed):
     # Certificates
     if detailed:
         click.echo('\n=== Zertifikate ===\n')
-        certs = certbot.list_certificates()
+        try:
+            certs = CertIndex().certificates()
+        except ValueError as e:
+            # Without cryptography: names from the live directory only
+            certs = [{'name': name} for name in CertbotManager().list_certificates()]
+            click.echo(click.style(f'  Ablaufdaten: {e}', fg='yellow'))
         if certs:
             for cert in certs:
-                click.echo(f'  • {cert}')
+                if 'not_after' not in cert:
+                    click.echo(f"  • {cert['name']}")
+                    continue
+                color = 'red' if cert['days'] < 7 else 'yellow' if cert['days'] < ACME_RENEW_DAYS else None
+                expiry = datetime.fromtimestamp(cert['not_after']).strftime('%d.%m.%Y')
+                click.echo(f"  • {cert['name']:<40}" + click.style(f"{expiry} ({cert['days']} Tage)", fg=color))
         else:
             click.echo('  Keine Zertifikate gefunden')
 
@@ -0,0 +1,162 @@
+"""
+tls command group - shared TLS profile and session ticket keys
+"""
+import sys
+import click
+
+from nrp.core.nginx import NginxManager
+from nrp.core import tls as tls_core
+from nrp.config import LETSENCRYPT_OPTIONS_SSL, TLS_SNIPPET
+
+
+@click.group()
+def tls():
+    """
+    Verwaltet das gemeinsame TLS-Profil aller Proxy-Hosts
+
+    Das Profil ersetzt options-ssl-nginx.conf von certbot durch
+    /etc/nginx/nrp/tls.conf mit Session-Cache, rotierenden
+    Ticket-Schlüsseln und angepasster ssl_buffer_size. Wiederkehrende
+    Clients sparen so den vollen (CPU-intensiven) Handshake.
+
+    Typischer Workflow:
+
+    \b
+        sudo nrp tls profile balanced
+        sudo nrp tls rotate-tickets     (z.B. alle 12 Stunden per Cron)
+        sudo nrp tls reset
+    """
+    pass
+
+
+# ── profile ───────────────────────────────────────────────────────────────────
+
+@tls.command(name="profile")
+@click.argument("name", required=False, type=click.Choice(list(tls_core.TLS_PROFILES)))
+def tls_profile(name):
+    """
+    Zeigt oder aktiviert ein TLS-Profil
+
+    Ohne NAME werden die Profile und das aktive Profil angezeigt. Beim
+    Aktivieren werden das Snippet und fehlende Ticket-Schlüssel erzeugt,
+    alle Hosts auf das Snippet umgestellt und NGINX einmal neu geladen.
+
+    Beispiele:
+
+    \b
+        nrp tls profile
+        sudo nrp tls profile balanced
+        sudo nrp tls profile strict
+    """
+    if name is None:
+        _show_profiles()
+        return
+
+    nginx = NginxManager()
+    profile = tls_core.TLS_PROFILES[name]
+    with nginx.transaction() as tx:
+        if profile["session_tickets"]:
+            keys = tls_core.read_ticket_keys()
+            if not all(keys):
+                _stage_ticket_keys(tx, tls_core.rotated_ticket_keys(keys))
+        tx.write(TLS_SNIPPET, tls_core.render_snippet(nginx.env, name))
+        switched = _stage_includes(nginx, tx, TLS_SNIPPET)
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+    click.echo(click.style(f"✓ TLS-Profil '{name}' aktiv", fg="green"))
+    if switched:
+        click.echo(f"  {switched} Host(s) auf {TLS_SNIPPET} umgestellt")
+
+
+# ── rotate-tickets ────────────────────────────────────────────────────────────
+
+@tls.command(name="rotate-tickets")
+def tls_rotate_tickets():
+    """
+    Erzeugt einen neuen Session-Ticket-Schlüssel
+
+    Der neue Schlüssel verschlüsselt ab sofort neue Tickets, die
+    bisherigen bleiben zum Entschlüsseln gültig. Regelmäßig ausführen,
+    z.B. per Cron:
+
+    \b
+        0 */12 * * * root /usr/local/bin/nrp tls rotate-tickets
+    """
+    profile = tls_core.active_profile()
+    if profile is None:
+        _fail("Kein TLS-Profil aktiv. Zuerst ausführen: sudo nrp tls profile balanced")
+    if not tls_core.TLS_PROFILES.get(profile, {}).get("session_tickets"):
+        _fail(f"Das TLS-Profil '{profile}' verwendet keine Session-Tickets.")
+
+    nginx = NginxManager()
+    with nginx.transaction() as tx:
+        _stage_ticket_keys(tx, tls_core.rotated_ticket_keys(tls_core.read_ticket_keys()))
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Schlüssel nicht rotiert")
+
+    click.echo(click.style("✓ Session-Ticket-Schlüssel rotiert", fg="green"))
+
+
+# ── reset ─────────────────────────────────────────────────────────────────────
+
+@tls.command(name="reset")
+def tls_reset():
+    """
+    Stellt alle Hosts wieder auf options-ssl-nginx.conf von certbot um
+    """
+    if not TLS_SNIPPET.exists():
+        click.echo("Kein TLS-Profil aktiv.")
+        return
+
+    nginx = NginxManager()
+    with nginx.transaction() as tx:
+        switched = _stage_includes(nginx, tx, LETSENCRYPT_OPTIONS_SSL)
+        tx.remove(TLS_SNIPPET)
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+
+    click.echo(click.style(f"✓ TLS-Profil entfernt, {switched} Host(s) nutzen wieder {LETSENCRYPT_OPTIONS_SSL}", fg="green"))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _show_profiles() -> None:
+    active = tls_core.active_profile()
+    col = (12, 8, 10, 9, 8)
+    click.echo("\n" + (
+        f"{'PROFIL':<{col[0]}}{'CACHE':<{col[1]}}{'TIMEOUT':<{col[2]}}"
+        f"{'TICKETS':<{col[3]}}{'BUFFER':<{col[4]}}BESCHREIBUNG"
+    ))
+    click.echo("─" * (sum(col) + 50))
+    for name, profile in tls_core.TLS_PROFILES.items():
+        label = f"{name}*" if name == active else name
+        click.echo(
+            f"{label:<{col[0]}}{profile['session_cache']:<{col[1]}}{profile['session_timeout']:<{col[2]}}"
+            f"{'ja' if profile['session_tickets'] else 'nein':<{col[3]}}{profile['buffer_size']:<{col[4]}}"
+            f"{profile['description']}"
+        )
+    click.echo(f"\nAktiv: {active or 'keins (options-ssl-nginx.conf von certbot)'}\n")
+
+
+def _stage_ticket_keys(tx, keys: list) -> None:
+    for index, key in enumerate(keys):
+        tx.write(tls_core.ticket_key_path(index), key, mode=0o600)
+
+
+def _stage_includes(nginx: NginxManager, tx, target) -> int:
+    """Stage every host configuration with its TLS include pointed to target."""
+    switched = 0
+    for fqdn in nginx.list_configs():
+        path = nginx.config_path(fqdn)
+        content = path.read_text()
+        updated = tls_core.switch_include(content, target)
+        if updated != content:
+            tx.write(path, updated)
+            switched += 1
+    return switched
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
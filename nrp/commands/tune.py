@@ -0,0 +1,153 @@
+"""
+tune command - size NGINX workers and OS limits for this machine
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+from nrp.config import NGINX_MAIN_CONF, SYSCTL_TUNING_CONF
+from nrp.core.nginx import NginxManager, write_atomic
+from nrp.core import cache as cache_core
+from nrp.core import tuning as tuning_core
+
+_SOMAXCONN = Path("/proc/sys/net/core/somaxconn")
+
+
+@click.command()
+@click.option("--apply", "apply_changes", is_flag=True, default=False, help="Empfehlungen schreiben und NGINX neu laden")
+def tune(apply_changes):
+    """
+    Dimensioniert NGINX-Worker und OS-Limits für diesen Server
+
+    Berücksichtigt CPU-Anzahl, Arbeitsspeicher, Anzahl der Hosts, WAF und
+    Cache-Zonen. Ohne --apply werden nur aktuelle und empfohlene Werte
+    angezeigt.
+
+    \b
+    Mit --apply werden geschrieben:
+        nginx.conf         worker_processes, worker_rlimit_nofile,
+                           worker_connections, multi_accept
+        catch-all.conf     listen ... backlog=N
+        http.d/tuning.conf server_names_hash_* (passt sich danach bei
+                           jedem nrp add/remove automatisch an; gleiche
+                           Direktiven in nginx.conf werden auskommentiert)
+        sysctl.d           net.core.somaxconn, tcp_max_syn_backlog,
+                           ip_local_port_range
+
+    Beispiele:
+
+    \b
+        nrp tune
+        sudo nrp tune --apply
+    """
+    nginx = NginxManager()
+    hosts = nginx.hosts()
+    fqdns = [host["fqdn"] for host in hosts]
+    resources = tuning_core.system_resources()
+    waf_hosts = sum(1 for host in hosts if host["waf"])
+    zone_bytes = _cache_zone_bytes(hosts)
+    settings = tuning_core.recommend(
+        resources["cpus"], resources["memory"], fqdns, waf_hosts=waf_hosts, cache_zone_bytes=zone_bytes
+    )
+
+    memory = cache_core.format_size(resources["memory"]) if resources["memory"] else "unbekannt"
+    click.echo(
+        f"\nCPUs: {resources['cpus']} · RAM: {memory} · Hosts: {len(fqdns)}"
+        f" · WAF: {waf_hosts} · Cache-Zonen: {cache_core.format_size(zone_bytes)}"
+    )
+    current = _current_values(nginx)
+    click.echo(f"\n{'EINSTELLUNG':<34}{'AKTUELL':<16}EMPFOHLEN")
+    click.echo("─" * 66)
+    for name in (
+        "worker_processes", "worker_connections", "worker_rlimit_nofile", "multi_accept",
+        "backlog", "somaxconn", "server_names_hash_bucket_size", "server_names_hash_max_size",
+    ):
+        click.echo(f"{name:<34}{current.get(name, '-'):<16}{settings[name]}")
+    click.echo(
+        f"\nMaximal gleichzeitige Clients: {settings['max_clients']} "
+        f"({settings['worker_processes']} Worker × {settings['worker_connections']} Verbindungen / 2)\n"
+    )
+
+    if not apply_changes:
+        click.echo("Übernehmen mit: sudo nrp tune --apply")
+        return
+
+    _require_root()
+    catch_all = nginx.conf_dir / "catch-all.conf"
+    with nginx.transaction() as tx:
+        if NGINX_MAIN_CONF.exists():
+            main_conf, released = tuning_core.release_http(
+                tuning_core.tune_main(NGINX_MAIN_CONF.read_text(), settings)
+            )
+            for line in released:
+                click.echo(click.style(
+                    f"Hinweis: '{line}' in {NGINX_MAIN_CONF} auskommentiert "
+                    f"(wird jetzt in {nginx.tuning_conf} gesetzt)",
+                    fg="yellow"
+                ))
+            tx.write(NGINX_MAIN_CONF, main_conf)
+        if catch_all.exists():
+            tx.write(catch_all, tuning_core.set_backlog(catch_all.read_text(), settings["backlog"]))
+        tx.write(nginx.tuning_conf, tuning_core.render_http(nginx.env, fqdns))
+        if not tx.commit():
+            _fail("NGINX-Konfiguration ist ungültig - Änderungen zurückgenommen")
+    click.echo(click.style("✓ NGINX-Konfiguration angepasst und neu geladen", fg="green"))
+
+    SYSCTL_TUNING_CONF.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(SYSCTL_TUNING_CONF, tuning_core.render_sysctl(nginx.env, settings))
+    try:
+        subprocess.run(["sysctl", "-p", str(SYSCTL_TUNING_CONF)], check=True, capture_output=True)
+        click.echo(click.style(f"✓ Kernel-Parameter gesetzt ({SYSCTL_TUNING_CONF})", fg="green"))
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        click.echo(click.style(
+            f"Hinweis: {SYSCTL_TUNING_CONF} geschrieben, konnte aber nicht geladen werden "
+            "(greift beim nächsten Neustart)",
+            fg="yellow"
+        ))
+
+
+# ── helper ────────────────────────────────────────────────────────────────────
+
+def _cache_zone_bytes(hosts: list) -> int:
+    total = 0
+    for host in hosts:
+        params = host["params"] or {}
+        zone = cache_core.zone_settings(host["fqdn"], params.get("cache_profile"), params.get("microcache"))
+        if zone:
+            total += tuning_core.size_bytes(zone["keys_zone_size"])
+    return total
+
+
+def _current_values(nginx: NginxManager) -> dict:
+    values = {}
+    if NGINX_MAIN_CONF.exists():
+        main_conf = NGINX_MAIN_CONF.read_text()
+        values.update(tuning_core.read_main(main_conf))
+        values.update(tuning_core.read_http(main_conf))
+    catch_all = nginx.conf_dir / "catch-all.conf"
+    if catch_all.exists():
+        backlog = tuning_core.read_backlog(catch_all.read_text())
+        if backlog:
+            values["backlog"] = str(backlog)
+    if nginx.tuning_conf.exists():
+        values.update(tuning_core.read_http(nginx.tuning_conf.read_text()))
+    try:
+        values["somaxconn"] = _SOMAXCONN.read_text().strip()
+    except OSError:
+        pass
+    return values
+
+
+def _require_root():
+    if os.geteuid() != 0:
+        click.echo(click.style("Fehler: Dieser Befehl muss als root ausgeführt werden.", fg="red"))
+        click.echo("Bitte verwenden Sie: sudo nrp tune --apply")
+        sys.exit(1)
+
+
+def _fail(message: str) -> None:
+    click.echo(click.style(f"Fehler: {message}", fg="red"))
+    sys.exit(1)
@@ -7,12 +7,73 @@ from pathlib import Path
 NGINX_CONF_DIR = Path("/etc/nginx/conf.d")
 NGINX_HTML_DIR = Path("/usr/share/nginx/html")
 NGINX_SSL_DIR = Path("/etc/nginx/ssl")
+# NRP-managed NGINX includes (upstreams, snippets) outside of conf.d
+NRP_NGINX_DIR = Path("/etc/nginx/nrp")
+NGINX_UPSTREAM_DIR = NRP_NGINX_DIR / "upstreams"
+# Shared http-level includes (limits, tuning), pulled in by one file in conf.d
+NGINX_HTTP_DIR = NRP_NGINX_DIR / "http.d"
+NGINX_HTTP_INCLUDE = NGINX_CONF_DIR / "nrp-http.conf"
+LIMITS_CONF = NGINX_HTTP_DIR / "limits.conf"
+# limit_req/limit_conn zones are sized for this many concurrent keys (client per host)
+LIMIT_EXPECTED_KEYS = 100000
+TUNING_CONF = NGINX_HTTP_DIR / "tuning.conf"
+# nrp tune: main configuration (worker settings) and kernel parameters
+NGINX_MAIN_CONF = Path("/etc/nginx/nginx.conf")
+SYSCTL_TUNING_CONF = Path("/etc/sysctl.d/99-nrp-tuning.conf")
+# "files": own server blocks per host; "map": hosts without special settings
+# share one routing file (for thousands of hosts, see nrp routing)
+ROUTING_MODE = "files"
+ROUTES_CONF = NGINX_CONF_DIR / "nrp-routes.conf"
+# One port-80 server (HTTPS redirect, ACME challenges) for all hosts on port 443
+REDIRECT_CONF = NGINX_CONF_DIR / "nrp-redirect.conf"
+ACME_WEBROOT = Path("/var/www/nrp-acme")
+# Versioned include snippets shared by all host files (nrp-<name>-v<N>.conf)
+NGINX_SNIPPET_DIR = NRP_NGINX_DIR / "snippets"
+# Files in conf.d that are no proxy hosts
+NGINX_RESERVED_CONFS = {"catch-all.conf", "nrp-http.conf", "nrp-routes.conf", "nrp-redirect.conf"}
+# Shared TLS profile (nrp tls profile) and session ticket keys
+TLS_SNIPPET = NRP_NGINX_DIR / "tls.conf"
+TLS_TICKET_DIR = NRP_NGINX_DIR / "tickets"
+TLS_TICKET_KEYS = 3  # current key + previous keys still accepted for decryption
+# Per-host proxy caches (one subdirectory per FQDN)
+NGINX_CACHE_DIR = Path("/var/cache/nginx/nrp")
+# Static asset offload (nrp add --static): default directories and browser cache lifetime
+NRP_STATIC_DIR = Path("/var/www/nrp")
+DEFAULT_STATIC_EXPIRES = "30d"
+# Optional brotli filter module (libnginx-mod-http-brotli-filter), used by compression profiles
+BROTLI_MODULE_PATH = Path("/usr/lib/nginx/modules/ngx_http_brotli_filter_module.so")
+NGINX_MODULES_ENABLED_DIR = Path("/etc/nginx/modules-enabled")
+# Staging area for config transactions (same filesystem as conf.d for atomic renames)
+NGINX_STAGING_DIR = Path("/etc/nginx/.nrp-staging")
+# Reload requests within this window (seconds) are coalesced into one 'nginx -s reload'
+NGINX_RELOAD_WINDOW = 1.0
 
 # LetsEncrypt Configuration
 LETSENCRYPT_DIR = Path("/etc/letsencrypt")
 LETSENCRYPT_LIVE_DIR = LETSENCRYPT_DIR / "live"
 LETSENCRYPT_OPTIONS_SSL = LETSENCRYPT_DIR / "options-ssl-nginx.conf"
 LETSENCRYPT_SSL_DHPARAM = LETSENCRYPT_DIR / "ssl-dhparams.pem"
+# Certificates are issued via ACME_WEBROOT (certbot --webroot); renewals reload NGINX through this hook
+CERTBOT_DEPLOY_HOOK = LETSENCRYPT_DIR / "renewal-hooks" / "deploy" / "nrp-reload-nginx"
+DEFAULT_KEY_TYPE = "ecdsa"  # rsa or ecdsa (P-256, cheaper handshakes)
+# Certificate job queue (nrp cert run): parallel workers (native ACME engine;
+# certbot issues one at a time), issued certificates
+# activated per config transaction (one reload), retries with doubling delay
+CERT_WORKERS = 4
+CERT_ACTIVATE_BATCH = 20
+CERT_MAX_ATTEMPTS = 5
+CERT_RETRY_DELAY = 60
+# Let's Encrypt rate limits: certificates per registered domain and week,
+# new orders per account and 3 hours, failed validations per hostname and hour
+LE_CERTS_PER_DOMAIN = 50
+LE_ORDERS_PER_ACCOUNT = 300
+LE_FAILED_PER_HOST = 5
+# ACME engine of the certificate queue: "certbot" (one certbot call at a time) or
+# "native" (built-in asyncio client, parallel orders; pip install 'nrp[acme]')
+ACME_ENGINE = "certbot"
+ACME_DIRECTORY_URL = "https://acme-v02.api.letsencrypt.org/directory"
+# Certificates of the native engine are renewed by nrp cert renew this many days before expiry
+ACME_RENEW_DAYS = 30
 
 # Remote Execution Settings
 DEFAULT_REMOTE_USER = "autonginx"
@@ -24,6 +85,14 @@ TEMPLATE_DIR = Path(__file__).parent / "templates"
 # Default Values
 DEFAULT_CLIENT_MAX_BODY_SIZE = "100M"
 DEFAULT_HSTS_MAX_AGE = 31536000  # 1 year in seconds
+DEFAULT_UPSTREAM_KEEPALIVE = 16  # idle backend connections kept open per worker (0 = off)
+DEFAULT_LB_METHOD = "round-robin"  # round-robin, least_conn, ip_hash, hash
+DEFAULT_HASH_KEY = "$remote_addr"
+DEFAULT_BACKEND_MAX_FAILS = 1
+DEFAULT_BACKEND_FAIL_TIMEOUT = "10s"
+# Global defaults for new hosts, overridable per host (nrp add --http2/--http3)
+DEFAULT_HTTP2 = True
+DEFAULT_HTTP3 = False  # requires NGINX >= 1.25 built with --with-http_v3_module and UDP port open
 
 # WireGuard Configuration
 WG_OVERLAY_CIDR = "10.240.0.0/16"
@@ -34,6 +103,17 @@ WG_PORT = 51825
 # NRP Data Directory (Site DB etc.)
 NRP_DATA_DIR = Path("/var/lib/nrp")
 SITES_DB_PATH = NRP_DATA_DIR / "sites.json"
+# Indexed host parameters (nrp list, nrp waf status), kept in sync by config transactions
+HOSTS_DB_PATH = NRP_DATA_DIR / "hosts.db"
+CERT_QUEUE_PATH = NRP_DATA_DIR / "cert-queue.db"
+CERTBOT_LOCK_PATH = NRP_DATA_DIR / "certbot.lock"
+# Certificate inventory (nrp cert list, nrp status --detailed), rebuilt from the PEM files
+CERT_INDEX_PATH = NRP_DATA_DIR / "cert-index.db"
+ACME_ACCOUNT_KEY = NRP_DATA_DIR / "acme-account.key"
+RELOAD_LOCK_PATH = NRP_DATA_DIR / "reload.lock"
+RELOAD_STATE_PATH = NRP_DATA_DIR / "reload.json"
+# Compiled templates (invalidated per template by its source checksum)
+TEMPLATE_CACHE_DIR = NRP_DATA_DIR / "template-cache"
 
 # Fail2Ban Configuration
 F2B_JAIL_DIR = Path("/etc/fail2ban/jail.d")
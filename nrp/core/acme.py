@@ -0,0 +1,550 @@
+"""
+Built-in ACME v2 client (ACME_ENGINE = "native", nrp cert run --acme-engine native)
+
+Every certbot call starts a Python interpreter and takes certbot's lock on
+/etc/letsencrypt, so certificates are issued one after the other. This
+client runs many orders at once on one asyncio event loop:
+
+    - one account key (ACME_ACCOUNT_KEY), registered once per run
+    - keep-alive HTTP/1.1 connections shared by all orders
+    - nonces taken from every response instead of a HEAD per request
+    - http-01 challenges answered from ACME_WEBROOT (see nrp.core.snippets),
+      so issuing needs no NGINX reload
+
+Certificates are written in certbot's layout (archive/<name>/*N.pem with
+symlinks in live/<name>/), so host files keep referencing
+LETSENCRYPT_LIVE_DIR/<fqdn>/fullchain.pem and privkey.pem. certbot does
+not know these certificates: 'nrp cert renew' renews them.
+
+Needs the optional 'cryptography' package: pip install 'nrp[acme]'.
+"""
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from nrp.config import (
+    ACME_ACCOUNT_KEY,
+    ACME_DIRECTORY_URL,
+    ACME_ENGINE,
+    ACME_WEBROOT,
+    DEFAULT_KEY_TYPE,
+    LETSENCRYPT_LIVE_DIR,
+)
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+    from cryptography.x509.oid import NameOID
+except ImportError:  # optional dependency, checked by NativeIssuer
+    x509 = None
+
+CRYPTOGRAPHY_MISSING = "Die native ACME-Engine benötigt cryptography: pip install 'nrp[acme]'"
+
+_BAD_NONCE = "urn:ietf:params:acme:error:badNonce"
+_CHALLENGE_DIR = Path(".well-known") / "acme-challenge"
+
+
+class AcmeError(Exception):
+    """Problem document of the CA or a failed order"""
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body or b"{}")
+
+
+class HttpClient:
+    """
+    Minimal asyncio HTTP/1.1 client that keeps connections open
+
+    Idle connections are kept per (scheme, host, port) and reused by the
+    next request; concurrent requests open further connections.
+
+    Args:
+        ssl_context: Context for https (default: system trust store)
+    """
+
+    def __init__(self, ssl_context: Optional[ssl.SSLContext] = None):
+        self.ssl_context = ssl_context
+        self.opened = 0
+        self._idle: Dict[tuple, List[tuple]] = {}
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        parts = urllib.parse.urlsplit(url)
+        https = parts.scheme == "https"
+        key = (parts.scheme, parts.hostname, parts.port or (443 if https else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", "User-Agent: nrp-acme"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        lines.append(f"Content-Length: {len(body or b'')}")
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode() + (body or b"")
+
+        while True:
+            idle = self._idle.get(key)
+            connection = idle.pop() if idle else None
+            reused = connection is not None
+            if connection is None:
+                connection = await self._open(key, https)
+            reader, writer = connection
+            try:
+                writer.write(data)
+                await writer.drain()
+                response, reusable = await self._read(reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                if reused:
+                    continue  # keep-alive connection closed by the server meanwhile
+                raise
+            if reusable:
+                self._idle.setdefault(key, []).append(connection)
+            else:
+                writer.close()
+            return response
+
+    async def close(self) -> None:
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def _open(self, key: tuple, https: bool) -> tuple:
+        _, host, port = key
+        context = (self.ssl_context or ssl.create_default_context()) if https else None
+        self.opened += 1
+        return await asyncio.open_connection(host, port, ssl=context)
+
+    @staticmethod
+    async def _read(reader: asyncio.StreamReader, method: str) -> Tuple[Response, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed")
+        version, status = status_line.decode("latin-1").split()[:2]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in ("204", "304"):
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body, reusable = await reader.read(), False
+        return Response(int(status), headers, body), reusable
+
+
+class AcmeClient:
+    """
+    ACME v2 (RFC 8555) client for http-01 certificates
+
+    One instance serves any number of concurrent issue() calls on the
+    event loop it is used from.
+
+    Args:
+        directory_url: ACME directory of the CA
+        account_key: PEM file of the account key (created if missing)
+        webroot: Directory the challenge location serves (ACME_WEBROOT)
+        http: HTTP client (default: new HttpClient)
+        poll_interval: Seconds between status polls without Retry-After
+        timeout: Seconds an authorization or order may take
+    """
+
+    def __init__(
+        self,
+        directory_url: str = ACME_DIRECTORY_URL,
+        account_key: Path = ACME_ACCOUNT_KEY,
+        webroot: Path = ACME_WEBROOT,
+        http: Optional[HttpClient] = None,
+        poll_interval: float = 2.0,
+        timeout: float = 120.0
+    ):
+        if x509 is None:
+            raise ValueError(CRYPTOGRAPHY_MISSING)
+        self.directory_url = directory_url
+        self.account_key_path = account_key
+        self.webroot = webroot
+        self.http = http or HttpClient()
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._key = _load_or_create_key(account_key)
+        self._jwk = _jwk(self._key)
+        self._thumbprint = _b64(hashlib.sha256(_canonical(self._jwk)).digest())
+        self._directory: Optional[dict] = None
+        self._kid: Optional[str] = None
+        self._nonces: List[str] = []
+        self._account_lock = asyncio.Lock()
+
+    async def issue(
+        self,
+        fqdn: str,
+        key_type: Optional[str] = None,
+        email: Optional[str] = None,
+        sans: Optional[List[str]] = None
+    ) -> Tuple[bytes, bytes]:
+        """
+        Order and download a certificate for one host
+
+        Args:
+            fqdn: Fully qualified domain name (common name)
+            key_type: rsa or ecdsa (P-256); default: DEFAULT_KEY_TYPE
+            email: Contact of the account, used when it is registered
+            sans: Names of the certificate (fqdn first), default: fqdn only
+
+        Returns:
+            (private key PEM, certificate chain PEM)
+
+        Raises:
+            AcmeError: If the CA rejects the order or validation fails
+        """
+        names = sans or [fqdn]
+        await self._account(email)
+        response = await self._post(
+            (await self._urls())["newOrder"], {"identifiers": [{"type": "dns", "value": name} for name in names]}
+        )
+        order_url, order = response.headers["location"], response.json()
+
+        for authz_url in order["authorizations"]:
+            await self._authorize(authz_url)
+
+        key = await asyncio.get_running_loop().run_in_executor(None, _generate_key, key_type or DEFAULT_KEY_TYPE)
+        csr = (
+            x509.CertificateSigningRequestBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, fqdn)]))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(name) for name in names]), critical=False)
+            .sign(key, hashes.SHA256())
+        )
+        await self._post(order["finalize"], {"csr": _b64(csr.public_bytes(serialization.Encoding.DER))})
+        order = await self._poll(order_url, ("pending", "ready", "processing"))
+        if order["status"] != "valid":
+            raise AcmeError(f"{fqdn}: order {order['status']}{_problem_text(order.get('error'))}")
+
+        chain = await self._post(order["certificate"], None, accept="application/pem-certificate-chain")
+        key_pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        return key_pem, chain.body
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    async def _authorize(self, authz_url: str) -> None:
+        authz = (await self._post(authz_url, None)).json()
+        if authz["status"] == "valid":
+            return
+        fqdn = authz["identifier"]["value"]
+        challenge = next((c for c in authz["challenges"] if c["type"] == "http-01"), None)
+        if challenge is None:
+            raise AcmeError(f"{fqdn}: CA offers no http-01 challenge")
+
+        token_file = self.webroot / _CHALLENGE_DIR / challenge["token"]
+        token_file.parent.mkdir(parents=True, exist_ok=True)
+        token_file.write_text(f"{challenge['token']}.{self._thumbprint}")
+        try:
+            await self._post(challenge["url"], {})
+            authz = await self._poll(authz_url, ("pending",))
+        finally:
+            token_file.unlink(missing_ok=True)
+        if authz["status"] != "valid":
+            errors = [c.get("error") for c in authz.get("challenges", []) if c.get("error")]
+            raise AcmeError(f"{fqdn}: validation {authz['status']}{_problem_text(errors[0] if errors else None)}")
+
+    async def _poll(self, url: str, waiting: tuple) -> dict:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            response = await self._post(url, None)
+            resource = response.json()
+            if resource["status"] not in waiting:
+                return resource
+            if time.monotonic() > deadline:
+                raise AcmeError(f"{url}: still {resource['status']} after {self.timeout:.0f}s")
+            await asyncio.sleep(_retry_after(response.headers.get("retry-after"), self.poll_interval))
+
+    async def _urls(self) -> dict:
+        if self._directory is None:
+            response = await self.http.request("GET", self.directory_url)
+            if response.status != 200:
+                raise AcmeError(f"{self.directory_url}: HTTP {response.status}")
+            self._directory = response.json()
+        return self._directory
+
+    async def _account(self, email: Optional[str]) -> None:
+        async with self._account_lock:
+            if self._kid is not None:
+                return
+            payload = {"termsOfServiceAgreed": True}
+            if email:
+                payload["contact"] = [f"mailto:{email}"]
+            response = await self._post((await self._urls())["newAccount"], payload, use_jwk=True)
+            self._kid = response.headers["location"]
+
+    async def _nonce(self) -> str:
+        if self._nonces:
+            return self._nonces.pop()
+        response = await self.http.request("HEAD", (await self._urls())["newNonce"])
+        return response.headers["replay-nonce"]
+
+    async def _post(
+        self,
+        url: str,
+        payload: Optional[dict],
+        use_jwk: bool = False,
+        accept: Optional[str] = None
+    ) -> Response:
+        """Signed POST (payload None = POST-as-GET), retried once on badNonce."""
+        for attempt in (1, 2):
+            protected = {"alg": "ES256", "nonce": await self._nonce(), "url": url}
+            if use_jwk:
+                protected["jwk"] = self._jwk
+            else:
+                protected["kid"] = self._kid
+            body = _jws(self._key, protected, payload)
+            headers = {"Content-Type": "application/jose+json"}
+            if accept:
+                headers["Accept"] = accept
+            response = await self.http.request("POST", url, body, headers)
+            if "replay-nonce" in response.headers:
+                self._nonces.append(response.headers["replay-nonce"])
+            if response.status < 400:
+                return response
+            problem = response.json() if response.body else {}
+            if problem.get("type") == _BAD_NONCE and attempt == 1:
+                continue
+            raise AcmeError(f"{url}: HTTP {response.status}{_problem_text(problem)}")
+
+
+class NativeIssuer:
+    """
+    Issues certificates from worker threads through one AcmeClient
+
+    The client runs on its own event loop thread; issue() has the same
+    signature as CertbotManager.issue(), so the certificate queue can use
+    either engine. Orders from all workers share the account, the HTTP
+    connections and the nonces.
+
+    Args:
+        live_dir: LETSENCRYPT_LIVE_DIR (archive/ is created next to it)
+        client_options: Further AcmeClient arguments
+
+    Raises:
+        ValueError: If cryptography is not installed
+    """
+
+    # Orders run concurrently, the pool size is up to the caller
+    max_workers: Optional[int] = None
+
+    def __init__(self, live_dir: Path = LETSENCRYPT_LIVE_DIR, **client_options):
+        if x509 is None:
+            raise ValueError(CRYPTOGRAPHY_MISSING)
+        self.live_dir = live_dir
+        self.client_options = client_options
+        self.client: Optional[AcmeClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "NativeIssuer":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="nrp-acme", daemon=True)
+        self._thread.start()
+        try:
+            self.client = self._call(self._create_client())
+        except BaseException:
+            # __exit__ does not run when __enter__ raises
+            self._stop_loop()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.client is not None:
+            self._call(self.client.close())
+        self._stop_loop()
+
+    def issue(
+        self,
+        fqdn: str,
+        email: Optional[str] = None,
+        key_type: Optional[str] = None,
+        sans: Optional[List[str]] = None
+    ) -> Tuple[bool, str]:
+        """
+        Request SSL certificate for domain and store it in the live layout
+
+        Returns:
+            (success, path of the certificate or error message)
+        """
+        try:
+            key_pem, chain_pem = self._call(self.client.issue(fqdn, key_type, email, sans))
+            live = store_certificate(self.live_dir, fqdn, key_pem, chain_pem)
+        except (AcmeError, OSError, ValueError, KeyError) as e:
+            return False, str(e)
+        return True, f"Zertifikat gespeichert: {live}"
+
+    async def _create_client(self) -> AcmeClient:
+        # created on the loop thread, so its asyncio.Lock belongs to that loop
+        return AcmeClient(**self.client_options)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _stop_loop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def open_issuer(engine: str = ACME_ENGINE):
+    """
+    Issuer for the certificate queue as a context manager
+
+    Args:
+        engine: "certbot" (subprocess, one at a time) or "native" (NativeIssuer)
+
+    Raises:
+        ValueError: If the native engine is selected without cryptography
+    """
+    if engine == "native":
+        return NativeIssuer()
+    from nrp.core.certbot import CertbotManager
+    return contextlib.nullcontext(CertbotManager())
+
+
+def pool_size(issuer, workers: int) -> int:
+    """Workers for certqueue.run() with this issuer (certbot: one)."""
+    return min(workers, issuer.max_workers or workers)
+
+
+def store_certificate(live_dir: Path, name: str, key_pem: bytes, chain_pem: bytes) -> Path:
+    """
+    Write a certificate in certbot's layout
+
+    archive/<name>/{cert,chain,fullchain,privkey}N.pem with the next free N,
+    then the symlinks in live/<name>/ are replaced one by one (rename), so
+    NGINX never sees a missing file.
+
+    Returns:
+        live/<name> directory
+    """
+    archive = live_dir.parent / "archive" / name
+    live = live_dir / name
+    archive.mkdir(parents=True, exist_ok=True)
+    live.mkdir(parents=True, exist_ok=True)
+    version = 1 + max(
+        (int(path.stem[len("cert"):]) for path in archive.glob("cert*.pem") if path.stem[len("cert"):].isdigit()),
+        default=0
+    )
+
+    blocks = [block + b"-----END CERTIFICATE-----\n" for block in chain_pem.split(b"-----END CERTIFICATE-----")[:-1]]
+    blocks = [block.lstrip(b"\r\n") for block in blocks]
+    if not blocks:
+        raise ValueError(f"{name}: empty certificate chain")
+    files = {
+        "cert": blocks[0],
+        "chain": b"".join(blocks[1:]),
+        "fullchain": b"".join(blocks),
+        "privkey": key_pem,
+    }
+    for kind, content in files.items():
+        target = archive / f"{kind}{version}.pem"
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600 if kind == "privkey" else 0o644)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(content)
+    for kind in files:
+        link = live / f"{kind}.pem"
+        tmp = live / f".{kind}.pem.tmp"
+        tmp.unlink(missing_ok=True)
+        tmp.symlink_to(os.path.relpath(archive / f"{kind}{version}.pem", live))
+        os.replace(tmp, link)
+    return live
+
+
+def _load_or_create_key(path: Path):
+    if path.exists():
+        return serialization.load_pem_private_key(path.read_bytes(), password=None)
+    key = ec.generate_private_key(ec.SECP256R1())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return key
+
+
+def _generate_key(key_type: str):
+    if key_type == "rsa":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+def _jwk(key) -> dict:
+    numbers = key.public_key().public_numbers()
+    return {
+        "crv": "P-256",
+        "kty": "EC",
+        "x": _b64(numbers.x.to_bytes(32, "big")),
+        "y": _b64(numbers.y.to_bytes(32, "big")),
+    }
+
+
+def _jws(key, protected: dict, payload: Optional[dict]) -> bytes:
+    protected_b64 = _b64(json.dumps(protected).encode())
+    payload_b64 = "" if payload is None else _b64(json.dumps(payload).encode())
+    r, s = decode_dss_signature(key.sign(f"{protected_b64}.{payload_b64}".encode(), ec.ECDSA(hashes.SHA256())))
+    signature = r.to_bytes(32, "big") + s.to_bytes(32, "big")
+    return json.dumps({"protected": protected_b64, "payload": payload_b64, "signature": _b64(signature)}).encode()
+
+
+def _canonical(jwk: dict) -> bytes:
+    return json.dumps(jwk, sort_keys=True, separators=(",", ":")).encode()
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _retry_after(value: Optional[str], default: float) -> float:
+    """Seconds from a Retry-After header (delta seconds), capped at 10."""
+    try:
+        return min(max(float(value), 0.0), 10.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _problem_text(problem: Optional[dict]) -> str:
+    if not problem:
+        return ""
+    return f": {problem.get('detail', '')} ({problem.get('type', 'unknown')})"
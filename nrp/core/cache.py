@@ -0,0 +1,179 @@
+"""
+Per-host response caching (proxy_cache) - profiles, statistics and purge
+
+Every host with caching gets its own size-bounded zone and directory
+below NGINX_CACHE_DIR. NGINX OSS has no purge API, so purging works on
+the cache files directly: each file carries its cache key in a
+'KEY: ...' line of its header.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from nrp.config import NGINX_CACHE_DIR
+
+# keys_zone: 1 MB holds about 8000 keys
+CACHE_PROFILES = {
+    "small": {
+        "keys_zone_size": "10m",
+        "max_size": "256m",
+        "inactive": "30m",
+        "valid": "5m",
+        "description": "Kleine Sites, wenig Speicherplatz (256 MB)",
+    },
+    "default": {
+        "keys_zone_size": "32m",
+        "max_size": "1g",
+        "inactive": "60m",
+        "valid": "10m",
+        "description": "Ausgewogen für typische Web-Apps (1 GB)",
+    },
+    "large": {
+        "keys_zone_size": "128m",
+        "max_size": "10g",
+        "inactive": "7d",
+        "valid": "1h",
+        "description": "Große statische Bestände, lange Vorhaltezeit (10 GB)",
+    },
+}
+
+CACHE_LEVELS = "1:2"
+
+# Microcaching: seconds a response may be served from cache, and the zone
+# used when no cache profile is given
+MICROCACHE_MAX_SECONDS = 60
+MICROCACHE_PROFILE = "small"
+
+# Only the header of a cache file is read when searching for its key
+_HEADER_READ_SIZE = 4096
+
+
+def cache_path(fqdn: str) -> Path:
+    """Cache directory of a host."""
+    return NGINX_CACHE_DIR / fqdn
+
+
+def zone_name(fqdn: str) -> str:
+    """Name of the shared memory zone of a host."""
+    return f"nrp_cache_{fqdn}"
+
+
+def zone_settings(fqdn: str, profile: Optional[str], microcache: Optional[int] = None) -> Optional[Dict]:
+    """
+    Template variables for a host's cache zone
+
+    Args:
+        fqdn: Fully qualified domain name
+        profile: Name of a CACHE_PROFILES entry, or None for no caching
+        microcache: Cache responses for only this many seconds, bypassed
+                    for requests with cookies or credentials (None = off)
+
+    Returns:
+        Dict with zone, path, levels and the profile values, or None
+
+    Raises:
+        ValueError: On an unknown profile or microcache value out of range
+    """
+    if microcache:
+        if not 1 <= int(microcache) <= MICROCACHE_MAX_SECONDS:
+            raise ValueError(
+                f"Ungültige Microcache-Dauer: {microcache} (1-{MICROCACHE_MAX_SECONDS} Sekunden)"
+            )
+        profile = profile or MICROCACHE_PROFILE
+    if not profile:
+        return None
+    if profile not in CACHE_PROFILES:
+        raise ValueError(f"Unbekanntes Cache-Profil: {profile}")
+    settings = {
+        "zone": zone_name(fqdn),
+        "path": cache_path(fqdn),
+        "levels": CACHE_LEVELS,
+        **CACHE_PROFILES[profile],
+        "microcache": int(microcache) if microcache else None,
+    }
+    if microcache:
+        settings["valid"] = f"{int(microcache)}s"
+    return settings
+
+
+def _cache_files(fqdn: str):
+    directory = cache_path(fqdn)
+    if not directory.exists():
+        return
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            yield Path(root) / name
+
+
+def read_key(path: Path) -> Optional[str]:
+    """Extract the cache key from the header of a cache file."""
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER_READ_SIZE)
+    except OSError:
+        return None
+    start = header.find(b"\nKEY: ")
+    if start < 0:
+        return None
+    end = header.find(b"\n", start + 6)
+    return header[start + 6:end if end >= 0 else None].decode("utf-8", "replace")
+
+
+def get_stats(fqdn: str) -> Dict:
+    """
+    Disk usage and entry count of a host's cache directory
+
+    Returns:
+        Dict with path, exists, entries and size_bytes
+    """
+    entries = 0
+    size = 0
+    for path in _cache_files(fqdn):
+        try:
+            size += path.stat().st_blocks * 512
+        except OSError:
+            continue
+        entries += 1
+    return {
+        "path": str(cache_path(fqdn)),
+        "exists": cache_path(fqdn).exists(),
+        "entries": entries,
+        "size_bytes": size,
+    }
+
+
+def purge(fqdn: str, prefix: Optional[str] = None) -> int:
+    """
+    Delete cached responses of a host
+
+    Args:
+        fqdn: Fully qualified domain name
+        prefix: Only delete entries whose URI starts with this prefix
+                (e.g. '/static/'); None deletes everything
+
+    Returns:
+        Number of deleted cache files
+    """
+    key_prefix = f"https{fqdn}{prefix}" if prefix else None
+    removed = 0
+    for path in _cache_files(fqdn):
+        if key_prefix is not None:
+            key = read_key(path)
+            if key is None or not key.startswith(key_prefix):
+                continue
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            # Evicted by the cache manager in the meantime
+            continue
+    return removed
+
+
+def format_size(size: int) -> str:
+    """Human readable byte count."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
@@ -1,25 +1,81 @@
 """
 Certbot/LetsEncrypt operations
 """
+import fcntl
 import subprocess
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from nrp.config import (
+    ACME_WEBROOT,
+    CERTBOT_DEPLOY_HOOK,
+    CERTBOT_LOCK_PATH,
+    LETSENCRYPT_LIVE_DIR,
+    DEFAULT_KEY_TYPE
+)
+from nrp.core.nginx import write_atomic
+
+# Run by 'certbot renew' only, not on the first issuance
+DEPLOY_HOOK = "#!/bin/sh\n# Generated by NRP - lädt NGINX nach erneuerten Zertifikaten neu\nnginx -t -q && nginx -s reload\n"
 
 
 class CertbotManager:
     """Manages LetsEncrypt certificate operations"""
 
-    def request_certificate(self, fqdn: str, email: Optional[str] = None) -> bool:
+    # certbot allows one instance per configuration directory (certqueue.run)
+    max_workers = 1
+
+    def request_certificate(self, fqdn: str, email: Optional[str] = None, key_type: Optional[str] = None) -> bool:
         """
         Request SSL certificate for domain
 
+        Uses 'certbot certonly --webroot': the challenge is answered from
+        ACME_WEBROOT by the ACME location NGINX already serves on port 80,
+        so NGINX is neither edited nor reloaded.
+
         Args:
             fqdn: Fully qualified domain name
             email: Email for certificate notifications (optional)
+            key_type: rsa or ecdsa (P-256); default: DEFAULT_KEY_TYPE
 
         Returns:
             True if successful, False otherwise
         """
-        cmd = ["certbot", "--nginx", "-d", fqdn, "--non-interactive"]
+        ok, output = self.issue(fqdn, email, key_type)
+        print(output if ok else f"Error requesting certificate:\n{output}")
+        return ok
+
+    def issue(
+        self,
+        fqdn: str,
+        email: Optional[str] = None,
+        key_type: Optional[str] = None,
+        sans: Optional[List[str]] = None
+    ) -> Tuple[bool, str]:
+        """
+        Request SSL certificate for domain without printing (certificate queue workers)
+
+        sans (fqdn first, default: fqdn only) are the names of the
+        certificate; it is stored under fqdn either way.
+
+        certbot allows one instance per configuration directory, so the
+        certificate queue runs one worker (max_workers) and callers in other
+        processes wait on CERTBOT_LOCK_PATH instead of failing with "Another
+        instance of Certbot is already running".
+
+        Returns:
+            (success, certbot output or error message)
+        """
+        key_type = key_type or DEFAULT_KEY_TYPE
+        ACME_WEBROOT.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "certbot", "certonly", "--webroot", "-w", str(ACME_WEBROOT),
+            "--cert-name", fqdn, "--key-type", key_type, "--non-interactive"
+        ]
+        for name in sans or [fqdn]:
+            cmd.extend(["-d", name])
+        if key_type == "ecdsa":
+            cmd.extend(["--elliptic-curve", "secp256r1"])
 
         if email:
             cmd.extend(["--email", email, "--agree-tos"])
@@ -27,18 +83,48 @@ class CertbotManager:
             cmd.append("--register-unsafely-without-email")
             cmd.append("--agree-tos")
 
-        try:
-            result = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            print(result.stdout)
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error requesting certificate:\n{e.stderr}")
-            return False
+        CERTBOT_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(CERTBOT_LOCK_PATH, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                result = subprocess.run(
+                    cmd,
+                    check=True,
+                    capture_output=True,
+                    text=True
+                )
+                return True, result.stdout
+            except subprocess.CalledProcessError as e:
+                return False, e.stderr
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def install_deploy_hook(self) -> Path:
+        """
+        Install the renewal hook that reloads NGINX (CERTBOT_DEPLOY_HOOK)
+
+        Certificates issued with --webroot do not reload NGINX on their own.
+
+        Returns:
+            Path of the hook
+        """
+        CERTBOT_DEPLOY_HOOK.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(CERTBOT_DEPLOY_HOOK, DEPLOY_HOOK)
+        CERTBOT_DEPLOY_HOOK.chmod(0o755)
+        return CERTBOT_DEPLOY_HOOK
+
+    def has_certificate(self, fqdn: str) -> bool:
+        """
+        Check if a certificate for the domain is present
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            True if fullchain and private key exist, False otherwise
+        """
+        live_dir = LETSENCRYPT_LIVE_DIR / fqdn
+        return (live_dir / "fullchain.pem").exists() and (live_dir / "privkey.pem").exists()
 
     def revoke_certificate(self, fqdn: str) -> bool:
         """
@@ -88,25 +174,15 @@ class CertbotManager:
         """
         List all certificates
 
+        Read from LETSENCRYPT_LIVE_DIR instead of 'certbot certificates';
+        details (SANs, expiry) come from nrp.core.certindex.
+
         Returns:
             List of certificate names
         """
         try:
-            result = subprocess.run(
-                ["certbot", "certificates"],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            # Parse output to extract certificate names
-            # This is a simple implementation, could be improved
-            certs = []
-            for line in result.stdout.split('\n'):
-                if 'Certificate Name:' in line:
-                    cert_name = line.split('Certificate Name:')[1].strip()
-                    certs.append(cert_name)
-            return certs
-        except subprocess.CalledProcessError:
+            return sorted(path.parent.name for path in LETSENCRYPT_LIVE_DIR.glob("*/fullchain.pem"))
+        except OSError:
             return []
 
     def renew_certificates(self) -> bool:
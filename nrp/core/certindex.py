@@ -0,0 +1,221 @@
+"""
+Certificate inventory read from the PEM files (CERT_INDEX_PATH)
+
+'certbot certificates' starts certbot, loads every renewal configuration
+and only yields names. The inventory decodes
+LETSENCRYPT_LIVE_DIR/<name>/fullchain.pem in-process and keeps SANs, key
+type, issuer and validity in an SQLite index with an index on the expiry.
+
+Each row stores a stamp (inode, mtime, size) of the file behind the
+fullchain.pem symlink. A renewal (certbot or 'nrp cert renew') points the
+symlink at a new archive file, so a refresh costs one stat() per
+certificate and only changed certificates are decoded again.
+
+The index is optional: if CERT_INDEX_PATH cannot be written (e.g. 'nrp
+status' as a normal user), certificates are decoded in memory.
+
+Needs the optional 'cryptography' package: pip install 'nrp[acme]'.
+"""
+import json
+import sqlite3
+import time
+from datetime import timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from nrp.config import CERT_INDEX_PATH, LETSENCRYPT_LIVE_DIR
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from cryptography.x509.oid import NameOID
+except ImportError:  # optional dependency, checked by CertIndex.certificates()
+    x509 = None
+
+CRYPTOGRAPHY_MISSING = "Das Zertifikats-Inventar benötigt cryptography: pip install 'nrp[acme]'"
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS certs (
+    name TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    sans TEXT NOT NULL,
+    key_type TEXT,
+    issuer TEXT,
+    not_before REAL NOT NULL,
+    not_after REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS certs_expiry ON certs (not_after);
+"""
+
+_CERT_COLUMNS = ("name", "sans", "key_type", "issuer", "not_before", "not_after")
+
+_PEM_BEGIN = "-----BEGIN CERTIFICATE-----"
+_PEM_END = "-----END CERTIFICATE-----"
+
+
+class CertIndex:
+    """
+    Certificates in LETSENCRYPT_LIVE_DIR, cached by file stamp
+
+    Args:
+        path: Index database, or None to decode in memory only
+        live_dir: Directory with one subdirectory per certificate
+    """
+
+    def __init__(self, path: Optional[Path] = CERT_INDEX_PATH, live_dir: Path = LETSENCRYPT_LIVE_DIR):
+        self.path = path
+        self.live_dir = live_dir
+        self.decoded = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def certificates(self, expiring: Optional[int] = None) -> List[Dict]:
+        """
+        Certificates sorted by expiry
+
+        Each entry holds name, sans, key_type (rsa/ecdsa/unknown), issuer,
+        not_before, not_after (timestamps), days (left until expiry) and
+        certbot (True if certbot has a renewal configuration for it).
+
+        Args:
+            expiring: Only certificates that expire within this many days
+
+        Raises:
+            ValueError: If cryptography is not installed
+        """
+        if x509 is None:
+            raise ValueError(CRYPTOGRAPHY_MISSING)
+        self.refresh()
+        query = f"SELECT {', '.join(_CERT_COLUMNS)} FROM certs"
+        args = ()
+        if expiring is not None:
+            query += " WHERE not_after <= ?"
+            args = (time.time() + expiring * 86400,)
+        rows = self._connect().execute(query + " ORDER BY not_after, name", args).fetchall()
+
+        renewal_dir = self.live_dir.parent / "renewal"
+        now = time.time()
+        certificates = []
+        for row in rows:
+            cert = dict(zip(_CERT_COLUMNS, row))
+            cert["sans"] = json.loads(cert["sans"])
+            cert["days"] = int((cert["not_after"] - now) // 86400)
+            cert["certbot"] = (renewal_dir / f"{cert['name']}.conf").exists()
+            certificates.append(cert)
+        return certificates
+
+    def refresh(self) -> None:
+        """Decode new and changed certificates, drop removed ones."""
+        conn = self._connect()
+        known = dict(conn.execute("SELECT name, stamp FROM certs"))
+        seen = set()
+        try:
+            fullchains = sorted(self.live_dir.glob("*/fullchain.pem"))
+        except OSError:
+            fullchains = []
+        with conn:
+            for fullchain in fullchains:
+                name = fullchain.parent.name
+                try:
+                    stat = fullchain.stat()
+                except OSError:
+                    continue
+                seen.add(name)
+                stamp = f"{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}"
+                if known.get(name) == stamp:
+                    continue
+                try:
+                    cert = decode(fullchain)
+                except (OSError, ValueError):
+                    seen.discard(name)
+                    continue
+                self.decoded += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO certs (name, stamp, sans, key_type, issuer, not_before, not_after) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, stamp, json.dumps(cert["sans"]), cert["key_type"], cert["issuer"],
+                     cert["not_before"], cert["not_after"])
+                )
+            for name in set(known) - seen:
+                conn.execute("DELETE FROM certs WHERE name = ?", (name,))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        if self.path is not None:
+            conn = None
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=30)
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    conn.executescript("DROP TABLE IF EXISTS certs;")
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._conn = conn
+                return conn
+            except (OSError, sqlite3.Error):
+                if conn is not None:
+                    conn.close()
+        self._conn = sqlite3.connect(":memory:")
+        self._conn.executescript(_SCHEMA)
+        return self._conn
+
+
+def decode(path: Path) -> Dict:
+    """
+    First certificate of a PEM file
+
+    Returns:
+        sans, key_type (rsa, ecdsa or unknown), issuer, not_before, not_after
+
+    Raises:
+        ValueError: If the file holds no readable certificate or
+            cryptography is not installed
+    """
+    if x509 is None:
+        raise ValueError(CRYPTOGRAPHY_MISSING)
+    text = path.read_text(errors="replace")
+    start = text.find(_PEM_BEGIN)
+    end = text.find(_PEM_END, start)
+    if start < 0 or end < 0:
+        raise ValueError(f"{path}: no certificate")
+    certificate = x509.load_pem_x509_certificate(text[start:end + len(_PEM_END)].encode())
+
+    try:
+        san = certificate.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        sans = san.value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        sans = _attributes(certificate.subject, NameOID.COMMON_NAME)
+
+    public_key = certificate.public_key()
+    if isinstance(public_key, rsa.RSAPublicKey):
+        key_type = "rsa"
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        key_type = "ecdsa"
+    else:
+        key_type = "unknown"
+
+    organization = _attributes(certificate.issuer, NameOID.ORGANIZATION_NAME)
+    common_name = _attributes(certificate.issuer, NameOID.COMMON_NAME)
+    if organization and common_name:
+        issuer = f"{organization[0]} ({common_name[0]})"
+    else:
+        issuer = (organization or common_name or [None])[0]
+    return {
+        "sans": sans,
+        "key_type": key_type,
+        "issuer": issuer,
+        "not_before": _utc(certificate, "not_valid_before").timestamp(),
+        "not_after": _utc(certificate, "not_valid_after").timestamp(),
+    }
+
+
+def _attributes(name, oid) -> List[str]:
+    return [attribute.value for attribute in name.get_attributes_for_oid(oid)]
+
+
+def _utc(certificate, field: str):
+    # *_utc attributes exist since cryptography 42; older versions return naive UTC
+    value = getattr(certificate, f"{field}_utc", None)
+    return value or getattr(certificate, field).replace(tzinfo=timezone.utc)
@@ -0,0 +1,499 @@
+"""
+Certificate job queue (CERT_QUEUE_PATH)
+
+Issuing a certificate mostly means waiting for the CA to validate the
+challenge. Instead of requesting certificates one by one inside 'nrp add',
+hosts are queued together with their render parameters and a pool of
+workers issues them ('nrp cert run'; one worker with certbot, which allows
+a single instance per configuration directory):
+
+    pending -> running -> issued -> active
+                  |
+                  +-> pending (retry after a delay) -> ... -> failed
+
+Issued certificates are activated in batches: the host files of up to
+CERT_ACTIVATE_BATCH hosts are written in one config transaction, so a
+batch costs one 'nginx -t' and one reload.
+
+Before a job starts, the Let's Encrypt rate limits are checked against the
+recorded history (certificates per registered domain and week, new orders
+per account and 3 hours, failed validations per hostname and hour). A job
+that would exceed one waits until the oldest counted event leaves the
+window. Failed jobs are retried with a doubling delay, or at the time the
+CA names in a rate-limit error.
+"""
+import fcntl
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from nrp.config import (
+    CERT_ACTIVATE_BATCH,
+    CERT_MAX_ATTEMPTS,
+    CERT_QUEUE_PATH,
+    CERT_RETRY_DELAY,
+    CERT_WORKERS,
+    LE_CERTS_PER_DOMAIN,
+    LE_FAILED_PER_HOST,
+    LE_ORDERS_PER_ACCOUNT,
+)
+
+PENDING, RUNNING, ISSUED, ACTIVE, FAILED = "pending", "running", "issued", "active", "failed"
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    fqdn TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    params TEXT,
+    email TEXT,
+    key_type TEXT,
+    sans TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    not_before REAL NOT NULL DEFAULT 0,
+    error TEXT
+);
+-- ACME history for the rate limits: order, issued, failed
+CREATE TABLE IF NOT EXISTS events (
+    kind TEXT NOT NULL,
+    fqdn TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, not_before);
+CREATE INDEX IF NOT EXISTS events_kind ON events (kind, at);
+"""
+
+_JOB_COLUMNS = (
+    "fqdn", "state", "params", "email", "key_type", "sans", "attempts",
+    "created", "started", "finished", "not_before", "error",
+)
+
+HOUR = 3600
+WEEK = 7 * 24 * HOUR
+# Events older than the longest window are no longer needed
+_HISTORY = WEEK
+
+# Public suffixes with registrations on the second level (approximation
+# of the Public Suffix List for registered_domain())
+_SECOND_LEVEL = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk",
+    "co.at", "or.at", "ac.at", "gv.at",
+    "com.au", "net.au", "org.au", "co.nz", "co.jp", "co.za", "com.br", "com.tr",
+}
+
+_RETRY_AFTER = re.compile(r"retry after (\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})", re.IGNORECASE)
+_RATE_LIMITED = re.compile(r"too many|rateLimited|rate limit", re.IGNORECASE)
+
+
+def registered_domain(fqdn: str) -> str:
+    """Domain the per-domain limit counts against (example.com for a.b.example.com)."""
+    labels = fqdn.lower().rstrip(".").split(".")
+    size = 3 if ".".join(labels[-2:]) in _SECOND_LEVEL else 2
+    return ".".join(labels[-size:])
+
+
+def retry_after(error: str, now: float) -> Optional[float]:
+    """
+    Earliest retry time named in a rate-limit error
+
+    Returns:
+        Timestamp, now + 1 hour for a rate-limit error without a time,
+        None for other errors
+    """
+    match = _RETRY_AFTER.search(error or "")
+    if match:
+        at = datetime.fromisoformat(f"{match.group(1)}T{match.group(2)}").replace(tzinfo=timezone.utc)
+        return max(at.timestamp(), now)
+    if _RATE_LIMITED.search(error or ""):
+        return now + HOUR
+    return None
+
+
+class CertQueue:
+    """
+    Persistent certificate jobs and ACME history
+
+    Args:
+        path: Database file, or None for a private in-memory queue
+    """
+
+    def __init__(self, path: Optional[Path] = CERT_QUEUE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def enqueue(
+        self,
+        fqdn: str,
+        params: Optional[Dict] = None,
+        email: Optional[str] = None,
+        key_type: Optional[str] = None,
+        sans: Optional[List[str]] = None
+    ) -> None:
+        """
+        Queue a certificate (replaces a job for the same host that is not running)
+
+        params and sans left at None keep those of a job for the same host
+        that is not active yet: renewing a host must not drop the pending
+        activation, activating it must not drop the names of the certificate.
+
+        Args:
+            fqdn: Fully qualified domain name
+            params: render_files() keyword arguments to activate after issuance,
+                None for a certificate only
+            email: Email for certificate notifications
+            key_type: rsa or ecdsa
+            sans: Names of the certificate (fqdn first), None for fqdn only
+        """
+        conn = self._connect(write=True)
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (fqdn, state, params, email, key_type, sans, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (fqdn) DO UPDATE SET state = excluded.state, "
+                "params = CASE WHEN jobs.state != ? THEN COALESCE(excluded.params, jobs.params) "
+                "ELSE excluded.params END, "
+                "sans = CASE WHEN jobs.state != ? THEN COALESCE(excluded.sans, jobs.sans) ELSE excluded.sans END, "
+                "email = excluded.email, key_type = excluded.key_type, attempts = 0, created = excluded.created, "
+                "started = NULL, finished = NULL, not_before = 0, error = NULL WHERE state != ?",
+                (fqdn, PENDING, _dump(params), email, key_type, _dump(sans), time.time(), ACTIVE, ACTIVE, RUNNING)
+            )
+
+    def jobs(self, states: Iterable[str] = ()) -> List[Dict]:
+        """Jobs (optionally only in the given states), oldest first."""
+        states = list(states)
+        where = f" WHERE state IN ({', '.join('?' * len(states))})" if states else ""
+        with self._reader() as conn:
+            if conn is None:
+                return []
+            rows = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs{where} ORDER BY created, fqdn", states)
+            return [_job(row) for row in rows]
+
+    def claim(self, limit: int, now: float, fqdns: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Start up to limit due jobs that the rate limits allow
+
+        Jobs held back by a rate limit get their not_before set to the time
+        the limit allows them.
+
+        Args:
+            limit: Maximum number of jobs to start
+            now: Current time
+            fqdns: Only jobs of these hosts (default: all)
+        """
+        if limit <= 0:
+            return []
+        fqdns = set(fqdns) if fqdns is not None else None
+        conn = self._connect(write=True)
+        claimed = []
+        with conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE state = ? AND not_before <= ? "
+                "ORDER BY created, fqdn",
+                (PENDING, now)
+            ).fetchall()
+            for row in rows:
+                if len(claimed) >= limit:
+                    break
+                job = _job(row)
+                if fqdns is not None and job["fqdn"] not in fqdns:
+                    continue
+                allowed_at = self._allowed_at(conn, job["fqdn"], now)
+                if allowed_at > now:
+                    conn.execute("UPDATE jobs SET not_before = ? WHERE fqdn = ?", (allowed_at, job["fqdn"]))
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET state = ?, started = ?, finished = NULL, attempts = attempts + 1 WHERE fqdn = ?",
+                    (RUNNING, now, job["fqdn"])
+                )
+                self._event(conn, "order", job["fqdn"], now)
+                claimed.append({**job, "state": RUNNING, "started": now, "attempts": job["attempts"] + 1})
+        return claimed
+
+    def finish(self, fqdn: str, ok: bool, error: Optional[str], now: float, max_attempts: int = CERT_MAX_ATTEMPTS) -> str:
+        """
+        Record the result of a job
+
+        Returns:
+            New state: issued (active for certificate-only jobs), pending
+            (retried later) or failed (attempts exhausted)
+        """
+        conn = self._connect(write=True)
+        with conn:
+            attempts, params = conn.execute("SELECT attempts, params FROM jobs WHERE fqdn = ?", (fqdn,)).fetchone()
+            if ok:
+                state = ISSUED if params is not None else ACTIVE
+                self._event(conn, "issued", fqdn, now)
+                conn.execute(
+                    "UPDATE jobs SET state = ?, finished = ?, error = NULL WHERE fqdn = ?", (state, now, fqdn)
+                )
+                return state
+
+            self._event(conn, "failed", fqdn, now)
+            state = FAILED if attempts >= max_attempts else PENDING
+            not_before = retry_after(error, now) or now + CERT_RETRY_DELAY * 2 ** (attempts - 1)
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished = ?, not_before = ?, error = ? WHERE fqdn = ?",
+                (state, now, not_before, error, fqdn)
+            )
+            return state
+
+    def mark_active(self, fqdns: Iterable[str]) -> None:
+        """Hosts whose configuration was activated after issuance."""
+        conn = self._connect(write=True)
+        with conn:
+            conn.executemany(
+                "UPDATE jobs SET state = ? WHERE fqdn = ? AND state = ?",
+                [(ACTIVE, fqdn, ISSUED) for fqdn in fqdns]
+            )
+
+    def retry(self, fqdns: Iterable[str] = ()) -> int:
+        """Reset failed jobs (all if no FQDN is given) to pending; returns their number."""
+        conn = self._connect(write=True)
+        fqdns = list(fqdns)
+        where = f" AND fqdn IN ({', '.join('?' * len(fqdns))})" if fqdns else ""
+        with conn:
+            return conn.execute(
+                f"UPDATE jobs SET state = ?, attempts = 0, not_before = 0 WHERE state = ?{where}",
+                (PENDING, FAILED, *fqdns)
+            ).rowcount
+
+    def clear(self) -> int:
+        """Remove finished jobs (active) and history outside the rate-limit windows."""
+        conn = self._connect(write=True)
+        with conn:
+            conn.execute("DELETE FROM events WHERE at < ?", (time.time() - _HISTORY,))
+            return conn.execute("DELETE FROM jobs WHERE state = ?", (ACTIVE,)).rowcount
+
+    def recover(self) -> None:
+        """Return jobs of an interrupted run to pending (only while holding the run lock)."""
+        conn = self._connect(write=True)
+        with conn:
+            conn.execute("UPDATE jobs SET state = ? WHERE state = ?", (PENDING, RUNNING))
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _allowed_at(self, conn: sqlite3.Connection, fqdn: str, now: float) -> float:
+        """Earliest time a new order for fqdn stays within the rate limits."""
+        domain = registered_domain(fqdn)
+        allowed_at = now
+        for kind, column, value, limit, window in (
+            ("issued", "domain", domain, LE_CERTS_PER_DOMAIN, WEEK),
+            ("order", None, None, LE_ORDERS_PER_ACCOUNT, 3 * HOUR),
+            ("failed", "fqdn", fqdn, LE_FAILED_PER_HOST, HOUR),
+        ):
+            clause = f" AND {column} = ?" if column else ""
+            args = [kind, now - window] + ([value] if column else [])
+            # The limit-th newest event in the window: the limit is free again when it leaves
+            row = conn.execute(
+                f"SELECT at FROM events WHERE kind = ? AND at > ?{clause} ORDER BY at DESC LIMIT 1 OFFSET ?",
+                (*args, limit - 1)
+            ).fetchone()
+            if row is not None:
+                allowed_at = max(allowed_at, row[0] + window)
+        return allowed_at
+
+    @staticmethod
+    def _event(conn: sqlite3.Connection, kind: str, fqdn: str, now: float) -> None:
+        conn.execute(
+            "INSERT INTO events (kind, fqdn, domain, at) VALUES (?, ?, ?, ?)",
+            (kind, fqdn, registered_domain(fqdn), now)
+        )
+
+    @contextmanager
+    def _reader(self):
+        """Connection for a read; a temporary read-only one is closed afterwards."""
+        conn = self._connect(write=False)
+        try:
+            yield conn
+        finally:
+            if conn is not None and conn is not self._conn:
+                conn.close()
+
+    def _connect(self, write: bool) -> Optional[sqlite3.Connection]:
+        """
+        Open the database; reading never creates the file (same as the host registry)
+
+        Without an open connection a read gets a temporary read-only one
+        (closed by _reader()).
+        """
+        if self._conn is not None:
+            return self._conn
+        if self.path is None:
+            self._conn = sqlite3.connect(":memory:")
+        elif write:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] == 1:
+                # Version 1 had no sans column; jobs and history are kept
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN sans TEXT")
+        else:
+            try:
+                conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    conn.close()
+                    return None
+            except sqlite3.Error:
+                return None
+            return conn
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return self._conn
+
+
+def run(
+    queue: CertQueue,
+    issue: Callable[[Dict], Tuple[bool, Optional[str]]],
+    activate: Optional[Callable[[List[Dict]], bool]] = None,
+    workers: int = CERT_WORKERS,
+    batch: int = CERT_ACTIVATE_BATCH,
+    report: Optional[Callable[[Dict, str], None]] = None,
+    fqdns: Optional[Iterable[str]] = None
+) -> Dict[str, int]:
+    """
+    Work off all due jobs with a pool of workers
+
+    Jobs delayed by a rate limit or a retry delay stay pending for the
+    next run.
+
+    Args:
+        queue: Job queue (used from the calling thread only)
+        issue: Requests the certificate of a job, returns (ok, error);
+            called from worker threads
+        activate: Writes the host files of issued jobs in one transaction,
+            returns whether it was committed; None leaves them issued
+        workers: Number of parallel issue() calls
+        batch: Issued jobs that trigger an activation before the run ends
+        report: Called with each finished job and its new state
+        fqdns: Only jobs of these hosts (default: all)
+
+    A failed activation leaves its jobs issued. The run then stops
+    activating: every later batch would contain the same jobs and fail
+    (transaction, 'nginx -t' and rollback) again.
+
+    Returns:
+        Number of jobs per resulting state, plus 'batches' and
+        'activation_failed'
+    """
+    fqdns = list(fqdns) if fqdns is not None else None
+    summary = {ISSUED: 0, ACTIVE: 0, PENDING: 0, FAILED: 0, "batches": 0, "activation_failed": False}
+
+    def activate_issued() -> None:
+        if activate is None or summary["activation_failed"]:
+            return
+        jobs = queue.jobs([ISSUED])
+        if not jobs:
+            return
+        summary["batches"] += 1
+        if activate(jobs):
+            queue.mark_active(job["fqdn"] for job in jobs)
+            summary[ISSUED] -= len(jobs)
+            summary[ACTIVE] += len(jobs)
+        else:
+            summary["activation_failed"] = True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while True:
+            for job in queue.claim(workers - len(running), time.time(), fqdns):
+                running[pool.submit(issue, job)] = job
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    ok, error = future.result()
+                except Exception as e:  # one broken job must not stop the others
+                    ok, error = False, str(e)
+                state = queue.finish(job["fqdn"], ok, error, time.time())
+                summary[state] += 1
+                if report:
+                    report({**job, "error": error, "finished": time.time()}, state)
+            if activate is not None and not summary["activation_failed"] and len(queue.jobs([ISSUED])) >= batch:
+                activate_issued()
+    activate_issued()
+    return summary
+
+
+def enqueue_renewals(queue: CertQueue, certificates: Iterable[Dict]) -> List[str]:
+    """
+    Queue certificate-only jobs for CertIndex entries (nrp cert renew)
+
+    The key type and names of the current certificate are kept, so an RSA
+    certificate is not renewed as DEFAULT_KEY_TYPE and a certificate for
+    several hosts not for its first name only.
+
+    Returns:
+        Queued certificate names
+    """
+    names = []
+    for cert in certificates:
+        key_type = cert.get("key_type") if cert.get("key_type") in ("rsa", "ecdsa") else None
+        sans = [cert["name"]] + [san for san in cert.get("sans") or [] if san != cert["name"]]
+        queue.enqueue(cert["name"], key_type=key_type, sans=sans)
+        names.append(cert["name"])
+    return names
+
+
+def activator(nginx) -> Callable[[List[Dict]], bool]:
+    """
+    Activation for run(): render the host files of issued jobs and write
+    them in one config transaction (one 'nginx -t', one reload)
+    """
+    def activate(jobs: List[Dict]) -> bool:
+        rendered = nginx.render_many(job["params"] for job in jobs)
+        for job in jobs:
+            for directory in (job["params"].get("static_locations") or {}).values():
+                Path(directory).mkdir(parents=True, exist_ok=True)
+        with nginx.transaction() as tx:
+            for files in rendered.values():
+                for path, content in files.items():
+                    tx.write(path, content)
+            return tx.commit()
+    return activate
+
+
+@contextmanager
+def run_lock(path: Path):
+    """
+    Exclusive lock of a queue run, taken without waiting
+
+    Yields:
+        True if this process holds the lock, False if another run does
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _dump(value) -> Optional[str]:
+    return json.dumps(value, sort_keys=True) if value is not None else None
+
+
+def _job(row: tuple) -> Dict:
+    job = dict(zip(_JOB_COLUMNS, row))
+    for column in ("params", "sans"):
+        job[column] = json.loads(job[column]) if job[column] is not None else None
+    return job
@@ -0,0 +1,92 @@
+"""
+Per-host response compression profiles (gzip, optionally brotli)
+
+Brotli needs the ngx_brotli filter module (Debian/Ubuntu:
+libnginx-mod-http-brotli-filter). It is only rendered if the module is
+installed and loaded, the same way the WAF checks for the Coraza
+module; otherwise the profile falls back to gzip alone.
+"""
+from typing import Dict, Optional
+
+from nrp.config import BROTLI_MODULE_PATH, NGINX_MODULES_ENABLED_DIR
+
+# MIME types worth compressing (text/html is always compressed by NGINX)
+COMPRESSION_TYPES = [
+    "text/plain",
+    "text/css",
+    "text/xml",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "application/manifest+json",
+    "application/wasm",
+    "image/svg+xml",
+    "font/ttf",
+    "font/otf",
+]
+
+COMPRESSION_PROFILES = {
+    "default": {
+        "gzip_level": 5,
+        "brotli_level": 5,
+        "min_length": 256,
+        "description": "Gutes Verhältnis aus Kompression und CPU-Last",
+    },
+    "max": {
+        "gzip_level": 6,
+        "brotli_level": 7,
+        "min_length": 256,
+        "description": "Stärkere Kompression für langsame Clients, mehr CPU",
+    },
+    "low-cpu": {
+        "gzip_level": 1,
+        "brotli_level": 1,
+        "min_length": 10240,
+        "description": "Für kleine VPS: nur Antworten ab 10 KB, niedrigste Stufe",
+    },
+}
+
+
+def is_module_built() -> bool:
+    """True wenn das Brotli-Filtermodul installiert ist."""
+    return BROTLI_MODULE_PATH.exists()
+
+
+def is_brotli_available() -> bool:
+    """True wenn das Brotli-Filtermodul installiert und per load_module geladen ist."""
+    if not is_module_built() or not NGINX_MODULES_ENABLED_DIR.exists():
+        return False
+    for conf_file in NGINX_MODULES_ENABLED_DIR.glob("*.conf"):
+        try:
+            if BROTLI_MODULE_PATH.name in conf_file.read_text():
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def settings(profile: Optional[str]) -> Optional[Dict]:
+    """
+    Template variables for a compression profile
+
+    Args:
+        profile: Name of a COMPRESSION_PROFILES entry, or None for no compression
+
+    Returns:
+        Dict with the profile values, types and brotli flag, or None
+
+    Raises:
+        ValueError: On an unknown profile
+    """
+    if not profile:
+        return None
+    if profile not in COMPRESSION_PROFILES:
+        raise ValueError(f"Unbekanntes Kompressions-Profil: {profile}")
+    return {
+        **COMPRESSION_PROFILES[profile],
+        "types": COMPRESSION_TYPES,
+        "brotli": is_brotli_available(),
+    }
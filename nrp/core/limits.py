@@ -0,0 +1,110 @@
+"""
+Edge rate limiting (limit_req) and connection limiting (limit_conn)
+
+Zones are shared between hosts and defined once in the http-level include
+LIMITS_CONF: one limit_req zone per request rate in use, one limit_conn
+zone for all hosts. Keys combine client address and server name, so every
+host still counts its clients separately. Clients in the allowlist get
+an empty key and are never limited.
+
+LIMITS_CONF is derived from the nrp-host headers of all host files and
+re-rendered by every config transaction; its header keeps the allowlist:
+
+    # nrp-limits: {"allowlist": ["192.168.0.0/16"]}
+"""
+import ipaddress
+import json
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nrp.config import LIMIT_EXPECTED_KEYS
+
+HEADER_PREFIX = "# nrp-limits: "
+
+CONN_ZONE = "nrp_conn"
+
+# Approximate shared memory per state: node + key ($binary_remote_addr + server name)
+_REQ_STATE_BYTES = 192
+_CONN_STATE_BYTES = 160
+
+_RATE_PATTERN = re.compile(r"^(\d+)(?::(\d+))?$")
+
+
+def parse_rate_limit(value: str) -> Tuple[int, int]:
+    """
+    Parse a rate limit given as 'RATE[:BURST]' (requests per second)
+
+    Without BURST, the burst equals the rate (one second of excess requests).
+
+    Raises:
+        ValueError: If the value is malformed or zero
+    """
+    match = _RATE_PATTERN.match(str(value).strip())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Ungültiges Rate-Limit '{value}' (erwartet RATE[:BURST], z.B. 10:20)")
+    rate = int(match.group(1))
+    burst = int(match.group(2)) if match.group(2) is not None else rate
+    return rate, burst
+
+
+def req_zone(rate: int) -> str:
+    """Name of the shared limit_req zone for a rate."""
+    return f"nrp_req_{rate}r"
+
+
+def zone_size(keys: int, state_bytes: int) -> str:
+    """Zone size in megabytes for the expected number of keys (at least 1m)."""
+    return f"{max(1, math.ceil(keys * state_bytes / (1024 * 1024)))}m"
+
+
+def validate_allow(value: str) -> str:
+    """
+    Normalize an allowlist entry (IP address or CIDR)
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    try:
+        return str(ipaddress.ip_network(value, strict=False))
+    except ValueError:
+        raise ValueError(f"Ungültige IP-Adresse oder ungültiges Netz: {value}")
+
+
+def parse_header(content: str) -> Optional[Dict]:
+    """Read the metadata header of LIMITS_CONF (None if absent)."""
+    for line in content.splitlines():
+        if line.startswith(HEADER_PREFIX):
+            return json.loads(line[len(HEADER_PREFIX):])
+    return None
+
+
+def rates_in_use(hosts: Iterable[Dict]) -> List[int]:
+    """Distinct request rates of all hosts (nrp-host parameter dicts)."""
+    return sorted({params["rate_limit"] for params in hosts if params.get("rate_limit")})
+
+
+def render(env, rates: List[int], conn_used: bool, allowlist: List[str]) -> Optional[str]:
+    """
+    Render LIMITS_CONF
+
+    Args:
+        env: Jinja2 environment of the NginxManager
+        rates: Request rates in use
+        conn_used: Whether any host uses a connection limit
+        allowlist: Addresses/networks that are never limited
+
+    Returns:
+        File content, or None if nothing needs to be defined
+    """
+    if not rates and not conn_used and not allowlist:
+        return None
+    return env.get_template("limits.conf.j2").render(
+        header=HEADER_PREFIX + json.dumps({"allowlist": allowlist}),
+        allowlist=allowlist,
+        req_zones=[(req_zone(rate), rate) for rate in rates],
+        req_zone_size=zone_size(LIMIT_EXPECTED_KEYS, _REQ_STATE_BYTES),
+        conn_zone=CONN_ZONE,
+        conn_zone_size=zone_size(LIMIT_EXPECTED_KEYS, _CONN_STATE_BYTES) if conn_used else None,
+        expected_keys=LIMIT_EXPECTED_KEYS,
+    )
@@ -0,0 +1,177 @@
+"""
+Structural checks of NGINX configuration files before 'nginx -t'
+
+'nginx -t' parses the whole configuration, including the OWASP CRS when
+the WAF is enabled, which takes seconds. Config transactions run these
+checks on the final set of files first and stop before anything is
+swapped in if one fails:
+
+    - balanced braces (comments and quoted strings ignored)
+    - the same server_name twice on one address and port
+    - listen conflicts: two default servers, or socket options
+      (reuseport, backlog, ...) repeated on one address and port
+    - ssl_certificate/_key, ssl_dhparam, ssl_trusted_certificate,
+      coraza_rules_file and include targets exist
+
+Only findings that involve a changed file are reported, so problems that
+NGINX already tolerates in untouched files do not block other changes.
+Directives are matched line by line, the way NRP templates write them.
+'nginx -t' remains the final gate.
+"""
+import glob
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+_TOKEN = re.compile(r"#[^\n]*|\"(?:[^\"\\\n]|\\.)*\"|'(?:[^'\\\n]|\\.)*'|[{}]")
+_SERVER_DIRECTIVE = re.compile(
+    r"^[ \t]*(?:(server)[ \t]*\{|(listen|server_name)\s+([^;#{}]*);)", re.MULTILINE
+)
+_PATH_DIRECTIVE = re.compile(
+    r"^[ \t]*(ssl_certificate|ssl_certificate_key|ssl_dhparam|ssl_trusted_certificate|coraza_rules_file|include)"
+    r"[ \t]+([^\s;#]+)[ \t]*;",
+    re.MULTILINE
+)
+
+# listen parameters that configure the socket and may appear only once per address:port
+_SOCKET_OPTIONS = (
+    "reuseport", "backlog=", "rcvbuf=", "sndbuf=", "fastopen=", "deferred", "bind",
+    "ipv6only=", "so_keepalive=", "accept_filter=", "setfib=",
+)
+
+Listen = Tuple[str, str, str]  # address, port, tcp/udp
+
+
+def check_braces(path: Path, content: str) -> List[str]:
+    """Unbalanced '{' / '}' outside of comments and quoted strings."""
+    stack = []
+    for match in _TOKEN.finditer(content):
+        token = match.group()
+        if token == "{":
+            stack.append(match.start())
+        elif token == "}":
+            if not stack:
+                return [f"{path}:{_line(content, match.start())}: unexpected \"}}\""]
+            stack.pop()
+    if stack:
+        return [f"{path}:{_line(content, stack[-1])}: unclosed \"{{\""]
+    return []
+
+
+def parse_listen(value: str) -> Tuple[Listen, List[str]]:
+    """Split a listen value into (address, port, protocol) and its parameters."""
+    parts = value.split()
+    target, options = parts[0], parts[1:]
+    if target.startswith("["):
+        address, _, port = target[1:].partition("]")
+        port = port.lstrip(":") or "80"
+        address = f"[{address}]"
+    elif target.isdigit():
+        address, port = "*", target
+    elif ":" in target:
+        address, _, port = target.rpartition(":")
+    else:
+        address, port = target, "80"
+    if address in ("0.0.0.0", "*"):
+        address = "*"
+    protocol = "udp" if "quic" in options else "tcp"
+    return (address, port, protocol), options
+
+
+def server_blocks(content: str) -> List[Dict]:
+    """listen and server_name lines of every server block in a file."""
+    blocks = []
+    for match in _SERVER_DIRECTIVE.finditer(content):
+        if match.group(1):
+            blocks.append({"line": _line(content, match.start()), "listen": [], "names": []})
+        elif blocks:
+            line = _line(content, match.start())
+            if match.group(2) == "listen":
+                blocks[-1]["listen"].append((line, *parse_listen(match.group(3))))
+            else:
+                blocks[-1]["names"].extend((line, name.lower()) for name in match.group(3).split())
+    return blocks
+
+
+def check_servers(files: Dict[Path, str], changed: Iterable[Path]) -> List[str]:
+    """Duplicate server names and listen conflicts across files."""
+    changed = set(changed)
+    names: Dict[tuple, list] = {}
+    defaults: Dict[Listen, list] = {}
+    sockets: Dict[Listen, list] = {}
+    for path, content in files.items():
+        for block in server_blocks(content):
+            for line, listen, options in block["listen"]:
+                if "default_server" in options or "default" in options:
+                    defaults.setdefault(listen, []).append((path, line))
+                if any(option.startswith(_SOCKET_OPTIONS) for option in options):
+                    sockets.setdefault(listen, []).append((path, line))
+                for name_line, name in block["names"]:
+                    if name and name != "_":
+                        names.setdefault((name, listen), []).append((path, name_line))
+
+    errors = []
+    for (name, listen), places in names.items():
+        errors += _duplicates(places, changed, f"conflicting server name \"{name}\" on {_format(listen)}")
+    for listen, places in defaults.items():
+        errors += _duplicates(places, changed, f"a duplicate default server for {_format(listen)}")
+    for listen, places in sockets.items():
+        errors += _duplicates(places, changed, f"duplicate listen options for {_format(listen)}")
+    return errors
+
+
+def check_paths(path: Path, content: str, exists: Callable[[Path], bool]) -> List[str]:
+    """Referenced certificate, rule and include files that do not exist."""
+    errors = []
+    for match in _PATH_DIRECTIVE.finditer(content):
+        directive, target = match.groups()
+        target = target.strip("\"'")
+        if "$" in target or not target.startswith("/"):
+            continue  # per-request variable or relative to the NGINX prefix
+        if directive == "include" and glob.has_magic(target):
+            continue
+        if not exists(Path(target)):
+            errors.append(f"{path}:{_line(content, match.start())}: {directive} \"{target}\" not found")
+    return errors
+
+
+def lint(
+    files: Dict[Path, str],
+    changed: Dict[Path, str],
+    exists: Callable[[Path], bool] = Path.exists
+) -> List[str]:
+    """
+    Run all checks
+
+    Args:
+        files: Final content of every file in conf.d
+        changed: Final content of every changed file (any directory)
+        exists: Whether a referenced file will exist after the change
+
+    Returns:
+        Findings as 'path:line: message', empty if all checks pass
+    """
+    errors = []
+    for path, content in changed.items():
+        errors += check_braces(path, content)
+        errors += check_paths(path, content, exists)
+    return errors + check_servers(files, changed)
+
+
+def _duplicates(places: list, changed: set, message: str) -> List[str]:
+    if len(places) < 2 or not any(path in changed for path, _ in places):
+        return []
+    first_path, first_line = places[0]
+    return [
+        f"{path}:{line}: {message}, first defined in {first_path}:{first_line}"
+        for path, line in places[1:]
+    ]
+
+
+def _format(listen: Listen) -> str:
+    address, port, protocol = listen
+    return f"{address}:{port}" + (" (quic)" if protocol == "udp" else "")
+
+
+def _line(content: str, offset: int) -> int:
+    return content.count("\n", 0, offset) + 1
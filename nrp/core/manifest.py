@@ -0,0 +1,287 @@
+"""
+Host manifest parsing and planning for bulk operations (nrp apply)
+
+A manifest describes the desired set of proxy hosts, either as JSON or
+(if PyYAML is installed) as YAML:
+
+    defaults:
+      protocol: http
+      websockets: false
+    email: admin@example.com
+    hosts:
+      - fqdn: app.example.com
+        internal_ip: 192.168.1.10
+        internal_port: 8080
+      - fqdn: api.example.com
+        internal_ip: 192.168.1.11
+        internal_port: 3000
+        waf: true
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from nrp.config import (
+    DEFAULT_CLIENT_MAX_BODY_SIZE,
+    DEFAULT_HSTS_MAX_AGE,
+    DEFAULT_UPSTREAM_KEEPALIVE,
+    DEFAULT_LB_METHOD
+)
+from nrp.core import upstream as upstream_core
+from nrp.core.cache import CACHE_PROFILES, MICROCACHE_MAX_SECONDS
+from nrp.core.tls import KEY_TYPES
+from nrp.core.compression import COMPRESSION_PROFILES
+from nrp.core import traffic as traffic_core
+from nrp.core import static as static_core
+from nrp.core import limits as limits_core
+from nrp.core.validation import (
+    validate_fqdn,
+    validate_ip,
+    validate_port,
+    validate_protocol
+)
+
+# Manifest keys (CLI option names) accepted per host
+_HOST_KEYS = {
+    "fqdn", "internal_ip", "internal_port", "external_port", "protocol",
+    "websockets", "waf", "site", "email", "client_max_body_size", "hsts_max_age",
+    "keepalive", "backends", "lb_method", "hash_key", "cache",
+    "microcache", "http2", "http3", "key_type",
+    "compression", "profile", "static", "rate_limit", "conn_limit",
+}
+
+
+def load_manifest(path: Path) -> Dict:
+    """
+    Load a manifest file (.json, .yaml or .yml)
+
+    Args:
+        path: Path to the manifest
+
+    Returns:
+        Parsed manifest as dict with at least a 'hosts' list
+
+    Raises:
+        ValueError: If the file cannot be parsed or has an invalid structure
+    """
+    text = Path(path).read_text()
+    suffix = Path(path).suffix.lower()
+
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(
+                "YAML-Manifeste benötigen PyYAML: pip install 'nrp[yaml]' "
+                "(alternativ das Manifest als JSON angeben)"
+            )
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Ungültiges YAML: {e}")
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Ungültiges JSON: {e}")
+
+    # A bare list of hosts is accepted as shorthand
+    if isinstance(data, list):
+        data = {"hosts": data}
+    if not isinstance(data, dict) or not isinstance(data.get("hosts"), list):
+        raise ValueError("Manifest muss eine Liste 'hosts' enthalten")
+    return data
+
+
+def normalize_hosts(manifest: Dict) -> List[Dict]:
+    """
+    Merge defaults into every host entry and validate it
+
+    Args:
+        manifest: Parsed manifest
+
+    Returns:
+        List of host specs with keys matching NginxManager.render_files()
+        plus 'email' and 'key_type'
+
+    Raises:
+        ValueError: Listing every invalid entry at once
+    """
+    defaults = manifest.get("defaults") or {}
+    global_email = manifest.get("email")
+    errors = []
+    hosts = []
+    seen = set()
+
+    for index, entry in enumerate(manifest["hosts"], 1):
+        if not isinstance(entry, dict):
+            errors.append(f"Eintrag {index}: kein Objekt")
+            continue
+        merged = {**defaults, **entry}
+        label = merged.get("fqdn") or f"Eintrag {index}"
+
+        unknown = set(merged) - _HOST_KEYS
+        if unknown:
+            errors.append(f"{label}: unbekannte Schlüssel {', '.join(sorted(unknown))}")
+            continue
+
+        try:
+            spec = _host_spec(merged)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{label}: {e}")
+            continue
+
+        if spec["fqdn"] in seen:
+            errors.append(f"{label}: doppelt im Manifest")
+            continue
+        seen.add(spec["fqdn"])
+        spec["email"] = merged.get("email", global_email)
+        spec["site"] = merged.get("site")
+        spec["key_type"] = merged.get("key_type")
+        if spec["key_type"] not in (None, *KEY_TYPES):
+            errors.append(f"{label}: ungültiger Schlüsseltyp '{spec['key_type']}'")
+            continue
+        hosts.append(spec)
+
+    if errors:
+        raise ValueError("\n".join(errors))
+    return hosts
+
+
+def _host_spec(entry: Dict) -> Dict:
+    """Validate a merged host entry and convert it into render_files() kwargs."""
+    fqdn = str(entry.get("fqdn") or "")
+    if not validate_fqdn(fqdn):
+        raise ValueError(f"ungültiger FQDN '{fqdn}'")
+
+    backends = None
+    if entry.get("backends"):
+        backends = [
+            upstream_core.parse_backend(b) if isinstance(b, str) else upstream_core.make_backend(**b)
+            for b in entry["backends"]
+        ]
+        # First backend doubles as primary internal_ip/internal_port
+        entry = {"internal_ip": backends[0]["address"], "internal_port": backends[0]["port"], **entry}
+
+    internal_ip = str(entry.get("internal_ip") or "")
+    if not validate_ip(internal_ip):
+        raise ValueError(f"ungültige IP-Adresse '{internal_ip}'")
+
+    internal_port = int(entry.get("internal_port", 0))
+    external_port = int(entry.get("external_port", 443))
+    for port in (internal_port, external_port):
+        if not validate_port(port):
+            raise ValueError(f"ungültiger Port {port}")
+
+    protocol = str(entry.get("protocol", "http"))
+    if not validate_protocol(protocol):
+        raise ValueError(f"ungültiges Protokoll '{protocol}'")
+
+    keepalive = int(entry.get("keepalive", DEFAULT_UPSTREAM_KEEPALIVE))
+    if keepalive < 0:
+        raise ValueError(f"ungültiger Keepalive-Wert {keepalive}")
+
+    cache_profile = entry.get("cache")
+    if cache_profile and cache_profile not in CACHE_PROFILES:
+        raise ValueError(f"unbekanntes Cache-Profil '{cache_profile}'")
+
+    microcache = entry.get("microcache")
+    if microcache is not None and not 1 <= int(microcache) <= MICROCACHE_MAX_SECONDS:
+        raise ValueError(f"ungültige Microcache-Dauer {microcache} (1-{MICROCACHE_MAX_SECONDS} s)")
+
+    compression = entry.get("compression")
+    if compression and compression not in COMPRESSION_PROFILES:
+        raise ValueError(f"unbekanntes Kompressions-Profil '{compression}'")
+
+    traffic_profile = entry.get("profile")
+    traffic_core.check_compatible(traffic_profile, bool(cache_profile or microcache))
+
+    # 'static' as list of 'PREFIX[=DIR]' strings or as {prefix: dir} mapping
+    static = entry.get("static") or []
+    if isinstance(static, dict):
+        static = [f"{prefix}={directory or ''}" for prefix, directory in static.items()]
+    static_locations = dict(static_core.parse_static(str(value), fqdn) for value in static)
+
+    # 'rate_limit' as 'RATE[:BURST]' string or plain number of requests per second
+    rate_limit = rate_burst = None
+    if entry.get("rate_limit"):
+        rate_limit, rate_burst = limits_core.parse_rate_limit(str(entry["rate_limit"]))
+    conn_limit = entry.get("conn_limit")
+    if conn_limit is not None and int(conn_limit) < 1:
+        raise ValueError(f"ungültiges Verbindungs-Limit {conn_limit}")
+
+    lb_method = str(entry.get("lb_method", DEFAULT_LB_METHOD))
+    hash_key = entry.get("hash_key")
+    # Validates method/backends combination early, raises ValueError
+    upstream_core.make_spec(
+        backends or [upstream_core.make_backend(internal_ip, internal_port)],
+        lb_method, hash_key, keepalive
+    )
+
+    return {
+        "fqdn": fqdn,
+        "internal_ip": internal_ip,
+        "internal_port": internal_port,
+        "external_port": external_port,
+        "forward_scheme": protocol.lower(),
+        "websockets_enabled": bool(entry.get("websockets", False)),
+        "waf_enabled": bool(entry.get("waf", False)),
+        "client_max_body_size": str(entry.get("client_max_body_size", DEFAULT_CLIENT_MAX_BODY_SIZE)),
+        "hsts_max_age": int(entry.get("hsts_max_age", DEFAULT_HSTS_MAX_AGE)),
+        "upstream_keepalive": keepalive,
+        "backends": backends,
+        "lb_method": lb_method,
+        "hash_key": hash_key,
+        "cache_profile": cache_profile or None,
+        "microcache": int(microcache) if microcache else None,
+        "http2": None if entry.get("http2") is None else bool(entry["http2"]),
+        "http3": None if entry.get("http3") is None else bool(entry["http3"]),
+        "compression": compression or None,
+        "traffic_profile": traffic_profile or None,
+        "static_locations": static_locations,
+        "rate_limit": rate_limit,
+        "rate_burst": rate_burst,
+        "conn_limit": int(conn_limit) if conn_limit else None,
+    }
+
+
+def render_kwargs(spec: Dict) -> Dict:
+    """Strip certificate keys so the spec can be passed to render_files()."""
+    return {k: v for k, v in spec.items() if k not in ("email", "key_type")}
+
+
+def plan(hosts: List[Dict], rendered: Dict[str, Dict], existing: Dict[str, Optional[Dict]],
+         prune: bool = False) -> Dict[str, List[str]]:
+    """
+    Compare rendered configurations against the files on disk
+
+    Args:
+        hosts: Normalized host specs from the manifest
+        rendered: Rendered files per FQDN (path -> content)
+        existing: Current files per FQDN (path -> content, only files that
+                  exist; empty or None if the host is absent) for all
+                  managed hosts on disk
+        prune: Also schedule hosts missing from the manifest for removal
+
+    Returns:
+        Dict with lists 'create', 'update', 'unchanged' and 'remove'
+    """
+    result = {"create": [], "update": [], "unchanged": [], "remove": []}
+    wanted = set()
+    for spec in hosts:
+        fqdn = spec["fqdn"]
+        wanted.add(fqdn)
+        current = existing.get(fqdn)
+        if not current:
+            result["create"].append(fqdn)
+        elif current != rendered[fqdn]:
+            result["update"].append(fqdn)
+        else:
+            result["unchanged"].append(fqdn)
+
+    if prune:
+        result["remove"] = sorted(
+            fqdn for fqdn, content in existing.items()
+            if content and fqdn not in wanted
+        )
+    return result
@@ -1,21 +1,72 @@
 """
 NGINX operations and management
 """
+import errno
+import json
+import os
+import re
+import shutil
+import sqlite3
 import subprocess
+import tempfile
 from pathlib import Path
-from typing import Optional
-from jinja2 import Environment, FileSystemLoader
+from typing import Iterable, Optional, Union
+from jinja2 import Environment
 
 from nrp.config import (
     NGINX_CONF_DIR,
+    NGINX_HTML_DIR,
+    NGINX_MAIN_CONF,
+    NGINX_STAGING_DIR,
+    NGINX_UPSTREAM_DIR,
     TEMPLATE_DIR,
     LETSENCRYPT_LIVE_DIR,
-    LETSENCRYPT_OPTIONS_SSL,
     LETSENCRYPT_SSL_DHPARAM,
     DEFAULT_CLIENT_MAX_BODY_SIZE,
     DEFAULT_HSTS_MAX_AGE,
+    DEFAULT_UPSTREAM_KEEPALIVE,
+    DEFAULT_LB_METHOD,
+    DEFAULT_HTTP2,
+    DEFAULT_HTTP3,
+    DEFAULT_STATIC_EXPIRES,
+    HOSTS_DB_PATH,
+    NGINX_HTTP_DIR,
+    NGINX_HTTP_INCLUDE,
+    NGINX_RESERVED_CONFS,
+    ROUTING_MODE,
+    ROUTES_CONF,
+    REDIRECT_CONF,
+    ACME_WEBROOT,
+    NGINX_SNIPPET_DIR,
     WAF_MAIN_CONF
 )
+from nrp.core.reload import ReloadScheduler
+from nrp.core import upstream as upstream_core
+from nrp.core import cache as cache_core
+from nrp.core import compression as compression_core
+from nrp.core import traffic as traffic_core
+from nrp.core import limits as limits_core
+from nrp.core import tuning as tuning_core
+from nrp.core import routing
+from nrp.core import snippets
+from nrp.core import lint as lint_core
+from nrp.core import protocols
+from nrp.core import tls
+from nrp.core import templates
+from nrp.core.registry import HostRegistry
+
+
+# Machine-readable render parameters in every host configuration
+HOST_HEADER_PREFIX = "# nrp-host: "
+
+# Host files without nrp-host header (registry import)
+_LEGACY_PROXY_PASS = re.compile(r"^\s*proxy_pass\s+(https?)://([^\s:/;]+):(\d+)", re.MULTILINE)
+_LEGACY_LISTEN = re.compile(r"^\s*listen\s+(?:\S+:)?(\d+)\s+ssl", re.MULTILINE)
+_CORAZA_ON = re.compile(r"^\s*coraza\s+on\s*;", re.MULTILINE)
+_WEBSOCKETS_ON = re.compile(r"^\s*proxy_set_header\s+Upgrade\s+\$http_upgrade\s*;", re.MULTILINE)
+_LEGACY_BODY_SIZE = re.compile(r"^\s*client_max_body_size\s+([^\s;]+)\s*;", re.MULTILINE)
+_LEGACY_HSTS = re.compile(r"^\s*add_header\s+Strict-Transport-Security\s+\"max-age=(\d+)", re.MULTILINE)
+_SSL_CERTIFICATE = re.compile(r"^\s*ssl_certificate\s+([^\s;$]+);", re.MULTILINE)
 
 
 class NginxManager:
@@ -23,31 +74,87 @@ class NginxManager:
 
     def __init__(self):
         self.conf_dir = NGINX_CONF_DIR
+        self.main_conf = NGINX_MAIN_CONF
+        self.upstream_dir = NGINX_UPSTREAM_DIR
+        self.http_dir = NGINX_HTTP_DIR
+        self.snippet_dir = NGINX_SNIPPET_DIR
+        self.routing_mode = ROUTING_MODE
         self.template_dir = TEMPLATE_DIR
-        self.env = Environment(loader=FileSystemLoader(str(self.template_dir)))
+        self.registry = HostRegistry(HOSTS_DB_PATH)
+        # Shared context of render_many(), None outside of a batch
+        self._batch = None
 
-    def create_temp_config(self, fqdn: str, external_port: int = 443) -> Path:
+    @property
+    def env(self) -> Environment:
+        """Shared Jinja2 environment, created on first use (not by list/completion)."""
+        return templates.environment(str(self.template_dir))
+
+    def render_files(
+        self,
+        fqdn: str,
+        internal_ip: str,
+        internal_port: int,
+        backends: Optional[list[dict]] = None,
+        lb_method: str = DEFAULT_LB_METHOD,
+        hash_key: Optional[str] = None,
+        upstream_keepalive: int = DEFAULT_UPSTREAM_KEEPALIVE,
+        **options
+    ) -> dict[Path, str]:
         """
-        Create temporary HTTP configuration for certificate generation
+        Render all files belonging to a proxy host without writing them
 
         Args:
             fqdn: Fully qualified domain name
-            external_port: External port number
+            internal_ip: Internal server IP
+            internal_port: Internal server port
+            backends: Backend pool (default: internal_ip:internal_port only)
+            lb_method: round-robin, least_conn, ip_hash or hash
+            hash_key: Key for the 'hash' method (default: $remote_addr)
+            upstream_keepalive: Idle keepalive connections to the backend (default: 16, 0 = off)
+            options: Further options of render_config()
 
         Returns:
-            Path to created configuration file
+            Mapping of file path to rendered content
         """
-        template = self.env.get_template('temp_http.conf.j2')
-        content = template.render(
-            fqdn=fqdn,
-            external_port=external_port
-        )
+        if backends is None:
+            backends = [upstream_core.make_backend(internal_ip, internal_port)]
+        spec = upstream_core.make_spec(backends, lb_method, hash_key, upstream_keepalive)
+        return {
+            self.config_path(fqdn): self.render_config(fqdn, internal_ip, internal_port, **options),
+            self.upstream_path(fqdn): self.render_upstream(fqdn, spec),
+        }
 
-        conf_file = self.conf_dir / f"{fqdn}.conf"
-        conf_file.write_text(content)
-        return conf_file
+    def render_many(self, specs: Iterable[dict]) -> dict[str, dict[Path, str]]:
+        """
+        Render the files of many proxy hosts in one pass
 
-    def create_config(
+        Values shared by all hosts (TLS include, NGINX build, QUIC owners in
+        conf.d) are determined once instead of per host.
+
+        Args:
+            specs: render_files() keyword arguments per host, including fqdn
+
+        Returns:
+            Mapping of FQDN to its rendered files
+        """
+        self._batch = {**self._shared_context(), "quic_owners": protocols.reuseport_owners(self.conf_dir)}
+        try:
+            return {spec["fqdn"]: self.render_files(**spec) for spec in specs}
+        finally:
+            self._batch = None
+
+    def _shared_context(self) -> dict:
+        """Render values that are the same for every host."""
+        if self._batch is not None:
+            return self._batch
+        return {
+            "ssl_options": tls.ssl_options_path(),
+            "http2_directive": protocols.http2_directive_supported(),
+            # Looked up per host outside of render_many()
+            "quic_owners": None,
+        }
+
+    def render_config(
         self,
         fqdn: str,
         internal_ip: str,
@@ -57,10 +164,21 @@ class NginxManager:
         websockets_enabled: bool = False,
         waf_enabled: bool = False,
         client_max_body_size: str = DEFAULT_CLIENT_MAX_BODY_SIZE,
-        hsts_max_age: int = DEFAULT_HSTS_MAX_AGE
-    ) -> Path:
+        hsts_max_age: int = DEFAULT_HSTS_MAX_AGE,
+        cache_profile: Optional[str] = None,
+        microcache: Optional[int] = None,
+        http2: Optional[bool] = None,
+        http3: Optional[bool] = None,
+        compression: Optional[str] = None,
+        traffic_profile: Optional[str] = None,
+        static_locations: Optional[dict] = None,
+        rate_limit: Optional[int] = None,
+        rate_burst: Optional[int] = None,
+        conn_limit: Optional[int] = None,
+        site: Optional[str] = None
+    ) -> str:
         """
-        Create final NGINX configuration
+        Render final NGINX host configuration without writing it
 
         Args:
             fqdn: Fully qualified domain name
@@ -72,10 +190,56 @@ class NginxManager:
             waf_enabled: Enable Coraza WAF with global rule set (default: False)
             client_max_body_size: Maximum upload size (default: 100M)
             hsts_max_age: HSTS max age in seconds (default: 31536000)
+            cache_profile: Response cache profile (small, default, large; None = off)
+            microcache: Cache dynamic responses for this many seconds (None = off)
+            http2: Enable HTTP/2 (default: DEFAULT_HTTP2)
+            http3: Enable HTTP/3 via QUIC (default: DEFAULT_HTTP3)
+            compression: Compression profile (default, max, low-cpu; None = off)
+            traffic_profile: Buffering/timeout profile (default, streaming, api, upload)
+            static_locations: URL prefix -> local directory served from disk
+            rate_limit: Requests per second per client (None = off)
+            rate_burst: Excess requests served without delay (default: rate_limit)
+            conn_limit: Concurrent connections per client (None = off)
+            site: WireGuard site the backend is reached through (only recorded)
 
         Returns:
-            Path to created configuration file
+            Rendered configuration
         """
+        # Parameters are stored in the file, so single settings can be changed later
+        params = {
+            "internal_ip": internal_ip,
+            "internal_port": internal_port,
+            "external_port": external_port,
+            "forward_scheme": forward_scheme,
+            "websockets_enabled": websockets_enabled,
+            "waf_enabled": waf_enabled,
+            "client_max_body_size": client_max_body_size,
+            "hsts_max_age": hsts_max_age,
+            "cache_profile": cache_profile,
+            "microcache": microcache,
+            "http2": http2,
+            "http3": http3,
+            "compression": compression,
+            "traffic_profile": traffic_profile,
+            "static_locations": static_locations or {},
+            "rate_limit": rate_limit,
+            "rate_burst": rate_burst,
+            "conn_limit": conn_limit,
+            "site": site,
+        }
+
+        traffic_core.check_compatible(traffic_profile, bool(cache_profile or microcache))
+        host_header = HOST_HEADER_PREFIX + json.dumps(params, sort_keys=True)
+
+        if self.routing_mode == "map" and routing.is_routable(params):
+            return self.env.get_template('nginx_routed.conf.j2').render(
+                fqdn=fqdn,
+                host_header=host_header,
+                routed_mark=routing.ROUTED_MARK,
+                routes_conf=self.routes_conf,
+                upstream_conf=self.upstream_path(fqdn)
+            )
+
         # Determine which template to use
         if external_port == 443:
             template_name = 'nginx_standard.conf.j2'
@@ -88,6 +252,21 @@ class NginxManager:
         ssl_certificate = LETSENCRYPT_LIVE_DIR / fqdn / "fullchain.pem"
         ssl_certificate_key = LETSENCRYPT_LIVE_DIR / fqdn / "privkey.pem"
 
+        shared = self._shared_context()
+        http2 = DEFAULT_HTTP2 if http2 is None else http2
+        http3 = DEFAULT_HTTP3 if http3 is None else http3
+        # Claim reuseport unless another host already carries it for this port
+        if not http3:
+            quic_reuseport = False
+        elif shared["quic_owners"] is not None:
+            quic_reuseport = all(
+                path == self.config_path(fqdn) for path in shared["quic_owners"].get(str(external_port), [])
+            )
+        else:
+            quic_reuseport = protocols.reuseport_owner(
+                self.conf_dir, str(external_port), exclude=self.config_path(fqdn)
+            ) is None
+
         # Render template
         content = template.render(
             fqdn=fqdn,
@@ -100,15 +279,323 @@ class NginxManager:
             waf_main_conf=WAF_MAIN_CONF,
             ssl_certificate=ssl_certificate,
             ssl_certificate_key=ssl_certificate_key,
-            ssl_options=LETSENCRYPT_OPTIONS_SSL,
+            ssl_options=shared["ssl_options"],
             ssl_dhparam=LETSENCRYPT_SSL_DHPARAM,
             client_max_body_size=client_max_body_size,
-            hsts_max_age=hsts_max_age
+            hsts_max_age=hsts_max_age,
+            upstream_name=upstream_name(fqdn),
+            upstream_conf=self.upstream_path(fqdn),
+            cache_profile=cache_profile,
+            cache=cache_core.zone_settings(fqdn, cache_profile, microcache),
+            http2=http2,
+            http2_directive=shared["http2_directive"],
+            http3=http3,
+            quic_reuseport=quic_reuseport,
+            compression_profile=compression,
+            compression=compression_core.settings(compression),
+            traffic_profile=traffic_profile,
+            traffic=traffic_core.settings(traffic_profile),
+            static_locations=static_locations or {},
+            static_expires=DEFAULT_STATIC_EXPIRES,
+            rate_limit=rate_limit,
+            rate_burst=rate_limit if rate_burst is None else rate_burst,
+            rate_zone=limits_core.req_zone(rate_limit) if rate_limit else None,
+            conn_limit=conn_limit,
+            conn_zone=limits_core.CONN_ZONE,
+            limits_conf=self.limits_conf,
+            proxy_snippet=self.snippet_path("proxy"),
+            redirect_conf=self.redirect_conf,
+            host_header=host_header
+        )
+        return content
+
+    def render_upstream(self, fqdn: str, spec: dict) -> str:
+        """
+        Render the upstream file of a proxy host
+
+        Args:
+            fqdn: Fully qualified domain name
+            spec: Upstream spec (see nrp.core.upstream.make_spec)
+
+        Returns:
+            Rendered upstream configuration
+        """
+        template = self.env.get_template('upstream.conf.j2')
+        return template.render(
+            fqdn=fqdn,
+            header=upstream_core.header_line(spec),
+            upstream_name=upstream_name(fqdn),
+            **spec
+        )
+
+    def read_upstream(self, fqdn: str) -> Optional[dict]:
+        """
+        Read the upstream spec of a proxy host from its upstream file
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            Spec dict, or None if no NRP-managed upstream file exists
+        """
+        path = self.upstream_path(fqdn)
+        if not path.exists():
+            return None
+        return upstream_core.parse_header(path.read_text())
+
+    @property
+    def limits_conf(self) -> Path:
+        """Shared limit zone definitions (http-level include)."""
+        return self.http_dir / "limits.conf"
+
+    @property
+    def routes_conf(self) -> Path:
+        """Shared server blocks and map tables of routed hosts (ROUTING_MODE = "map")."""
+        return self.conf_dir / ROUTES_CONF.name
+
+    def render_routes(self, hosts: dict[str, dict], ssl_options: Optional[Path] = None) -> Optional[str]:
+        """
+        Render the routing file for routed hosts
+
+        Args:
+            hosts: FQDN -> render parameters (nrp-host header)
+            ssl_options: TLS options include (default: tls.ssl_options_path())
+
+        Returns:
+            File content, or None if no host is routed
+        """
+        if not hosts:
+            return None
+        rows = [
+            {
+                "fqdn": fqdn,
+                "upstream_name": upstream_name(fqdn),
+                "upstream_conf": self.upstream_path(fqdn),
+                "forward_scheme": params.get("forward_scheme", "http"),
+                "hsts_max_age": int(params.get("hsts_max_age", DEFAULT_HSTS_MAX_AGE)),
+            }
+            for fqdn, params in sorted(hosts.items())
+        ]
+        build = protocols.nginx_build()
+        hash_sizes = tuning_core.server_names_hash(hosts)
+        return self.env.get_template('nrp-routes.conf.j2').render(
+            hosts=rows,
+            http2=DEFAULT_HTTP2,
+            http2_directive=protocols.http2_directive_supported(),
+            live_dir=LETSENCRYPT_LIVE_DIR,
+            cert_cache=build is not None and build["version"] >= routing.CERT_CACHE_VERSION,
+            ssl_options=ssl_options or tls.ssl_options_path(),
+            ssl_dhparam=LETSENCRYPT_SSL_DHPARAM,
+            default_hsts_max_age=DEFAULT_HSTS_MAX_AGE,
+            client_max_body_size=DEFAULT_CLIENT_MAX_BODY_SIZE,
+            map_hash_bucket_size=hash_sizes["server_names_hash_bucket_size"],
+            map_hash_max_size=hash_sizes["server_names_hash_max_size"],
+            proxy_snippet=self.snippet_path("proxy"),
+            redirect_conf=self.redirect_conf,
+        )
+
+    @property
+    def redirect_conf(self) -> Path:
+        """conf.d file with the shared port-80 server of all hosts on port 443."""
+        return self.conf_dir / REDIRECT_CONF.name
+
+    def render_redirects(self, fqdns: Iterable[str]) -> Optional[str]:
+        """
+        Render the shared port-80 server (HTTPS redirect and ACME challenges)
+
+        Args:
+            fqdns: Hosts served on port 443
+
+        Returns:
+            File content, or None if there is no such host
+        """
+        fqdns = sorted(fqdns)
+        if not fqdns:
+            return None
+        return self.env.get_template('nrp-redirect.conf.j2').render(
+            fqdns=fqdns,
+            acme_snippet=self.snippet_path("acme"),
+        )
+
+    @property
+    def catch_all_conf(self) -> Path:
+        """conf.d file with the default servers for unknown hosts."""
+        return self.conf_dir / "catch-all.conf"
+
+    def render_catch_all(self, dummy_cert: Path, dummy_key: Path) -> str:
+        """Render the default servers (404 page, ACME challenges on port 80)."""
+        return self.env.get_template("catch-all.conf.j2").render(
+            nginx_html_dir=NGINX_HTML_DIR,
+            dummy_cert=dummy_cert,
+            dummy_key=dummy_key,
+            acme_snippet=self.snippet_path("acme")
         )
 
-        conf_file = self.conf_dir / f"{fqdn}.conf"
-        conf_file.write_text(content)
-        return conf_file
+    def acme_ready(self) -> bool:
+        """
+        Whether ACME challenges of new hosts are answered without a reload
+
+        Hosts get their certificate before their configuration is written,
+        so the challenge is served by the port-80 default server in
+        catch-all.conf, which must include the current ACME snippet.
+        """
+        if not self.catch_all_conf.exists():
+            return False
+        return snippets.file_name("acme") in snippets.referenced([self.catch_all_conf.read_text()])
+
+    def migrate_catch_all(self) -> Optional[str]:
+        """
+        catch-all.conf with the ACME snippet in its port-80 default server
+
+        Returns:
+            New content, or None if absent or already up to date
+        """
+        if not self.catch_all_conf.exists() or self.acme_ready():
+            return None
+        content = self.catch_all_conf.read_text()
+        migrated = snippets.include_in_default_server(content, self.snippet_path("acme"))
+        return migrated if migrated != content else None
+
+    def snippet_path(self, name: str) -> Path:
+        """Path of the current version of a shared snippet (see nrp.core.snippets)."""
+        return self.snippet_dir / snippets.file_name(name)
+
+    def render_snippet(self, name: str) -> str:
+        """Render the current version of a shared snippet."""
+        return snippets.render(self.env, name, acme_webroot=ACME_WEBROOT)
+
+    def rerender_hosts(self, tx: "ConfigTransaction") -> tuple[list[str], list[str]]:
+        """
+        Stage all host files rendered with the current templates and mode
+
+        Args:
+            tx: Transaction to stage the changed files in
+
+        Hosts without nrp-host header (created by older versions) are
+        re-rendered from the parameters legacy_params() recovers; the new
+        file carries the header from then on.
+
+        Returns:
+            (re-rendered FQDNs, FQDNs whose parameters cannot be recovered)
+        """
+        changed, unparsed = [], []
+        for fqdn in self._scan_configs():
+            params = self.read_host(fqdn)
+            if params is not None:
+                files = {self.config_path(fqdn): self.render_config(fqdn, **params)}
+            else:
+                params = self.legacy_params(fqdn)
+                if params is None:
+                    unparsed.append(fqdn)
+                    continue
+                files = self.render_files(fqdn, **params)
+            staged = False
+            for path, content in files.items():
+                if not path.exists() or content != path.read_text():
+                    tx.write(path, content)
+                    staged = True
+            if staged:
+                changed.append(fqdn)
+        return changed, unparsed
+
+    def legacy_params(self, fqdn: str) -> Optional[dict]:
+        """
+        Render parameters of a host file without nrp-host header
+
+        Older versions wrote backend, port, WAF and websocket settings only
+        as directives; they are read back with the patterns host_record()
+        uses for the registry.
+
+        Returns:
+            render_files() keyword arguments (without fqdn), or None if the
+            file has no proxy_pass to an address and port
+        """
+        content = self.config_path(fqdn).read_text()
+        proxy_pass = _LEGACY_PROXY_PASS.search(content)
+        if proxy_pass is None:
+            return None
+        listen = _LEGACY_LISTEN.search(content)
+        params = {
+            "internal_ip": proxy_pass.group(2),
+            "internal_port": int(proxy_pass.group(3)),
+            "external_port": int(listen.group(1)) if listen else 443,
+            "forward_scheme": proxy_pass.group(1),
+            "websockets_enabled": bool(_WEBSOCKETS_ON.search(content)),
+            "waf_enabled": bool(_CORAZA_ON.search(content)),
+        }
+        body_size = _LEGACY_BODY_SIZE.search(content)
+        if body_size:
+            params["client_max_body_size"] = body_size.group(1)
+        hsts = _LEGACY_HSTS.search(content)
+        if hsts:
+            params["hsts_max_age"] = int(hsts.group(1))
+        return params
+
+    @property
+    def tuning_conf(self) -> Path:
+        """Host-count dependent http settings (nrp tune)."""
+        return self.http_dir / "tuning.conf"
+
+    @property
+    def http_include(self) -> Path:
+        """conf.d file that pulls in all shared http-level includes."""
+        return self.conf_dir / NGINX_HTTP_INCLUDE.name
+
+    def render_http_include(self) -> str:
+        """Render the conf.d file that pulls in all shared http-level includes."""
+        return self.env.get_template('nrp-http.conf.j2').render(http_dir=self.http_dir)
+
+    def read_host(self, fqdn: str) -> Optional[dict]:
+        """
+        Read the render parameters of a proxy host from its configuration
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            render_config() keyword arguments, or None if the file does not
+            exist or predates the nrp-host header
+        """
+        path = self.config_path(fqdn)
+        if not path.exists():
+            return None
+        return parse_host_header(path.read_text())
+
+    def config_path(self, fqdn: str) -> Path:
+        """
+        Path of the configuration file for a domain
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            Path inside the NGINX conf directory
+        """
+        return self.conf_dir / f"{fqdn}.conf"
+
+    def upstream_path(self, fqdn: str) -> Path:
+        """
+        Path of the upstream file for a domain
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            Path inside the NRP upstream directory
+        """
+        return self.upstream_dir / f"{fqdn}.conf"
+
+    def host_files(self, fqdn: str) -> list[Path]:
+        """
+        All files NRP manages for a proxy host
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            List of paths (host configuration first)
+        """
+        return [self.config_path(fqdn), self.upstream_path(fqdn)]
 
     def remove_config(self, fqdn: str) -> bool:
         """
@@ -120,16 +607,38 @@ class NginxManager:
         Returns:
             True if removed, False if not found
         """
-        conf_file = self.conf_dir / f"{fqdn}.conf"
+        conf_file = self.config_path(fqdn)
         if conf_file.exists():
             conf_file.unlink()
+            self.upstream_path(fqdn).unlink(missing_ok=True)
             return True
         return False
 
+    def transaction(self) -> "ConfigTransaction":
+        """
+        Start a staged configuration transaction
+
+        Returns:
+            New ConfigTransaction bound to this manager
+        """
+        return ConfigTransaction(self)
+
     def reload(self) -> bool:
         """
         Reload NGINX configuration
 
+        Requests from concurrent nrp invocations within NGINX_RELOAD_WINDOW
+        are coalesced into a single 'nginx -s reload'.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        return ReloadScheduler(self._reload_now).request()
+
+    def _reload_now(self) -> bool:
+        """
+        Reload NGINX configuration immediately
+
         Returns:
             True if successful, False otherwise
         """
@@ -145,6 +654,20 @@ class NginxManager:
             print(f"Error reloading NGINX: {e.stderr}")
             return False
 
+    def lint_config(self, files: dict[Path, str], changed: dict[Path, str], exists=Path.exists) -> list[str]:
+        """
+        Fast structural checks before 'nginx -t' (see nrp.core.lint)
+
+        Args:
+            files: Final content of every file in conf.d
+            changed: Final content of every changed file
+            exists: Whether a referenced file will exist after the change
+
+        Returns:
+            Findings, empty if all checks pass
+        """
+        return lint_core.lint(files, changed, exists)
+
     def test_config(self) -> bool:
         """
         Test NGINX configuration
@@ -168,16 +691,580 @@ class NginxManager:
         """
         List all configured domains
 
+        Answered from the host registry while it is in sync with conf.d,
+        otherwise from the directory listing.
+
         Returns:
             List of domain names
         """
+        if self.registry_current():
+            return self.registry.fqdns()
+        return self._scan_configs()
+
+    def _scan_configs(self) -> list[str]:
         if not self.conf_dir.exists():
             return []
 
         configs = []
         for conf_file in self.conf_dir.glob("*.conf"):
-            # Skip catch-all configuration
-            if conf_file.name != "catch-all.conf":
+            # Skip catch-all and shared NRP includes
+            if conf_file.name not in NGINX_RESERVED_CONFS:
                 configs.append(conf_file.stem)
 
         return sorted(configs)
+
+    # ── host registry ─────────────────────────────────────────────────────────
+
+    def hosts(self, **filters) -> list[dict]:
+        """
+        Host records from the registry, rebuilt first if it is stale
+
+        Args:
+            filters: Keyword filters of HostRegistry.query() (waf, site, external_port)
+
+        Returns:
+            List of host records (see host_record), ordered by FQDN
+        """
+        if not self.registry_current():
+            try:
+                self.rebuild_registry()
+            except (OSError, sqlite3.Error):
+                # No write access: answer from a throwaway in-memory index
+                registry = HostRegistry(None)
+                registry.replace(map(self.host_record, self._scan_configs()), None)
+                return registry.query(**filters)
+        return self.registry.query(**filters)
+
+    def registry_stamp(self) -> str:
+        """
+        State of conf.d and the upstream directory
+
+        The directory mtime only changes when files are added, removed or
+        renamed; editing a file in place (nrp edit, an editor without
+        rename) changes the file's mtime and size. The stamp therefore
+        holds per directory its mtime, the file count, the newest file
+        mtime and the total size - one stat() per file.
+        """
+        parts = []
+        for directory in (self.conf_dir, self.upstream_dir):
+            try:
+                mtime = directory.stat().st_mtime_ns
+                count = newest = size = 0
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            count += 1
+                            newest = max(newest, stat.st_mtime_ns)
+                            size += stat.st_size
+            except OSError:
+                mtime = count = newest = size = 0
+            parts.append(f"{directory}={mtime}:{count}:{newest}:{size}")
+        return ";".join(parts)
+
+    def registry_current(self) -> bool:
+        """Whether the registry reflects the files on disk."""
+        return self.registry.stamp() == self.registry_stamp()
+
+    def rebuild_registry(self) -> int:
+        """
+        Re-read every host file into the registry (nrp registry import)
+
+        Returns:
+            Number of hosts indexed
+
+        Raises:
+            OSError, sqlite3.Error: If the registry cannot be written
+        """
+        stamp = self.registry_stamp()
+        return self.registry.replace(map(self.host_record, self._scan_configs()), stamp)
+
+    def sync_registry(self, targets: Iterable[Path], was_current: bool) -> None:
+        """
+        Update the registry after files were changed
+
+        Args:
+            targets: Changed or removed files
+            was_current: Registry was in sync before the change; otherwise
+                it is rebuilt completely
+        """
+        try:
+            if not was_current:
+                self.rebuild_registry()
+                return
+            fqdns = {
+                target.stem for target in targets
+                if target.suffix == ".conf"
+                and target.parent in (self.conf_dir, self.upstream_dir)
+                and target.name not in NGINX_RESERVED_CONFS
+            }
+            present = {fqdn for fqdn in fqdns if self.config_path(fqdn).exists()}
+            self.registry.update(
+                [self.host_record(fqdn) for fqdn in sorted(present)], fqdns - present, self.registry_stamp()
+            )
+        except (OSError, sqlite3.Error) as e:
+            # The registry stays stale and is rebuilt by the next reader
+            print(f"Warning: host registry not updated: {e}")
+
+    def host_record(self, fqdn: str) -> dict:
+        """
+        Registry record of a proxy host, read from its files
+
+        Hosts without nrp-host header (created by older versions) are
+        described from their proxy_pass, coraza and certificate lines.
+
+        Args:
+            fqdn: Fully qualified domain name
+
+        Returns:
+            Dict with fqdn, internal_ip, internal_port, external_port,
+            forward_scheme, waf, websockets, routed, site, cert, params
+            (nrp-host header or None) and backends
+        """
+        content = self.config_path(fqdn).read_text()
+        params = parse_host_header(content)
+        record = {"fqdn": fqdn, "params": params, "routed": routing.is_routed(content)}
+        if params is not None:
+            record.update(
+                internal_ip=params.get("internal_ip"),
+                internal_port=params.get("internal_port"),
+                external_port=params.get("external_port", 443),
+                forward_scheme=params.get("forward_scheme", "http"),
+                waf=bool(params.get("waf_enabled")),
+                websockets=bool(params.get("websockets_enabled")),
+                site=params.get("site"),
+            )
+        else:
+            proxy_pass = _LEGACY_PROXY_PASS.search(content)
+            listen = _LEGACY_LISTEN.search(content)
+            record.update(
+                internal_ip=proxy_pass.group(2) if proxy_pass else None,
+                internal_port=int(proxy_pass.group(3)) if proxy_pass else None,
+                external_port=int(listen.group(1)) if listen else None,
+                forward_scheme=proxy_pass.group(1) if proxy_pass else None,
+                waf=bool(_CORAZA_ON.search(content)),
+                websockets=bool(_WEBSOCKETS_ON.search(content)),
+                site=None,
+            )
+
+        certificate = _SSL_CERTIFICATE.search(content)
+        if certificate:
+            record["cert"] = str(Path(certificate.group(1)).parent)
+        elif record["routed"]:
+            record["cert"] = str(LETSENCRYPT_LIVE_DIR / fqdn)
+        else:
+            record["cert"] = None
+
+        spec = self.read_upstream(fqdn)
+        if spec is not None:
+            record["backends"] = [
+                {"address": backend["address"], "port": backend["port"]} for backend in spec["backends"]
+            ]
+        elif record["internal_ip"]:
+            record["backends"] = [{"address": record["internal_ip"], "port": record["internal_port"]}]
+        else:
+            record["backends"] = []
+        return record
+
+
+def parse_host_header(content: str) -> Optional[dict]:
+    """
+    Read the render parameters from a rendered host configuration
+
+    Returns:
+        Parameter dict, or None if the content has no nrp-host header
+    """
+    for line in content.splitlines():
+        if line.startswith(HOST_HEADER_PREFIX):
+            return json.loads(line[len(HOST_HEADER_PREFIX):])
+    return None
+
+
+def upstream_name(fqdn: str) -> str:
+    """Name of the upstream block generated for a domain."""
+    return f"nrp_{fqdn}"
+
+
+class ConfigTransaction:
+    """
+    Staged, atomic set of configuration changes
+
+    Changes are written to a staging directory first. Writes whose content
+    equals the live file and removals of missing files are dropped; if
+    nothing is left, commit() neither tests nor reloads. The final set of
+    files is checked in-process (nrp.core.lint) before anything is swapped
+    in; a failed check leaves the live files untouched. Otherwise changes
+    are swapped in with atomic renames, validated together with a single
+    'nginx -t' and reloaded once. If validation or reload fails, every file
+    is restored to its previous state, so NGINX keeps serving the old
+    configuration and the next reload of anything else is not broken.
+    After a successful commit the host registry is updated.
+
+    Usage:
+        with nginx.transaction() as tx:
+            tx.write(nginx.config_path(fqdn), content)
+            tx.remove(nginx.config_path(other))
+            ok = tx.commit()
+    """
+
+    def __init__(self, nginx: NginxManager, staging_dir: Path = NGINX_STAGING_DIR):
+        self.nginx = nginx
+        self.staging_dir = staging_dir
+        self._work_dir: Optional[Path] = None
+        # Ordered list of (target, staged file or None for removal)
+        self._ops: list[tuple[Path, Optional[Path]]] = []
+        # Applied swaps: (target, backup or None if target did not exist)
+        self._applied: list[tuple[Path, Optional[Path]]] = []
+        self._live_files: dict[Path, str] = {}
+        self.committed = False
+
+    def __enter__(self) -> "ConfigTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self.committed:
+            self.rollback()
+        self._cleanup()
+
+    @property
+    def targets(self) -> list[Path]:
+        """Paths touched by this transaction (empty after a no-op commit)."""
+        return [target for target, _ in self._ops]
+
+    def write(self, target: Path, content: Union[str, bytes], mode: Optional[int] = None) -> None:
+        """
+        Stage new content for a file
+
+        Args:
+            target: Final path of the file
+            content: File content (bytes for binary files such as key material)
+            mode: File permissions (default: umask)
+        """
+        data = content if isinstance(content, bytes) else content.encode()
+        if self._unchanged(target, data, mode):
+            return
+        staged = self._stage_path(target)
+        staged.write_bytes(data)
+        if mode is not None:
+            staged.chmod(mode)
+        self._ops.append((target, staged))
+
+    def remove(self, target: Path) -> None:
+        """
+        Stage removal of a file
+
+        Args:
+            target: Path of the file to remove
+        """
+        if not target.exists() and target not in self.targets:
+            return
+        self._ops.append((target, None))
+
+    def commit(self, reload: bool = True) -> bool:
+        """
+        Swap staged files in, validate and reload
+
+        Args:
+            reload: Reload NGINX after successful validation (default: True)
+
+        Returns:
+            True if all changes are live, False if they were rolled back
+        """
+        try:
+            self._stage_derived()
+            if not self._ops:
+                # Nothing differs from the live configuration: no test, no reload
+                self.committed = True
+                self._cleanup()
+                return True
+            errors = self._lint()
+            if errors:
+                # Nothing is swapped in yet, NGINX is not involved
+                print("NGINX configuration check failed:\n" + "\n".join(errors))
+                self._cleanup()
+                return False
+            registry_current = self.nginx.registry_current()
+            self._swap_in()
+        except OSError as e:
+            print(f"Error applying staged configuration: {e}")
+            self.rollback()
+            return False
+
+        if not self.nginx.test_config():
+            self.rollback()
+            return False
+
+        if reload and not self.nginx.reload():
+            self.rollback()
+            return False
+
+        self.committed = True
+        self._cleanup()
+        self.nginx.sync_registry(self.targets, registry_current)
+        return True
+
+    def rollback(self) -> None:
+        """Restore every swapped file to its previous state."""
+        for target, backup in reversed(self._applied):
+            if backup is not None:
+                _replace(backup, target)
+            elif target.exists():
+                target.unlink()
+        self._applied = []
+
+    def _unchanged(self, target: Path, data: bytes, mode: Optional[int]) -> bool:
+        """True if target already has exactly this content (and mode) and is not staged otherwise."""
+        if target in self.targets:
+            return False
+        try:
+            if mode is not None and target.stat().st_mode & 0o777 != mode:
+                return False
+            return target.read_bytes() == data
+        except OSError:
+            return False
+
+    def _stage_derived(self) -> None:
+        """
+        Stage files derived from the final set of host configurations
+
+        - reuseport fixes, so every QUIC address keeps exactly one owner
+        - the shared limit zones for all hosts with rate/connection limits
+        - server_names_hash sizes for the number of hosts (once tuned)
+        - the shared server blocks of routed hosts (ROUTING_MODE = "map");
+          map_hash directives of nginx.conf are commented out
+        - the shared port-80 server and the snippets included by any file
+        """
+        conf_dir = self.nginx.conf_dir
+        files = {}
+        if conf_dir.exists():
+            files = {path: path.read_text() for path in conf_dir.glob("*.conf")}
+        # Live conf.d, reused by _lint()
+        self._live_files = dict(files)
+        staged = {}
+        for target, source in self._ops:
+            staged[target] = source
+            if target.parent != conf_dir or target.suffix != ".conf":
+                continue
+            if source is None:
+                files.pop(target, None)
+            else:
+                files[target] = source.read_text()
+
+        for path, content in protocols.balance_reuseport(files).items():
+            self.write(path, content)
+
+        host_files = {
+            path: content for path, content in files.items()
+            if path.name not in NGINX_RESERVED_CONFS
+        }
+        headers = {path: parse_host_header(content) for path, content in host_files.items()}
+        hosts = [params for params in headers.values() if params]
+        self._stage_limits(hosts, staged)
+        self._stage_tuning([path.stem for path in host_files], staged)
+        self._stage_routes(host_files, files.get(self.nginx.routes_conf), staged)
+        self._stage_redirects(host_files, headers, files.get(self.nginx.redirect_conf))
+        # Last: snippets included by the final files, including derived ones
+        self._stage_snippets()
+
+        # Shared http-level files need the include in conf.d
+        http_include = self.nginx.http_include
+        if http_include not in staged and not http_include.exists() and any(
+            target.parent == self.nginx.http_dir and source is not None
+            for target, source in self._ops
+        ):
+            self.write(http_include, self.nginx.render_http_include())
+
+    def _final_conf_files(self) -> tuple[dict[Path, str], dict[Path, str], set[Path], set[Path]]:
+        """
+        Configuration as it will be after this transaction
+
+        Returns:
+            (conf.d files, changed .conf files in any directory,
+             written paths, removed paths)
+        """
+        files = dict(self._live_files)
+        changed = {}
+        written, removed = set(), set()
+        for target, source in self._ops:
+            if source is None:
+                removed.add(target)
+                written.discard(target)
+                files.pop(target, None)
+                changed.pop(target, None)
+                continue
+            written.add(target)
+            removed.discard(target)
+            if target.name.endswith(".conf"):
+                changed[target] = source.read_text()
+                if target.parent == self.nginx.conf_dir:
+                    files[target] = changed[target]
+        return files, changed, written, removed
+
+    def _lint(self) -> list[str]:
+        """Structural checks of the final configuration (see nrp.core.lint)."""
+        files, changed, written, removed = self._final_conf_files()
+
+        def exists(path: Path) -> bool:
+            return path in written or (path not in removed and path.exists())
+
+        return self.nginx.lint_config(files, changed, exists)
+
+    def _stage_redirects(self, host_files: dict[Path, str], headers: dict[Path, Optional[dict]],
+                         current: Optional[str]) -> None:
+        # Temporary configs, files without nrp-host header and files rendered
+        # before the shared server (until nrp migrate) keep their own port-80 server
+        content = self.nginx.render_redirects(
+            path.stem for path, params in headers.items()
+            if params and int(params.get("external_port", 443)) == 443
+            and not snippets.has_http_server(host_files[path])
+        )
+        if content == current:
+            return
+        if content is None:
+            self.remove(self.nginx.redirect_conf)
+        else:
+            self.write(self.nginx.redirect_conf, content)
+
+    def _stage_snippets(self) -> None:
+        files, _, _, _ = self._final_conf_files()
+        used = snippets.referenced(files.values())
+        for name in snippets.NAMES:
+            path = self.nginx.snippet_path(name)
+            if path.name in used:
+                self.write(path, self.nginx.render_snippet(name))
+        # Versions no longer included by any file
+        if self.nginx.snippet_dir.exists():
+            for path in self.nginx.snippet_dir.glob("nrp-*.conf"):
+                if snippets.is_snippet(path) and path.name not in used:
+                    self.remove(path)
+
+    def _stage_limits(self, hosts: list[dict], staged: dict) -> None:
+        limits_conf = self.nginx.limits_conf
+        if limits_conf in staged:
+            source = staged[limits_conf]
+            current = source.read_text() if source is not None else None
+        else:
+            current = limits_conf.read_text() if limits_conf.exists() else None
+        header = limits_core.parse_header(current or "") or {}
+
+        content = limits_core.render(
+            self.nginx.env,
+            limits_core.rates_in_use(hosts),
+            any(params.get("conn_limit") for params in hosts),
+            header.get("allowlist", [])
+        )
+        if content == current:
+            return
+        if content is None:
+            self.remove(limits_conf)
+            return
+        self.write(limits_conf, content)
+
+    def _stage_routes(self, host_files: dict[Path, str], current: Optional[str], staged: dict) -> None:
+        routed = {
+            path.stem: parse_host_header(content) or {}
+            for path, content in host_files.items() if routing.is_routed(content)
+        }
+        # TLS include as it will be after this transaction (nrp tls profile/reset)
+        snippet = tls.TLS_SNIPPET
+        has_snippet = staged[snippet] is not None if snippet in staged else snippet.exists()
+        ssl_options = snippet if has_snippet else tls.LETSENCRYPT_OPTIONS_SSL
+
+        content = self.nginx.render_routes(routed, ssl_options=ssl_options)
+        if content is not None:
+            self._release_main(tuning_core.MAP_HASH_DIRECTIVES, f"conf.d/{self.nginx.routes_conf.name}", staged)
+        if content == current:
+            return
+        if content is None:
+            self.remove(self.nginx.routes_conf)
+        else:
+            self.write(self.nginx.routes_conf, content)
+
+    def _release_main(self, directives: tuple[str, ...], owner: str, staged: dict) -> None:
+        # nginx.conf must not set what a derived http-level file sets
+        main_conf = self.nginx.main_conf
+        if main_conf in staged:
+            if staged[main_conf] is None:
+                return
+            current = staged[main_conf].read_text()
+        elif main_conf.exists():
+            current = main_conf.read_text()
+        else:
+            return
+        content, released = tuning_core.release_http(current, directives, owner)
+        if released:
+            self.write(main_conf, content)
+
+    def _stage_tuning(self, server_names: list[str], staged: dict) -> None:
+        # Only maintained once 'nrp tune --apply' has created the file
+        tuning_conf = self.nginx.tuning_conf
+        if tuning_conf in staged:
+            if staged[tuning_conf] is None:
+                return
+            current = staged[tuning_conf].read_text()
+        elif tuning_conf.exists():
+            current = tuning_conf.read_text()
+        else:
+            return
+        content = tuning_core.render_http(self.nginx.env, server_names)
+        if content != current:
+            self.write(tuning_conf, content)
+
+    def _stage_path(self, target: Path) -> Path:
+        return self._work_path(f"{len(self._ops)}-{target.name}")
+
+    def _work_path(self, name: str) -> Path:
+        if self._work_dir is None:
+            self.staging_dir.mkdir(parents=True, exist_ok=True)
+            self._work_dir = Path(tempfile.mkdtemp(prefix="tx-", dir=self.staging_dir))
+        return self._work_dir / name
+
+    def _swap_in(self) -> None:
+        for index, (target, staged) in enumerate(self._ops):
+            backup = None
+            if target.exists():
+                backup = self._work_path(f"{index}-{target.name}.bak")
+                _link_or_copy(target, backup)
+            if staged is not None:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                _replace(staged, target)
+            elif target.exists():
+                target.unlink()
+            self._applied.append((target, backup))
+
+    def _cleanup(self) -> None:
+        if self._work_dir is not None:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+            self._work_dir = None
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """
+    Write a file atomically (temp file in the same directory + rename)
+
+    The temp file does not end in '.conf', so NGINX never includes a
+    half-written configuration.
+    """
+    tmp = path.with_name(f".{path.name}.nrp-tmp")
+    tmp.write_text(content)
+    os.replace(tmp, path)
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """Create a backup of src, preferring a hard link over a copy."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _replace(src: Path, dst: Path) -> None:
+    """Atomically move src to dst, even if the staging dir is on another filesystem."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        tmp = dst.with_name(f".{dst.name}.nrp-tmp")
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
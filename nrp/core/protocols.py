@@ -0,0 +1,152 @@
+"""
+HTTP/2 and HTTP/3 (QUIC) listeners
+
+NGINX accepts 'reuseport' only once per listen address across the whole
+configuration. Hosts share port 443, so exactly one host file in conf.d
+carries 'listen 443 quic reuseport;' and all others 'listen 443 quic;'.
+balance_reuseport() restores this invariant for a set of files and is
+applied by every config transaction before it is committed.
+"""
+import re
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+# 'http2 on;' replaces the 'http2' listen parameter since NGINX 1.25.1
+HTTP2_DIRECTIVE_VERSION = (1, 25, 1)
+
+_QUIC_LISTEN = re.compile(r"^(\s*listen\s+)(\S+)(\s+quic)(\s+reuseport)?(.*;)", re.MULTILINE)
+
+
+@lru_cache(maxsize=1)
+def nginx_build() -> Optional[Dict]:
+    """
+    Version and HTTP/2 / HTTP/3 support of the installed NGINX ('nginx -V')
+
+    Returns:
+        Dict with version (tuple), http2 and http3, or None if NGINX is not installed
+    """
+    try:
+        result = subprocess.run(["nginx", "-V"], capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    # nginx writes version and configure arguments to stderr
+    output = result.stderr + result.stdout
+    match = re.search(r"nginx/(\d+)\.(\d+)\.(\d+)", output)
+    if not match:
+        return None
+    return {
+        "version": tuple(int(part) for part in match.groups()),
+        "http2": "--with-http_v2_module" in output,
+        "http3": "--with-http_v3_module" in output,
+    }
+
+
+def http2_directive_supported() -> bool:
+    """True if 'http2 on;' can be used (unknown NGINX: assume a current version)."""
+    build = nginx_build()
+    return build is None or build["version"] >= HTTP2_DIRECTIVE_VERSION
+
+
+def quic_addresses(content: str) -> Dict[str, bool]:
+    """
+    QUIC listen addresses of a configuration file
+
+    Returns:
+        Mapping of listen address (e.g. '443') to whether it carries reuseport
+    """
+    addresses = {}
+    for match in _QUIC_LISTEN.finditer(content):
+        addresses[match.group(2)] = addresses.get(match.group(2), False) or bool(match.group(4))
+    return addresses
+
+
+def reuseport_owner(conf_dir: Path, address: str, exclude: Optional[Path] = None) -> Optional[Path]:
+    """
+    File in conf_dir that carries 'reuseport' for a QUIC listen address
+
+    Args:
+        conf_dir: NGINX conf directory
+        address: Listen address as written in the file (e.g. '443')
+        exclude: File to ignore (the host being rendered)
+
+    Returns:
+        Path of the owning file, or None
+    """
+    if not conf_dir.exists():
+        return None
+    for path in sorted(conf_dir.glob("*.conf")):
+        if path == exclude:
+            continue
+        try:
+            content = path.read_text()
+        except OSError:
+            continue
+        if quic_addresses(content).get(address):
+            return path
+    return None
+
+
+def reuseport_owners(conf_dir: Path) -> Dict[str, list]:
+    """
+    All files in conf_dir carrying 'reuseport', per QUIC listen address
+
+    Reads conf_dir once, for rendering many hosts (NginxManager.render_many).
+    """
+    owners: Dict[str, list] = {}
+    if not conf_dir.exists():
+        return owners
+    for path in sorted(conf_dir.glob("*.conf")):
+        try:
+            content = path.read_text()
+        except OSError:
+            continue
+        for address, reuseport in quic_addresses(content).items():
+            if reuseport:
+                owners.setdefault(address, []).append(path)
+    return owners
+
+
+def balance_reuseport(files: Dict[Path, str]) -> Dict[Path, str]:
+    """
+    Ensure every QUIC listen address has 'reuseport' in exactly one file
+
+    Existing owners are kept to avoid needless rewrites; otherwise the
+    first file (by name) gets it.
+
+    Args:
+        files: Final content of every *.conf file in conf.d
+
+    Returns:
+        Files whose content had to change (path -> new content)
+    """
+    owners: Dict[str, Path] = {}
+    users: Dict[str, list] = {}
+    for path in sorted(files):
+        for address, has_reuseport in quic_addresses(files[path]).items():
+            users.setdefault(address, []).append(path)
+            if has_reuseport and address not in owners:
+                owners[address] = path
+    for address, paths in users.items():
+        owners.setdefault(address, paths[0])
+
+    changed = {}
+    for path in sorted(files):
+        content = files[path]
+
+        # Only the first listen line per address in the owning file keeps reuseport
+        seen = set()
+
+        def _fix(match, path=path, seen=seen):
+            address = match.group(2)
+            keep = owners[address] == path and address not in seen
+            seen.add(address)
+            return "".join((
+                match.group(1), address, match.group(3), " reuseport" if keep else "", match.group(5)
+            ))
+
+        fixed = _QUIC_LISTEN.sub(_fix, content)
+        if fixed != content:
+            changed[path] = fixed
+    return changed
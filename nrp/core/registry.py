@@ -0,0 +1,294 @@
+"""
+Host registry: indexed copy of the proxy host parameters (HOSTS_DB_PATH)
+
+The host files in conf.d stay the source of truth. The registry holds one
+row per host (backend, ports, scheme, WAF, websockets, site, certificate,
+all nrp-host parameters) plus one row per upstream backend, so listing and
+filtering hosts is an index lookup instead of reading every file.
+
+Every config transaction updates the rows of the hosts it touched. The
+registry also stores a stamp of conf.d and the upstream directory
+(modification times): if they changed outside of NRP, the registry is
+stale and NginxManager rebuilds it from the files ('nrp registry import'
+does the same explicitly).
+"""
+import ipaddress
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS hosts (
+    fqdn TEXT PRIMARY KEY,
+    internal_ip TEXT,
+    internal_port INTEGER,
+    external_port INTEGER,
+    forward_scheme TEXT,
+    waf INTEGER NOT NULL DEFAULT 0,
+    websockets INTEGER NOT NULL DEFAULT 0,
+    routed INTEGER NOT NULL DEFAULT 0,
+    site TEXT,
+    cert TEXT,
+    params TEXT
+);
+CREATE TABLE IF NOT EXISTS backends (
+    fqdn TEXT NOT NULL REFERENCES hosts (fqdn) ON DELETE CASCADE,
+    address TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    -- IP version and zero-padded hex value, so network containment is a range scan
+    ip_version INTEGER,
+    ip TEXT
+);
+CREATE INDEX IF NOT EXISTS hosts_site ON hosts (site);
+CREATE INDEX IF NOT EXISTS hosts_waf ON hosts (waf);
+CREATE INDEX IF NOT EXISTS hosts_port ON hosts (external_port);
+CREATE INDEX IF NOT EXISTS backends_address ON backends (address);
+CREATE INDEX IF NOT EXISTS backends_ip ON backends (ip_version, ip);
+CREATE INDEX IF NOT EXISTS backends_fqdn ON backends (fqdn);
+"""
+
+_DROP = """
+DROP TABLE IF EXISTS backends;
+DROP TABLE IF EXISTS hosts;
+DROP TABLE IF EXISTS meta;
+"""
+
+_HOST_COLUMNS = (
+    "fqdn", "internal_ip", "internal_port", "external_port", "forward_scheme",
+    "waf", "websockets", "routed", "site", "cert", "params",
+)
+
+
+class HostRegistry:
+    """
+    SQLite index of the proxy hosts
+
+    Args:
+        path: Database file, or None for a private in-memory index
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writable = False
+
+    def stamp(self) -> Optional[str]:
+        """Stamp of the files the registry was last synced with (None = never / unreadable)."""
+        conn = self._connect(write=False)
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def replace(self, records: Iterable[Dict], stamp: Optional[str]) -> int:
+        """
+        Replace all rows (full import)
+
+        Args:
+            records: Host records (see NginxManager.host_record)
+            stamp: Stamp of the files the records were read from
+
+        Returns:
+            Number of hosts stored
+        """
+        conn = self._connect(write=True)
+        with conn:
+            conn.execute("DELETE FROM backends")
+            conn.execute("DELETE FROM hosts")
+            count = 0
+            for record in records:
+                self._insert(conn, record)
+                count += 1
+            self._set_stamp(conn, stamp)
+        return count
+
+    def update(self, records: Iterable[Dict], removed: Iterable[str], stamp: Optional[str]) -> None:
+        """
+        Store changed hosts and drop removed ones
+
+        Args:
+            records: Host records to insert or replace
+            removed: FQDNs that no longer exist
+            stamp: Stamp of the files after the change
+        """
+        conn = self._connect(write=True)
+        with conn:
+            for fqdn in removed:
+                conn.execute("DELETE FROM hosts WHERE fqdn = ?", (fqdn,))
+            for record in records:
+                conn.execute("DELETE FROM hosts WHERE fqdn = ?", (record["fqdn"],))
+                self._insert(conn, record)
+            self._set_stamp(conn, stamp)
+
+    def query(
+        self,
+        waf: Optional[bool] = None,
+        site: Optional[str] = None,
+        external_port: Optional[int] = None,
+        backend: Optional[str] = None,
+        site_networks: Iterable[str] = ()
+    ) -> List[Dict]:
+        """
+        Hosts matching all given filters, ordered by FQDN
+
+        Args:
+            waf: Only hosts with (True) or without (False) WAF
+            site: Only hosts recorded for this site, or (with site_networks)
+                with a backend inside one of its networks
+            external_port: Only hosts listening on this port
+            backend: IP address, network (CIDR) or hostname of a backend
+            site_networks: Networks of the site (overlay subnet, LAN)
+
+        Returns:
+            List of host records
+
+        Raises:
+            ValueError: If a network is malformed
+        """
+        clauses, args = [], []
+        if waf is not None:
+            clauses.append("waf = ?")
+            args.append(int(waf))
+        if site is not None:
+            networks = [ipaddress.ip_network(network, strict=False) for network in site_networks]
+            if networks:
+                clause, network_args = _backend_in(networks)
+                clauses.append(f"(site = ? OR {clause})")
+                args.extend([site, *network_args])
+            else:
+                clauses.append("site = ?")
+                args.append(site)
+        if external_port is not None:
+            clauses.append("external_port = ?")
+            args.append(int(external_port))
+        if backend is not None:
+            try:
+                network = ipaddress.ip_network(backend, strict=False)
+            except ValueError:
+                clauses.append("fqdn IN (SELECT fqdn FROM backends WHERE address = ?)")
+                args.append(backend)
+            else:
+                clause, network_args = _backend_in([network])
+                clauses.append(clause)
+                args.extend(network_args)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connect(write=False)
+        if conn is None:
+            return []
+        rows = conn.execute(f"SELECT {', '.join(_HOST_COLUMNS)} FROM hosts{where} ORDER BY fqdn", args).fetchall()
+        backends: Dict[str, list] = {}
+        for fqdn, address, port in conn.execute(
+            f"SELECT fqdn, address, port FROM backends WHERE fqdn IN (SELECT fqdn FROM hosts{where}) ORDER BY rowid",
+            args
+        ):
+            backends.setdefault(fqdn, []).append({"address": address, "port": port})
+        return [_record(row, backends.get(row[0], [])) for row in rows]
+
+    def fqdns(self) -> List[str]:
+        """All FQDNs, sorted."""
+        conn = self._connect(write=False)
+        if conn is None:
+            return []
+        return [row[0] for row in conn.execute("SELECT fqdn FROM hosts ORDER BY fqdn")]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connect(self, write: bool) -> Optional[sqlite3.Connection]:
+        """
+        Open the database (read-only until a write is needed)
+
+        Reading never creates the file, so commands without write access
+        (tab completion, nrp list as non-root) fall back to the files.
+        """
+        if self._conn is not None and (self._writable or not write):
+            return self._conn
+        if self.path is None:
+            self._conn, self._writable = sqlite3.connect(":memory:"), True
+        elif write:
+            self.close()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn, self._writable = sqlite3.connect(self.path), True
+        else:
+            try:
+                self._conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            except sqlite3.Error:
+                return None
+            self._writable = False
+            try:
+                version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            except sqlite3.Error:
+                version = None
+            if version != SCHEMA_VERSION:
+                self.close()
+                return None
+            return self._conn
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Older layout: start over, the caller re-imports (stamp is gone)
+            self._conn.executescript(_DROP)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return self._conn
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, record: Dict) -> None:
+        values = [record.get(column) for column in _HOST_COLUMNS]
+        for column in ("waf", "websockets", "routed"):
+            values[_HOST_COLUMNS.index(column)] = int(bool(record.get(column)))
+        if record.get("params") is not None:
+            values[_HOST_COLUMNS.index("params")] = json.dumps(record["params"], sort_keys=True)
+        conn.execute(
+            f"INSERT INTO hosts ({', '.join(_HOST_COLUMNS)}) VALUES ({', '.join('?' * len(_HOST_COLUMNS))})",
+            values
+        )
+        conn.executemany(
+            "INSERT INTO backends (fqdn, address, port, ip_version, ip) VALUES (?, ?, ?, ?, ?)",
+            [
+                (record["fqdn"], backend["address"], backend["port"], *_ip_key(backend["address"]))
+                for backend in record.get("backends", [])
+            ]
+        )
+
+    @staticmethod
+    def _set_stamp(conn: sqlite3.Connection, stamp: Optional[str]) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stamp', ?)", (stamp,))
+
+
+def _ip_key(address: str) -> tuple:
+    """(version, hex) of an IP address, (None, None) for hostnames."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None, None
+    return ip.version, f"{int(ip):032x}"
+
+
+def _backend_in(networks: list) -> tuple:
+    """SQL condition (and its arguments) for hosts with a backend in one of the networks."""
+    ranges, args = [], []
+    for network in networks:
+        ranges.append("(ip_version = ? AND ip BETWEEN ? AND ?)")
+        args.extend([
+            network.version, f"{int(network.network_address):032x}", f"{int(network.broadcast_address):032x}"
+        ])
+    return f"fqdn IN (SELECT fqdn FROM backends WHERE {' OR '.join(ranges)})", args
+
+
+def _record(row: tuple, backends: list) -> Dict:
+    record = dict(zip(_HOST_COLUMNS, row))
+    for column in ("waf", "websockets", "routed"):
+        record[column] = bool(record[column])
+    record["params"] = json.loads(record["params"]) if record["params"] else None
+    record["backends"] = backends
+    return record
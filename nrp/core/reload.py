@@ -0,0 +1,120 @@
+"""
+Reload coalescing for NGINX
+
+Every 'nginx -s reload' starts a new generation of worker processes while
+the old ones drain. When automation fires many nrp commands in a short
+time, reload requests are coalesced across processes via lock files:
+
+  1. Each request is counted and timestamped.
+  2. Requesters queue on an exclusive reload lock.
+  3. The lock holder waits for the debounce window, then reloads once.
+  4. Everyone who requested before that reload started is already covered
+     (NGINX reads the whole config tree at reload time) and returns
+     without reloading again.
+"""
+import fcntl
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict
+
+from nrp.config import (
+    NGINX_RELOAD_WINDOW,
+    RELOAD_LOCK_PATH,
+    RELOAD_STATE_PATH,
+)
+
+_EMPTY_STATE = {
+    "requested": 0,
+    "performed": 0,
+    "coalesced": 0,
+    "failed": 0,
+    "last_reload_at": 0.0,
+}
+
+
+class ReloadScheduler:
+    """Coalesces concurrent reload requests into a single reload"""
+
+    def __init__(
+        self,
+        reload_func: Callable[[], bool],
+        window: float = NGINX_RELOAD_WINDOW,
+        lock_path: Path = RELOAD_LOCK_PATH,
+        state_path: Path = RELOAD_STATE_PATH
+    ):
+        self.reload_func = reload_func
+        self.window = window
+        self.lock_path = lock_path
+        self.state_path = state_path
+
+    def request(self) -> bool:
+        """
+        Request a reload and wait until it is covered
+
+        Returns:
+            True if a reload that started after this request succeeded,
+            False otherwise
+        """
+        try:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            requested_at = time.time()
+            with self._state() as state:
+                state["requested"] += 1
+        except OSError:
+            # No writable data dir (e.g. unprivileged call) - reload directly
+            return self.reload_func()
+
+        with _flock(self.lock_path):
+            with self._state() as state:
+                if state["last_reload_at"] >= requested_at:
+                    state["coalesced"] += 1
+                    return True
+
+            if self.window > 0:
+                time.sleep(self.window)
+
+            started_at = time.time()
+            ok = self.reload_func()
+            with self._state() as state:
+                if ok:
+                    state["performed"] += 1
+                    state["last_reload_at"] = started_at
+                else:
+                    state["failed"] += 1
+            return ok
+
+    def stats(self) -> Dict:
+        """
+        Read reload counters
+
+        Returns:
+            Dict with requested, performed, coalesced, failed and last_reload_at
+        """
+        if not self.state_path.exists():
+            return dict(_EMPTY_STATE)
+        return {**_EMPTY_STATE, **json.loads(self.state_path.read_text() or "{}")}
+
+    @contextmanager
+    def _state(self):
+        """Load, yield and persist the counter state under a short-lived lock."""
+        with _flock(self.state_path.with_suffix(".json.lock")):
+            state = self.stats()
+            yield state
+            self.state_path.write_text(json.dumps(state, indent=2))
+
+
+@contextmanager
+def _flock(path: Path):
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def get_stats() -> Dict:
+    """Reload counters of the default scheduler."""
+    return ReloadScheduler(lambda: True).stats()
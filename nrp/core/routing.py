@@ -0,0 +1,62 @@
+"""
+Consolidated routing for many proxy hosts (ROUTING_MODE = "map")
+
+In the default "files" mode every host gets its own port-80 and port-443
+server block. With thousands of hosts, 'nginx -t' and every reload parse
+and set up thousands of server blocks, each with its own SSL context and
+certificate in worker memory.
+
+In "map" mode, hosts without special settings share one routing file
+(ROUTES_CONF in conf.d):
+
+    - one port-80 redirect server and one port-443 server for all of them
+    - 'map $host' tables for upstream, forward scheme and HSTS max-age
+    - certificates selected per handshake via $ssl_server_name
+      (NGINX >= 1.15.9, cached with ssl_certificate_cache from 1.27.4)
+
+Their host file only keeps the nrp-host header and ROUTED_MARK, so all
+per-host commands keep working. Hosts that genuinely differ (custom port,
+WAF, cache, limits, websockets, ...) keep their own server blocks.
+ROUTES_CONF is derived from the host files by every config transaction.
+"""
+from typing import Dict
+
+from nrp.config import DEFAULT_CLIENT_MAX_BODY_SIZE, DEFAULT_HTTP2
+
+ROUTING_MODES = ("files", "map")
+
+ROUTED_MARK = "# nrp-routed"
+
+# Variables in ssl_certificate, and the cache for certificates loaded that way
+VARIABLE_CERT_VERSION = (1, 15, 9)
+CERT_CACHE_VERSION = (1, 27, 4)
+
+
+def is_routable(params: Dict) -> bool:
+    """
+    Whether a host can be served by the shared server blocks
+
+    Args:
+        params: Render parameters of the host (nrp-host header)
+    """
+    http2 = params.get("http2")
+    return (
+        int(params.get("external_port", 443)) == 443
+        and not params.get("waf_enabled")
+        and not params.get("websockets_enabled")
+        and not params.get("cache_profile")
+        and not params.get("microcache")
+        and not params.get("compression")
+        and (params.get("traffic_profile") or "default") == "default"
+        and not params.get("static_locations")
+        and not params.get("rate_limit")
+        and not params.get("conn_limit")
+        and not params.get("http3")
+        and (http2 is None or http2 == DEFAULT_HTTP2)
+        and params.get("client_max_body_size", DEFAULT_CLIENT_MAX_BODY_SIZE) == DEFAULT_CLIENT_MAX_BODY_SIZE
+    )
+
+
+def is_routed(content: str) -> bool:
+    """Whether a host file is served via the routing file."""
+    return ROUTED_MARK in content.splitlines()
@@ -0,0 +1,80 @@
+"""
+Shared include snippets and the common port-80 server
+
+Blocks that are identical for every proxy host live in versioned files in
+NGINX_SNIPPET_DIR ('nrp-<name>-v<version>.conf') which host files include
+instead of repeating them:
+
+    proxy   default proxy headers and HTTP/1.1 to the backend
+    acme    ACME challenge location served from ACME_WEBROOT
+
+The version changes whenever host files must be re-rendered to work with
+a snippet (a different set of directives, not just other values). Old and
+new versions exist side by side until no host file includes the old one,
+so a partially migrated configuration stays valid. Snippets and
+REDIRECT_CONF (one port-80 server for all hosts on port 443, with ACME
+challenges) are derived by every config transaction. The port-80 default
+server in catch-all.conf includes the ACME snippet as well, so hosts
+without a configuration yet can get their certificate (nrp add).
+"""
+import re
+from pathlib import Path
+from typing import Iterable, Set
+
+VERSION = 1
+NAMES = ("proxy", "acme")
+
+SNIPPET_PATTERN = re.compile(r"^nrp-[a-z]+-v\d+\.conf$")
+_HTTP_LISTEN = re.compile(r"^[ \t]*listen[ \t]+(?:\S+:)?80[ \t;]", re.MULTILINE)
+_INCLUDE = re.compile(r"^[ \t]*include[ \t]+\S*/(nrp-[a-z]+-v\d+\.conf)[ \t]*;", re.MULTILINE)
+# server_name line of the first port-80 default server (catch-all.conf)
+_DEFAULT_HTTP_NAME = re.compile(
+    r"^[ \t]*listen[ \t]+(?:\S+:)?80[ \t][^;\n]*default_server[^;\n]*;\n(?:[^\n]*\n)*?([ \t]*)server_name[^;\n]*;[^\n]*\n",
+    re.MULTILINE
+)
+
+
+def file_name(name: str, version: int = VERSION) -> str:
+    """File name of a snippet version."""
+    return f"nrp-{name}-v{version}.conf"
+
+
+def render(env, name: str, **context) -> str:
+    """Render the current version of a snippet."""
+    return env.get_template(f"nrp-{name}.conf.j2").render(**context)
+
+
+def referenced(contents: Iterable[str]) -> Set[str]:
+    """File names of all snippets included by the given configurations."""
+    names = set()
+    for content in contents:
+        names.update(_INCLUDE.findall(content))
+    return names
+
+
+def is_snippet(path: Path) -> bool:
+    return bool(SNIPPET_PATTERN.match(path.name))
+
+
+def has_http_server(content: str) -> bool:
+    """Whether a host file still has its own port-80 server (rendered by older versions)."""
+    return bool(_HTTP_LISTEN.search(content))
+
+
+def include_in_default_server(content: str, snippet: Path) -> str:
+    """
+    Include a snippet in the port-80 default server of a configuration
+
+    An included older version of the same snippet is replaced; without a
+    port-80 default server, the content is returned unchanged.
+    """
+    prefix = snippet.name.rsplit("-v", 1)[0] + "-v"
+    for match in _INCLUDE.finditer(content):
+        if match.group(1).startswith(prefix):
+            indent = match.group(0)[:len(match.group(0)) - len(match.group(0).lstrip())]
+            return content[:match.start()] + f"{indent}include {snippet};" + content[match.end():]
+    match = _DEFAULT_HTTP_NAME.search(content)
+    if match is None:
+        return content
+    include = f"\n{match.group(1)}include {snippet};\n"
+    return content[:match.end()] + include + content[match.end():]
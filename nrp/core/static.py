@@ -0,0 +1,124 @@
+"""
+Static asset offload - serve URL prefixes of a proxy host from local disk
+
+Files below such a prefix are delivered by NGINX directly (sendfile,
+open_file_cache, long expires) and never reach the backend or the
+WireGuard tunnel. 'nrp static sync' copies a build output into the
+directory; every file is replaced atomically, so clients never see a
+half-written asset.
+"""
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from nrp.config import NRP_STATIC_DIR
+
+
+def normalize_prefix(prefix: str) -> str:
+    """URL prefix with leading and trailing slash ('assets' -> '/assets/')."""
+    prefix = "/" + prefix.strip("/")
+    return prefix if prefix == "/" else prefix + "/"
+
+
+def default_dir(fqdn: str, prefix: str) -> Path:
+    """Directory used when no local directory is given for a prefix."""
+    slug = normalize_prefix(prefix).strip("/").replace("/", "-") or "root"
+    return NRP_STATIC_DIR / fqdn / slug
+
+
+def parse_static(value: str, fqdn: str) -> Tuple[str, str]:
+    """
+    Parse a static location given as 'PREFIX[=DIR]'
+
+    Args:
+        value: e.g. '/assets/=/srv/app/dist' or '/assets/'
+        fqdn: Host the location belongs to (for the default directory)
+
+    Returns:
+        (normalized prefix, absolute directory)
+
+    Raises:
+        ValueError: On a malformed value, the root prefix or a relative directory
+    """
+    prefix, _, directory = value.partition("=")
+    if not prefix.startswith("/"):
+        raise ValueError(f"Ungültiger Pfad-Präfix '{prefix}' (muss mit '/' beginnen)")
+    prefix = normalize_prefix(prefix)
+    if prefix == "/":
+        raise ValueError("Das Präfix '/' ist dem Backend vorbehalten")
+    if not directory:
+        directory = str(default_dir(fqdn, prefix))
+    if not os.path.isabs(directory):
+        raise ValueError(f"Verzeichnis muss ein absoluter Pfad sein: {directory}")
+    return prefix, directory.rstrip("/")
+
+
+def resolve_target(locations: Dict[str, str], prefix: Optional[str]) -> Tuple[str, Path]:
+    """
+    Pick the static location to sync into
+
+    Raises:
+        ValueError: If the host has no (matching) static location, or
+                    several and no prefix was given
+    """
+    if not locations:
+        raise ValueError("Für diesen Host sind keine statischen Pfade konfiguriert (nrp add --static)")
+    if prefix is None:
+        if len(locations) > 1:
+            raise ValueError(f"Mehrere statische Pfade vorhanden, bitte --prefix angeben: {', '.join(locations)}")
+        prefix = next(iter(locations))
+    prefix = normalize_prefix(prefix)
+    if prefix not in locations:
+        raise ValueError(f"Kein statischer Pfad {prefix} konfiguriert")
+    return prefix, Path(locations[prefix])
+
+
+def sync(src: Path, dest: Path, delete: bool = False) -> Dict[str, int]:
+    """
+    Copy new and changed files from src to dest
+
+    Files are compared by size and modification time. Each file is written
+    to a temp name and renamed into place.
+
+    Args:
+        src: Source directory (e.g. build output)
+        dest: Static directory of the host
+        delete: Remove files in dest that no longer exist in src
+
+    Returns:
+        Dict with counts 'copied', 'unchanged' and 'deleted'
+    """
+    stats = {"copied": 0, "unchanged": 0, "deleted": 0}
+    wanted = set()
+    for root, _dirs, files in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        target_dir = dest / rel_root
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            source = Path(root) / name
+            target = target_dir / name
+            wanted.add(rel_root / name)
+            src_stat = source.stat()
+            if target.exists():
+                dst_stat = target.stat()
+                if dst_stat.st_size == src_stat.st_size and int(dst_stat.st_mtime) == int(src_stat.st_mtime):
+                    stats["unchanged"] += 1
+                    continue
+            tmp = target.with_name(f".{name}.nrp-tmp")
+            shutil.copy2(source, tmp)
+            os.replace(tmp, target)
+            stats["copied"] += 1
+
+    if delete:
+        for root, dirs, files in os.walk(dest, topdown=False):
+            rel_root = Path(root).relative_to(dest)
+            for name in files:
+                if rel_root / name not in wanted:
+                    (Path(root) / name).unlink()
+                    stats["deleted"] += 1
+            for name in dirs:
+                directory = Path(root) / name
+                if not any(directory.iterdir()):
+                    directory.rmdir()
+    return stats
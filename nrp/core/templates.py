@@ -0,0 +1,96 @@
+"""
+Shared Jinja2 environment with an on-disk bytecode cache
+
+Templates are compiled once per process (the environment keeps compiled
+templates in memory) and once per template version across processes:
+compiled bytecode is stored in TEMPLATE_CACHE_DIR and only reused while
+the checksum of the template source matches, so editing or upgrading a
+template invalidates its cache entry automatically.
+
+Entries are keyed by template name and path, so an installation in a new
+location leaves the old entries behind; the cache keeps at most
+MAX_CACHE_ENTRIES files and drops the oldest when a new one is written.
+
+The cache is optional: without a writable cache directory (e.g. shell
+completion as a normal user) templates are simply compiled in memory.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from nrp.config import TEMPLATE_CACHE_DIR, TEMPLATE_DIR
+
+# Several times the number of templates, so two installations fit
+MAX_CACHE_ENTRIES = 100
+
+# Default of environment(cache_dir=...): TEMPLATE_CACHE_DIR at call time
+_DEFAULT = object()
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache that never fails a render because the cache is not writable."""
+
+    def dump_bytecode(self, bucket) -> None:
+        try:
+            super().dump_bytecode(bucket)
+            self.prune()
+        except OSError:
+            pass
+
+    def prune(self, keep: Optional[int] = None) -> int:
+        """Remove the oldest entries beyond keep (default: MAX_CACHE_ENTRIES); returns the number removed."""
+        keep = MAX_CACHE_ENTRIES if keep is None else keep
+        entries = []
+        for path in Path(self.directory).glob(self.pattern % "*"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                pass
+        entries.sort(reverse=True)
+        for _, path in entries[keep:]:
+            path.unlink(missing_ok=True)
+        return max(0, len(entries) - keep)
+
+
+def bytecode_cache(directory: Optional[Path] = None) -> Optional[FileSystemBytecodeCache]:
+    """Bytecode cache in directory (default: TEMPLATE_CACHE_DIR), or None if it cannot be created."""
+    directory = TEMPLATE_CACHE_DIR if directory is None else directory
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return _BytecodeCache(str(directory), pattern="nrp-%s.cache")
+
+
+def environment(template_dir: Optional[str] = None, cache_dir=_DEFAULT) -> Environment:
+    """
+    Jinja2 environment shared by all NginxManager instances of a process
+
+    Defaults are resolved on every call, so changing TEMPLATE_DIR or
+    TEMPLATE_CACHE_DIR (tests, runtime configuration) takes effect.
+
+    Args:
+        template_dir: Template directory (default: TEMPLATE_DIR)
+        cache_dir: Bytecode cache directory (default: TEMPLATE_CACHE_DIR, None = off)
+    """
+    if cache_dir is _DEFAULT:
+        cache_dir = TEMPLATE_CACHE_DIR
+    return _environment(
+        str(TEMPLATE_DIR if template_dir is None else template_dir),
+        None if cache_dir is None else str(cache_dir),
+    )
+
+
+@lru_cache(maxsize=None)
+def _environment(template_dir: str, cache_dir: Optional[str]) -> Environment:
+    # trim_blocks/lstrip_blocks: {% if %} lines leave no blank lines behind
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+        bytecode_cache=bytecode_cache(Path(cache_dir)) if cache_dir else None,
+        auto_reload=False,
+    )
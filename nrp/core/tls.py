@@ -0,0 +1,134 @@
+"""
+Shared TLS profile for all proxy hosts - session cache, ticket keys, buffers
+
+Hosts include either certbot's options-ssl-nginx.conf or, once a profile
+is activated with 'nrp tls profile', the NRP snippet TLS_SNIPPET. Both set
+ssl_session_cache, so a host must include exactly one of them; activating
+a profile therefore switches the include line of every host file.
+
+Session resumption skips the full handshake (the expensive asymmetric
+part) for returning clients. Tickets are encrypted with keys from
+TLS_TICKET_DIR: the first key encrypts new tickets, the older ones only
+decrypt, so rotating keeps already issued tickets valid for one more
+rotation period.
+"""
+import os
+import re
+from pathlib import Path
+from typing import List, Optional
+
+from nrp.config import (
+    LETSENCRYPT_OPTIONS_SSL,
+    TLS_SNIPPET,
+    TLS_TICKET_DIR,
+    TLS_TICKET_KEYS,
+)
+
+# ssl_session_cache: 1 MB holds about 4000 sessions
+TLS_PROFILES = {
+    "balanced": {
+        "session_cache": "50m",
+        "session_timeout": "1d",
+        "session_tickets": True,
+        "buffer_size": "4k",
+        "description": "Schnelle erste Bytes, Wiederaufnahme per Cache und Tickets (empfohlen)",
+    },
+    "throughput": {
+        "session_cache": "50m",
+        "session_timeout": "1d",
+        "session_tickets": True,
+        "buffer_size": "16k",
+        "description": "Große TLS-Records für Downloads und Streaming",
+    },
+    "strict": {
+        "session_cache": "20m",
+        "session_timeout": "1h",
+        "session_tickets": False,
+        "buffer_size": "4k",
+        "description": "Keine Session-Tickets, kurze Sessions (Forward Secrecy vor Performance)",
+    },
+}
+
+DEFAULT_TLS_PROFILE = "balanced"
+
+KEY_TYPES = ["rsa", "ecdsa"]
+
+PROFILE_HEADER = "# nrp-tls-profile: "
+
+# AES-256 ticket keys for ssl_session_ticket_key are 80 bytes
+TICKET_KEY_SIZE = 80
+
+def ssl_options_path() -> Path:
+    """TLS options include for host configurations (NRP snippet if a profile is active)."""
+    return TLS_SNIPPET if TLS_SNIPPET.exists() else LETSENCRYPT_OPTIONS_SSL
+
+
+def active_profile() -> Optional[str]:
+    """Name of the active TLS profile, or None if hosts use certbot's defaults."""
+    if not TLS_SNIPPET.exists():
+        return None
+    for line in TLS_SNIPPET.read_text().splitlines():
+        if line.startswith(PROFILE_HEADER):
+            return line[len(PROFILE_HEADER):].strip()
+    return None
+
+
+def ticket_key_path(index: int) -> Path:
+    """Path of a ticket key; index 0 is the key encrypting new tickets."""
+    return TLS_TICKET_DIR / f"ticket.{index}.key"
+
+
+def rotated_ticket_keys(existing: List[Optional[bytes]]) -> List[bytes]:
+    """
+    Key list after a rotation: a new key first, older keys shifted back
+
+    Args:
+        existing: Current keys by index (None for missing files)
+
+    Returns:
+        TLS_TICKET_KEYS keys; missing old slots are filled with fresh keys
+    """
+    keys = [os.urandom(TICKET_KEY_SIZE)] + [key for key in existing if key]
+    while len(keys) < TLS_TICKET_KEYS:
+        keys.append(os.urandom(TICKET_KEY_SIZE))
+    return keys[:TLS_TICKET_KEYS]
+
+
+def read_ticket_keys() -> List[Optional[bytes]]:
+    """Current ticket keys by index (None for missing files)."""
+    keys = []
+    for index in range(TLS_TICKET_KEYS):
+        path = ticket_key_path(index)
+        keys.append(path.read_bytes() if path.exists() else None)
+    return keys
+
+
+def render_snippet(env, profile: str) -> str:
+    """
+    Render the shared TLS snippet
+
+    Args:
+        env: Jinja2 environment of the NginxManager
+        profile: Name of a TLS_PROFILES entry
+
+    Raises:
+        ValueError: On an unknown profile
+    """
+    if profile not in TLS_PROFILES:
+        raise ValueError(f"Unbekanntes TLS-Profil: {profile}")
+    return env.get_template("tls_profile.conf.j2").render(
+        header=PROFILE_HEADER + profile,
+        profile=profile,
+        ticket_keys=[ticket_key_path(i) for i in range(TLS_TICKET_KEYS)],
+        **TLS_PROFILES[profile]
+    )
+
+
+def switch_include(content: str, target: Path) -> str:
+    """Point the TLS options include of a host configuration to target."""
+    pattern = re.compile(
+        r"^(\s*include\s+)(" + re.escape(str(LETSENCRYPT_OPTIONS_SSL)) + "|"
+        + re.escape(str(TLS_SNIPPET)) + r")(\s*;)",
+        re.MULTILINE
+    )
+    return pattern.sub(lambda m: m.group(1) + str(target) + m.group(3), content)
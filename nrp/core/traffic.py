@@ -0,0 +1,96 @@
+"""
+Traffic profiles - buffering and timeouts per proxy host
+
+NGINX defaults (buffer the whole request body, buffer responses with
+small memory buffers, 60s timeouts) suit none of these cases well:
+
+    streaming  Server-Sent Events, long polling, chunked live output:
+               responses are passed through immediately, long read timeout
+    api        Small JSON requests/responses: bodies and responses stay in
+               memory, larger header buffer (tokens, cookies), short timeouts
+    upload     Large uploads: the request body is streamed to the backend
+               instead of being spooled to disk first, long send timeouts
+"""
+from typing import Dict, Optional
+
+TRAFFIC_PROFILES = {
+    "default": None,
+    "streaming": {
+        "request_buffering": True,
+        "buffering": False,
+        "buffer_size": "8k",
+        "buffers": None,
+        "busy_buffers_size": None,
+        "client_body_buffer_size": "16k",
+        "max_temp_file_size": None,
+        "connect_timeout": "10s",
+        "read_timeout": "1h",
+        "send_timeout": "1h",
+        "client_body_timeout": None,
+        "description": "SSE, Long-Polling, Live-Ausgaben: Antworten ungepuffert durchreichen",
+    },
+    "api": {
+        "request_buffering": True,
+        "buffering": True,
+        "buffer_size": "16k",
+        "buffers": "16 16k",
+        "busy_buffers_size": "32k",
+        "client_body_buffer_size": "128k",
+        "max_temp_file_size": "0",
+        "connect_timeout": "5s",
+        "read_timeout": "30s",
+        "send_timeout": "30s",
+        "client_body_timeout": "30s",
+        "description": "Kleine JSON-Requests: alles im Speicher, kurze Timeouts",
+    },
+    "upload": {
+        "request_buffering": False,
+        "buffering": True,
+        "buffer_size": "8k",
+        "buffers": "8 16k",
+        "busy_buffers_size": None,
+        "client_body_buffer_size": "1m",
+        "max_temp_file_size": "1024m",
+        "connect_timeout": "10s",
+        "read_timeout": "300s",
+        "send_timeout": "300s",
+        "client_body_timeout": "300s",
+        "description": "Große Uploads direkt zum Backend streamen statt auf Disk zu puffern",
+    },
+}
+
+DEFAULT_TRAFFIC_PROFILE = "default"
+
+
+def settings(profile: Optional[str]) -> Optional[Dict]:
+    """
+    Template variables for a traffic profile
+
+    Args:
+        profile: Name of a TRAFFIC_PROFILES entry; None or 'default' keeps
+                 the NGINX defaults
+
+    Returns:
+        Dict with the profile values, or None
+
+    Raises:
+        ValueError: On an unknown profile
+    """
+    profile = profile or DEFAULT_TRAFFIC_PROFILE
+    if profile not in TRAFFIC_PROFILES:
+        raise ValueError(f"Unbekanntes Traffic-Profil: {profile}")
+    return TRAFFIC_PROFILES[profile]
+
+
+def check_compatible(profile: Optional[str], cached: bool) -> None:
+    """
+    Reject profiles that disable response buffering on cached hosts
+
+    NGINX can only cache buffered responses.
+
+    Raises:
+        ValueError: If the combination cannot work
+    """
+    traffic = settings(profile)
+    if cached and traffic and not traffic["buffering"]:
+        raise ValueError(f"Traffic-Profil '{profile}' puffert keine Antworten und ist nicht mit Caching kombinierbar")
@@ -0,0 +1,283 @@
+"""
+Worker and OS limit sizing (nrp tune)
+
+Sizing follows CPU count, memory and the configured hosts:
+
+    nginx.conf          worker_processes, worker_rlimit_nofile (main) and
+                        worker_connections, multi_accept (events); managed
+                        lines end in '# nrp tune'
+    catch-all.conf      listen backlog on the default_server listeners,
+                        which own the sockets of ports 80 and 443
+    TUNING_CONF         server_names_hash sizes (http); re-derived from the
+                        host files by every config transaction once it exists.
+                        NGINX rejects a directive set twice in http, so
+                        active server_names_hash lines of nginx.conf are
+                        commented out
+    SYSCTL_TUNING_CONF  accept queue, SYN backlog and ephemeral port range
+
+Every proxied client holds two connections (client and backend) and two
+file descriptors, so max clients = workers * worker_connections / 2.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HEADER_PREFIX = "# nrp-tuning: "
+MANAGED_MARK = "# nrp tune"
+
+# Memory per proxied client: two connections with default client/proxy buffers
+_CLIENT_MEMORY = 64 * 1024
+# Coraza keeps request body and transaction state per request
+_WAF_CLIENT_MEMORY = 256 * 1024
+# Share of RAM budgeted for connections (rest: page cache, cache zones, OS)
+_MEMORY_SHARE = 0.5
+
+MIN_WORKER_CONNECTIONS = 1024
+MAX_WORKER_CONNECTIONS = 65536
+# Used when the memory size is unknown
+DEFAULT_WORKER_CONNECTIONS = 4096
+MIN_SOMAXCONN = 4096
+MAX_SOMAXCONN = 65535
+# Starts above the registered ports (MySQL 3306, PostgreSQL 5432, ...), so
+# connections to the backends never take a port a local daemon binds
+EPHEMERAL_PORT_RANGE = "10240 65535"
+
+_SIZE_UNITS = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def system_resources() -> Dict:
+    """
+    CPUs available to this process and total memory
+
+    Returns:
+        Dict with cpus and memory (bytes, None if /proc/meminfo is unreadable)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    memory = None
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemTotal:"):
+                memory = int(line.split()[1]) * 1024
+                break
+    except (OSError, ValueError, IndexError):
+        pass
+    return {"cpus": cpus, "memory": memory}
+
+
+def size_bytes(value: str) -> int:
+    """Parse an NGINX size ('512k', '32m', '1g') into bytes."""
+    value = str(value).strip().lower()
+    if value and value[-1] in _SIZE_UNITS:
+        return int(value[:-1]) * _SIZE_UNITS[value[-1]]
+    return int(value)
+
+
+def _next_power_of_two(value: int) -> int:
+    return 1 << max(0, int(value) - 1).bit_length()
+
+
+def server_names_hash(server_names: Iterable[str]) -> Dict[str, int]:
+    """
+    server_names_hash sizes for a set of names
+
+    The bucket must hold the longest name plus pointer/length overhead,
+    the hash must have room for all names (with headroom for collisions).
+    """
+    names = list(server_names)
+    longest = max((len(name) for name in names), default=0)
+    return {
+        "server_names_hash_bucket_size": max(64, _next_power_of_two(longest + 16)),
+        "server_names_hash_max_size": max(512, _next_power_of_two(2 * len(names))),
+    }
+
+
+def recommend(
+    cpus: int,
+    memory: Optional[int],
+    server_names: Iterable[str],
+    waf_hosts: int = 0,
+    cache_zone_bytes: int = 0
+) -> Dict:
+    """
+    Recommended settings
+
+    Args:
+        cpus: CPUs available to NGINX
+        memory: Total memory in bytes (None = unknown)
+        server_names: FQDNs of all proxy hosts
+        waf_hosts: Number of hosts with Coraza enabled
+        cache_zone_bytes: Shared memory of all cache key zones
+
+    Returns:
+        Dict of settings plus max_clients (concurrent proxied clients)
+    """
+    server_names = list(server_names)
+    workers = max(1, cpus)
+    if memory is None:
+        connections = DEFAULT_WORKER_CONNECTIONS
+    else:
+        per_client = _CLIENT_MEMORY + (_WAF_CLIENT_MEMORY if waf_hosts else 0)
+        budget = max(0, memory * _MEMORY_SHARE - cache_zone_bytes)
+        # Two connections per client, spread over all workers
+        connections = int(budget // per_client) * 2 // workers
+    connections = max(MIN_WORKER_CONNECTIONS, min(MAX_WORKER_CONNECTIONS, connections // 1024 * 1024))
+
+    # Client + backend socket per client, plus cache files being read or written
+    nofile = connections * 2 + (connections // 2 if cache_zone_bytes else 0)
+    somaxconn = max(MIN_SOMAXCONN, min(MAX_SOMAXCONN, _next_power_of_two(connections)))
+
+    return {
+        "worker_processes": workers,
+        "worker_connections": connections,
+        "worker_rlimit_nofile": nofile,
+        "multi_accept": "on",
+        "backlog": somaxconn,
+        "somaxconn": somaxconn,
+        "tcp_max_syn_backlog": somaxconn,
+        **server_names_hash(server_names),
+        "hosts": len(server_names),
+        "max_clients": workers * connections // 2,
+    }
+
+
+# ── nginx.conf ────────────────────────────────────────────────────────────────
+
+def _find_directive(content: str, name: str) -> Optional[re.Match]:
+    # Prefer the active directive over a commented-out one
+    for comment in ("", "#[ \t]*"):
+        match = re.search(rf"^([ \t]*){comment}{name}\s+[^;\n]*;.*$", content, re.MULTILINE)
+        if match:
+            return match
+    return None
+
+
+def _set_directive(content: str, name: str, value, indent: str = "", after: Optional[str] = None) -> str:
+    line = f"{name} {value};  {MANAGED_MARK}"
+    match = _find_directive(content, name)
+    if match:
+        return content[:match.start()] + match.group(1) + line + content[match.end():]
+    if after:
+        anchor = _find_directive(content, after)
+        if anchor:
+            return content[:anchor.end()] + f"\n{indent}{line}" + content[anchor.end():]
+    return f"{indent}{line}\n" + content
+
+
+def read_main(content: str) -> Dict[str, str]:
+    """Current (active) worker settings of nginx.conf."""
+    values = {}
+    for name in ("worker_processes", "worker_rlimit_nofile", "worker_connections", "multi_accept"):
+        match = re.search(rf"^[ \t]*{name}\s+([^;\n]*);", content, re.MULTILINE)
+        if match:
+            values[name] = match.group(1).strip()
+    return values
+
+
+def tune_main(content: str, settings: Dict) -> str:
+    """
+    Apply worker settings to the content of nginx.conf
+
+    Existing (or commented-out) directives are replaced in place, missing
+    ones are added next to worker_processes or inside the events block.
+    """
+    content = _set_directive(content, "worker_processes", settings["worker_processes"])
+    content = _set_directive(
+        content, "worker_rlimit_nofile", settings["worker_rlimit_nofile"], after="worker_processes"
+    )
+
+    events = re.search(r"^events\s*\{([^}]*)\}", content, re.MULTILINE)
+    if events is None:
+        content = content.rstrip("\n") + "\n\nevents {\n}\n"
+        events = re.search(r"^events\s*\{([^}]*)\}", content, re.MULTILINE)
+    body = events.group(1)
+    for name in ("worker_connections", "multi_accept"):
+        if _find_directive(body, name):
+            body = _set_directive(body, name, settings[name])
+        else:
+            body = body.rstrip() + f"\n    {name} {settings[name]};  {MANAGED_MARK}\n"
+    return content[:events.start(1)] + body + content[events.end(1):]
+
+
+_HTTP_DIRECTIVES = ("server_names_hash_bucket_size", "server_names_hash_max_size")
+# Set by conf.d/nrp-routes.conf (ROUTING_MODE = "map")
+MAP_HASH_DIRECTIVES = ("map_hash_bucket_size", "map_hash_max_size")
+
+
+def release_http(
+    content: str,
+    directives: Iterable[str] = _HTTP_DIRECTIVES,
+    owner: str = "http.d/tuning.conf"
+) -> Tuple[str, List[str]]:
+    """
+    Comment out http-level directives of nginx.conf that an NRP file sets
+
+    TUNING_CONF (server_names_hash) and the routing file (map_hash) set
+    them inside the same http block; a second active directive fails
+    'nginx -t' with "directive is duplicate".
+
+    Args:
+        content: nginx.conf
+        directives: Directive names
+        owner: File that sets them now, noted in the comment
+
+    Returns:
+        (new content, commented-out lines)
+    """
+    released = []
+
+    def comment(match: re.Match) -> str:
+        released.append(match.group(2).strip())
+        return f"{match.group(1)}# {match.group(2)}  {MANAGED_MARK}: {owner}"
+
+    pattern = rf"^([ \t]*)((?:{'|'.join(directives)})\s+[^;\n]*;)[^\n]*$"
+    return re.sub(pattern, comment, content, flags=re.MULTILINE), released
+
+
+_DEFAULT_LISTEN = re.compile(r"^(\s*listen\s+[^;\n]*default_server)(?:\s+backlog=\d+)?([^;\n]*;)", re.MULTILINE)
+
+
+def read_backlog(content: str) -> Optional[int]:
+    """Backlog of the first default_server listen line (None = NGINX default)."""
+    match = re.search(r"^\s*listen\s+[^;\n]*default_server[^;\n]*backlog=(\d+)", content, re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+
+def set_backlog(content: str, backlog: int) -> str:
+    """Set the backlog of all default_server listen lines (catch-all.conf)."""
+    return _DEFAULT_LISTEN.sub(rf"\g<1> backlog={backlog}\g<2>", content)
+
+
+# ── http.d / sysctl ───────────────────────────────────────────────────────────
+
+def parse_header(content: str) -> Optional[Dict]:
+    """Read the metadata header of TUNING_CONF (None if absent)."""
+    for line in content.splitlines():
+        if line.startswith(HEADER_PREFIX):
+            return json.loads(line[len(HEADER_PREFIX):])
+    return None
+
+
+def read_http(content: str) -> Dict[str, str]:
+    """Current (active) server_names_hash settings of TUNING_CONF or nginx.conf."""
+    return dict(re.findall(r"^[ \t]*(server_names_hash_\w+)\s+(\d+);", content, re.MULTILINE))
+
+
+def render_http(env, server_names: Iterable[str]) -> str:
+    """Render TUNING_CONF for the given server names."""
+    server_names = list(server_names)
+    return env.get_template("tuning.conf.j2").render(
+        header=HEADER_PREFIX + json.dumps({"hosts": len(server_names)}),
+        **server_names_hash(server_names),
+    )
+
+
+def render_sysctl(env, settings: Dict) -> str:
+    """Render SYSCTL_TUNING_CONF."""
+    return env.get_template("sysctl-tuning.conf.j2").render(
+        port_range=EPHEMERAL_PORT_RANGE, **settings
+    )
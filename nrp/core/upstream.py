@@ -0,0 +1,142 @@
+"""
+Backend pools (upstream blocks) for proxy hosts
+
+Every proxy host has its own upstream file in NGINX_UPSTREAM_DIR, included
+by the host configuration. The file starts with a machine-readable header,
+so backend changes can re-render just this file:
+
+    # nrp-upstream: {"lb_method": "least_conn", "backends": [...], ...}
+"""
+import json
+import re
+from typing import Dict, List, Optional
+
+from nrp.config import (
+    DEFAULT_LB_METHOD,
+    DEFAULT_HASH_KEY,
+    DEFAULT_BACKEND_MAX_FAILS,
+    DEFAULT_BACKEND_FAIL_TIMEOUT,
+    DEFAULT_UPSTREAM_KEEPALIVE,
+)
+from nrp.core.validation import validate_ip, validate_port
+
+LB_METHODS = ["round-robin", "least_conn", "ip_hash", "hash"]
+
+HEADER_PREFIX = "# nrp-upstream: "
+
+_TIMEOUT_PATTERN = re.compile(r"^\d+(ms|s|m|h)?$")
+# Variables and literals only: the key is written unquoted into 'hash ... consistent;'
+_HASH_KEY_PATTERN = re.compile(r"^[$A-Za-z0-9_.:-]+$")
+
+
+def make_backend(
+    address: str,
+    port: int,
+    weight: int = 1,
+    max_fails: int = DEFAULT_BACKEND_MAX_FAILS,
+    fail_timeout: str = DEFAULT_BACKEND_FAIL_TIMEOUT,
+    backup: bool = False
+) -> Dict:
+    """
+    Build and validate a backend entry
+
+    Raises:
+        ValueError: If a value is out of range
+    """
+    if not validate_ip(address):
+        raise ValueError(f"Ungültige IP-Adresse: {address}")
+    if not validate_port(int(port)):
+        raise ValueError(f"Ungültiger Port: {port}")
+    if int(weight) < 1:
+        raise ValueError(f"Ungültiges Gewicht: {weight}")
+    if int(max_fails) < 0:
+        raise ValueError(f"Ungültiger max_fails-Wert: {max_fails}")
+    if not _TIMEOUT_PATTERN.match(str(fail_timeout)):
+        raise ValueError(f"Ungültiger fail_timeout-Wert: {fail_timeout}")
+    return {
+        "address": address,
+        "port": int(port),
+        "weight": int(weight),
+        "max_fails": int(max_fails),
+        "fail_timeout": str(fail_timeout),
+        "backup": bool(backup),
+    }
+
+
+def parse_backend(value: str, **defaults) -> Dict:
+    """
+    Parse a backend given as 'IP:PORT[:WEIGHT]'
+
+    Args:
+        value: Backend string
+        defaults: Further make_backend() arguments (max_fails, fail_timeout, ...)
+
+    Raises:
+        ValueError: If the string is malformed
+    """
+    parts = value.split(":")
+    if len(parts) not in (2, 3) or not all(p.isdigit() for p in parts[1:]):
+        raise ValueError(f"Ungültiges Backend '{value}' (erwartet IP:PORT[:GEWICHT])")
+    if len(parts) == 3:
+        defaults["weight"] = int(parts[2])
+    return make_backend(parts[0], int(parts[1]), **defaults)
+
+
+def make_spec(
+    backends: List[Dict],
+    lb_method: str = DEFAULT_LB_METHOD,
+    hash_key: Optional[str] = None,
+    keepalive: int = DEFAULT_UPSTREAM_KEEPALIVE
+) -> Dict:
+    """
+    Build and validate an upstream spec
+
+    Raises:
+        ValueError: On an empty pool, unknown method, invalid hash key or
+            unsupported combination
+    """
+    if not backends:
+        raise ValueError("Mindestens ein Backend erforderlich")
+    if lb_method not in LB_METHODS:
+        raise ValueError(f"Unbekannte Balancing-Methode: {lb_method}")
+    if lb_method == "hash" and hash_key and not _HASH_KEY_PATTERN.match(str(hash_key)):
+        raise ValueError(f"Ungültiger Hash-Schlüssel: {hash_key}")
+    seen = set()
+    for backend in backends:
+        key = (backend["address"], backend["port"])
+        if key in seen:
+            raise ValueError(f"Backend doppelt: {backend_label(backend)}")
+        seen.add(key)
+    if lb_method in ("ip_hash", "hash") and any(b["backup"] for b in backends):
+        raise ValueError(f"Backup-Server sind mit '{lb_method}' nicht möglich")
+    if all(b["backup"] for b in backends):
+        raise ValueError("Mindestens ein Backend darf kein Backup-Server sein")
+    return {
+        "lb_method": lb_method,
+        "hash_key": (hash_key or DEFAULT_HASH_KEY) if lb_method == "hash" else None,
+        "keepalive": int(keepalive),
+        "backends": backends,
+    }
+
+
+def backend_label(backend: Dict) -> str:
+    """'IP:PORT' of a backend."""
+    return f"{backend['address']}:{backend['port']}"
+
+
+def header_line(spec: Dict) -> str:
+    """Metadata header written as first line of the upstream file."""
+    return HEADER_PREFIX + json.dumps(spec, sort_keys=True)
+
+
+def parse_header(content: str) -> Optional[Dict]:
+    """
+    Read the upstream spec from a rendered upstream file
+
+    Returns:
+        Spec dict, or None if the file has no nrp-upstream header
+    """
+    for line in content.splitlines():
+        if line.startswith(HEADER_PREFIX):
+            return json.loads(line[len(HEADER_PREFIX):])
+    return None
@@ -26,8 +26,9 @@ from nrp.config import (
     WAF_CORAZA_NGINX_REPO,
     WAF_CRS_REPO,
     WAF_CRS_VERSION,
-    NGINX_CONF_DIR,
+    NGINX_MAIN_CONF,
 )
+from nrp.core.nginx import NginxManager
 
 # ── Global rule set ───────────────────────────────────────────────────────────
 # Basiert auf der Coraza recommended configuration. Blocking erfolgt über das
@@ -111,20 +112,8 @@ def get_engine_mode() -> str:
 
 
 def list_waf_hosts() -> list[str]:
-    """Listet alle Proxy-Hosts, in deren Konfiguration Coraza aktiviert ist."""
-    hosts = []
-    if not NGINX_CONF_DIR.exists():
-        return hosts
-    for conf_file in NGINX_CONF_DIR.glob("*.conf"):
-        if conf_file.name == "catch-all.conf":
-            continue
-        try:
-            content = conf_file.read_text()
-        except OSError:
-            continue
-        if re.search(r"^\s*coraza\s+on\s*;", content, re.MULTILINE):
-            hosts.append(conf_file.stem)
-    return sorted(hosts)
+    """Listet alle Proxy-Hosts, in deren Konfiguration Coraza aktiviert ist (aus der Host-Registry)."""
+    return [host["fqdn"] for host in NginxManager().hosts(waf=True)]
 
 
 def get_status() -> dict:
@@ -236,8 +225,7 @@ def write_module_load_conf() -> bool:
     WAF_MODULE_LOAD_CONF.parent.mkdir(parents=True, exist_ok=True)
     WAF_MODULE_LOAD_CONF.write_text(_LOAD_MODULE_CONF)
 
-    nginx_conf = Path("/etc/nginx/nginx.conf")
-    if nginx_conf.exists() and "modules-enabled" in nginx_conf.read_text():
+    if NGINX_MAIN_CONF.exists() and "modules-enabled" in NGINX_MAIN_CONF.read_text():
         return True
     return False
 
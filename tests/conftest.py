@@ -0,0 +1,14 @@
+"""
+Shared fixtures
+"""
+import pytest
+
+from nrp.core import templates
+
+
+@pytest.fixture(autouse=True)
+def template_cache(tmp_path, monkeypatch):
+    """Keep compiled templates of the tests out of TEMPLATE_CACHE_DIR."""
+    cache_dir = tmp_path / "template-cache"
+    monkeypatch.setattr(templates, "TEMPLATE_CACHE_DIR", cache_dir)
+    return cache_dir
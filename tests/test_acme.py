@@ -0,0 +1,80 @@
+"""
+Unit tests for certificate issuance via the shared ACME webroot
+"""
+import subprocess
+from pathlib import Path
+
+from nrp.core import acme
+from nrp.core import certbot as certbot_core
+from nrp.core.certbot import CertbotManager
+from nrp.core.nginx import NginxManager
+
+LEGACY_CATCH_ALL = (
+    "server {\n"
+    "    listen 80 default_server backlog=4096;\n"
+    "    listen [::]:80 default_server;\n"
+    "\n"
+    "    server_name _;  # Fängt alle nicht definierten Domains ab\n"
+    "    root /usr/share/nginx/html;\n"
+    "}\n"
+    "\n"
+    "server {\n"
+    "    listen 443 ssl default_server;\n"
+    "    server_name _;\n"
+    "}\n"
+)
+
+
+def _manager(tmp_path):
+    nginx = NginxManager()
+    nginx.conf_dir = tmp_path / "conf.d"
+    nginx.conf_dir.mkdir()
+    nginx.snippet_dir = tmp_path / "snippets"
+    return nginx
+
+
+class TestAcmeWebroot:
+    """Tests for the ACME location in catch-all.conf and the certbot call"""
+
+    def test_catch_all_answers_challenges(self, tmp_path):
+        nginx = _manager(tmp_path)
+        assert not nginx.acme_ready()
+        nginx.catch_all_conf.write_text(nginx.render_catch_all(Path("/d.crt"), Path("/d.key")))
+        assert nginx.acme_ready()
+        assert nginx.migrate_catch_all() is None
+
+    def test_migrate_catch_all_keeps_local_changes(self, tmp_path):
+        nginx = _manager(tmp_path)
+        nginx.catch_all_conf.write_text(LEGACY_CATCH_ALL)
+        migrated = nginx.migrate_catch_all()
+        include = f"    include {nginx.snippet_path('acme')};\n"
+        assert migrated.count("include ") == 1
+        assert migrated.index(include) < migrated.index("root /usr/share/nginx/html;")
+        assert "backlog=4096" in migrated
+
+        # An older snippet version is replaced in place
+        nginx.catch_all_conf.write_text(migrated.replace("nrp-acme-v1.conf", "nrp-acme-v0.conf"))
+        assert nginx.migrate_catch_all() == migrated
+
+    def test_certificate_via_webroot(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(certbot_core, "ACME_WEBROOT", tmp_path / "acme")
+        monkeypatch.setattr(certbot_core, "CERTBOT_LOCK_PATH", tmp_path / "certbot.lock")
+        monkeypatch.setattr(
+            certbot_core.subprocess, "run",
+            lambda cmd, **kwargs: calls.append(cmd) or subprocess.CompletedProcess(cmd, 0, "", "")
+        )
+        assert CertbotManager().request_certificate("app.example.com", key_type="ecdsa")
+        assert calls[0][:5] == ["certbot", "certonly", "--webroot", "-w", str(tmp_path / "acme")]
+        assert "--nginx" not in calls[0]
+        assert (tmp_path / "acme").is_dir()
+
+        assert CertbotManager().issue("app.example.com", sans=["app.example.com", "www.app.example.com"])[0]
+        assert calls[1][calls[1].index("--cert-name") + 1] == "app.example.com"
+        assert [calls[1][i + 1] for i, arg in enumerate(calls[1]) if arg == "-d"] == [
+            "app.example.com", "www.app.example.com"
+        ]
+
+    def test_certbot_queue_runs_one_worker(self):
+        with acme.open_issuer("certbot") as issuer:
+            assert acme.pool_size(issuer, 8) == 1
@@ -0,0 +1,321 @@
+"""
+Unit tests for the native ACME client against a local Pebble-style CA
+"""
+import base64
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+from nrp.core import acme, certqueue  # noqa: E402
+from nrp.core.certindex import CertIndex  # noqa: E402
+from nrp.core.certqueue import CertQueue  # noqa: E402
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class StandInCA:
+    """
+    In-process ACME server with Pebble's flow (directory, nonces, accounts,
+    orders, http-01, finalize, certificate download)
+
+    JWS signatures, nonces and URLs are checked like a real CA. Instead of
+    fetching the challenge over HTTP, the token file is read from the webroot.
+    """
+
+    def __init__(self, webroot):
+        self.webroot = webroot
+        self.lock = threading.Lock()
+        self.nonces, self.accounts, self.orders, self.authzs, self.chains = set(), {}, {}, {}, {}
+        self.counter = 0
+        self.connections = self.requests = 0
+        self.fail = set()
+        self.bad_nonce_once = True
+        self.ca_key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Stand-in CA")])
+        self.ca_cert = self._sign(x509.CertificateBuilder().subject_name(name).public_key(self.ca_key.public_key()))
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sign(self, builder):
+        now = datetime.now(timezone.utc)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Stand-in CA")])
+        return (
+            builder.issuer_name(name).serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(minutes=1)).not_valid_after(now + timedelta(days=90))
+            .sign(self.ca_key, hashes.SHA256())
+        )
+
+    def _next(self, prefix):
+        self.counter += 1
+        return f"{self.url}/{prefix}/{self.counter}"
+
+    def _nonce(self):
+        nonce = _b64(hashlib.sha256(str(self.counter + len(self.nonces)).encode() + b"n").digest())
+        self.counter += 1
+        self.nonces.add(nonce)
+        return nonce
+
+    def _handler(self):
+        ca = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with ca.lock:
+                    ca.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._reply(200, b"")
+
+            def do_GET(self):
+                directory = {name: f"{ca.url}/{path}" for name, path in (
+                    ("newNonce", "nonce"), ("newAccount", "account"), ("newOrder", "order")
+                )}
+                self._reply(200, directory)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with ca.lock:
+                    ca.requests += 1
+                    status, reply, headers = ca.handle(self.path, body)
+                self._reply(status, reply, headers)
+
+            def _reply(self, status, reply, headers=None):
+                headers = dict(headers or {})
+                if isinstance(reply, (dict, list)):
+                    reply = json.dumps(reply).encode()
+                    headers.setdefault("Content-Type", "application/json")
+                self.send_response(status)
+                with ca.lock:
+                    self.send_header("Replay-Nonce", ca._nonce())
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+        return Handler
+
+    def handle(self, path, jws):
+        protected = json.loads(_b64decode(jws["protected"]))
+        if ca_problem := self._check(path, jws, protected):
+            return ca_problem
+        payload = json.loads(_b64decode(jws["payload"])) if jws["payload"] else None
+        kind, _, ident = path.strip("/").partition("/")
+        url = f"{self.url}{path}"
+
+        if kind == "account":
+            thumbprint = _b64(hashlib.sha256(json.dumps(protected["jwk"], sort_keys=True).encode()).digest())
+            for kid, account in self.accounts.items():
+                if account["thumbprint"] == thumbprint:
+                    return 200, {"status": "valid"}, {"Location": kid}
+            kid = self._next("acct")
+            self.accounts[kid] = {"jwk": protected["jwk"], "thumbprint": thumbprint}
+            return 201, {"status": "valid"}, {"Location": kid}
+
+        if kind == "order" and not ident:
+            authorizations = []
+            for identifier in payload["identifiers"]:
+                authz_url = self._next("authz")
+                token = _b64(hashlib.sha256(authz_url.encode()).digest())
+                self.authzs[authz_url] = {
+                    "status": "pending", "identifier": identifier, "kid": protected["kid"],
+                    "challenges": [{"type": "http-01", "url": authz_url.replace("authz", "chal"), "token": token,
+                                    "status": "pending"}],
+                }
+                authorizations.append(authz_url)
+            order_url = self._next("order")
+            self.orders[order_url] = {
+                "status": "pending", "identifiers": payload["identifiers"], "authorizations": authorizations,
+                "finalize": order_url.replace("order", "finalize"),
+            }
+            return 201, self.orders[order_url], {"Location": order_url}
+
+        if kind in ("order", "authz"):
+            return 200, (self.orders if kind == "order" else self.authzs)[url], {}
+
+        if kind == "chal":
+            authz = self.authzs[url.replace("chal", "authz")]
+            challenge = authz["challenges"][0]
+            token_file = self.webroot / ".well-known" / "acme-challenge" / challenge["token"]
+            jwk = self.accounts[authz["kid"]]["jwk"]
+            thumbprint = _b64(hashlib.sha256(json.dumps(jwk, sort_keys=True, separators=(",", ":")).encode()).digest())
+            expected = f"{challenge['token']}.{thumbprint}"
+            valid = token_file.exists() and token_file.read_text() == expected
+            if authz["identifier"]["value"] in self.fail:
+                valid = False
+            challenge["status"] = authz["status"] = "valid" if valid else "invalid"
+            if not valid:
+                challenge["error"] = {"type": "urn:ietf:params:acme:error:unauthorized", "detail": "Invalid response"}
+            return 200, challenge, {}
+
+        if kind == "finalize":
+            order = self.orders[url.replace("finalize", "order")]
+            csr = x509.load_der_x509_csr(_b64decode(payload["csr"]))
+            cert = self._sign(
+                x509.CertificateBuilder().subject_name(csr.subject).public_key(csr.public_key())
+                .add_extension(csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value, False)
+            )
+            order["status"] = "valid"
+            order["certificate"] = url.replace("finalize", "cert")
+            self.chains[order["certificate"]] = (
+                cert.public_bytes(serialization.Encoding.PEM) + self.ca_cert.public_bytes(serialization.Encoding.PEM)
+            )
+            return 200, order, {}
+
+        if kind == "cert":
+            return 200, self.chains[url], {
+                "Content-Type": "application/pem-certificate-chain"
+            }
+        return 404, {"type": "urn:ietf:params:acme:error:malformed", "detail": path}, {}
+
+    def _check(self, path, jws, protected):
+        """Nonce, URL and signature checks of RFC 8555 section 6."""
+        if self.bad_nonce_once or protected["nonce"] not in self.nonces:
+            self.bad_nonce_once = False
+            return 400, {"type": "urn:ietf:params:acme:error:badNonce", "detail": "bad nonce"}, {}
+        self.nonces.discard(protected["nonce"])
+        if protected["url"] != f"{self.url}{path}":
+            return 400, {"type": "urn:ietf:params:acme:error:unauthorized", "detail": "url mismatch"}, {}
+        jwk = protected.get("jwk") or self.accounts[protected["kid"]]["jwk"]
+        key = ec.EllipticCurvePublicNumbers(
+            int.from_bytes(_b64decode(jwk["x"]), "big"), int.from_bytes(_b64decode(jwk["y"]), "big"), ec.SECP256R1()
+        ).public_key()
+        signature = _b64decode(jws["signature"])
+        der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+        key.verify(der, f"{jws['protected']}.{jws['payload']}".encode(), ec.ECDSA(hashes.SHA256()))
+        return None
+
+
+@pytest.fixture
+def ca(tmp_path):
+    server = StandInCA(tmp_path / "acme")
+    yield server
+    server.close()
+
+
+def _issuer(tmp_path, ca):
+    return acme.NativeIssuer(
+        live_dir=tmp_path / "letsencrypt" / "live",
+        directory_url=f"{ca.url}/dir",
+        account_key=tmp_path / "account.key",
+        webroot=tmp_path / "acme",
+        poll_interval=0.01
+    )
+
+
+class TestNativeAcme:
+    """Tests for nrp.core.acme"""
+
+    def test_parallel_orders_share_account_and_connections(self, tmp_path, ca):
+        fqdns = [f"h{index}.example.com" for index in range(6)]
+        queue = CertQueue(None)
+        for fqdn in fqdns:
+            queue.enqueue(fqdn, key_type="rsa" if fqdn == "h0.example.com" else None)
+        with _issuer(tmp_path, ca) as issuer:
+            summary = certqueue.run(
+                queue, lambda job: issuer.issue(job["fqdn"], job["email"], job["key_type"]), workers=6
+            )
+            opened = issuer.client.http.opened
+        assert summary[certqueue.ACTIVE] == 6
+        assert len(ca.accounts) == 1
+        assert opened < ca.requests
+        assert list((tmp_path / "acme" / ".well-known" / "acme-challenge").iterdir()) == []
+
+        for fqdn in fqdns:
+            live = tmp_path / "letsencrypt" / "live" / fqdn
+            assert (live / "fullchain.pem").is_symlink()
+            cert = x509.load_pem_x509_certificate((live / "cert.pem").read_bytes())
+            key = serialization.load_pem_private_key((live / "privkey.pem").read_bytes(), password=None)
+            assert cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value == fqdn
+            assert cert.public_key().public_numbers() == key.public_key().public_numbers()
+            assert (live / "fullchain.pem").read_bytes().count(b"BEGIN CERTIFICATE") == 2
+            assert (live / "privkey.pem").resolve().stat().st_mode & 0o777 == 0o600
+
+    def test_renewal_writes_next_version(self, tmp_path, ca):
+        index = CertIndex(None, tmp_path / "letsencrypt" / "live")
+        with _issuer(tmp_path, ca) as issuer:
+            assert issuer.issue("app.example.com")[0]
+            assert index.certificates(expiring=30) == []
+            [cert] = index.certificates(expiring=100)
+            assert (cert["name"], cert["key_type"], cert["certbot"]) == ("app.example.com", "ecdsa", False)
+            assert issuer.issue("app.example.com")[0]
+        live = tmp_path / "letsencrypt" / "live" / "app.example.com"
+        assert (live / "fullchain.pem").resolve().name == "fullchain2.pem"
+        assert index.certificates()[0]["not_after"] > cert["not_after"] - 60
+        assert index.decoded == 2
+
+    def test_renewal_keeps_rsa_key(self, tmp_path, ca):
+        index = CertIndex(None, tmp_path / "letsencrypt" / "live")
+        queue = CertQueue(None)
+        with _issuer(tmp_path, ca) as issuer:
+            assert issuer.issue("rsa.example.com", key_type="rsa")[0]
+            assert certqueue.enqueue_renewals(queue, index.certificates(expiring=100)) == ["rsa.example.com"]
+            assert queue.jobs()[0]["key_type"] == "rsa"
+            summary = certqueue.run(queue, lambda job: issuer.issue(job["fqdn"], job["email"], job["key_type"]))
+        assert summary[certqueue.ACTIVE] == 1
+        [cert] = index.certificates()
+        assert cert["key_type"] == "rsa"
+        live = tmp_path / "letsencrypt" / "live" / "rsa.example.com"
+        assert (live / "fullchain.pem").resolve().name == "fullchain2.pem"
+
+    def test_renewal_keeps_all_names(self, tmp_path, ca):
+        index = CertIndex(None, tmp_path / "letsencrypt" / "live")
+        queue = CertQueue(None)
+        names = ["app.example.com", "www.app.example.com", "api.example.com"]
+        with _issuer(tmp_path, ca) as issuer:
+            assert issuer.issue("app.example.com", sans=names)[0]
+            assert certqueue.enqueue_renewals(queue, index.certificates()) == ["app.example.com"]
+            summary = certqueue.run(
+                queue, lambda job: issuer.issue(job["fqdn"], job["email"], job["key_type"], job["sans"])
+            )
+        assert summary[certqueue.ACTIVE] == 1
+        [cert] = index.certificates()
+        assert cert["sans"] == names
+        live = tmp_path / "letsencrypt" / "live" / "app.example.com"
+        assert (live / "fullchain.pem").resolve().name == "fullchain2.pem"
+
+    def test_failed_start_stops_the_event_loop(self, tmp_path):
+        (tmp_path / "account.key").mkdir()
+        issuer = acme.NativeIssuer(live_dir=tmp_path / "live", account_key=tmp_path / "account.key")
+        with pytest.raises(OSError):
+            with issuer:
+                pass
+        assert not issuer._thread.is_alive()
+        assert issuer._loop.is_closed()
+
+    def test_failed_validation_is_reported(self, tmp_path, ca):
+        ca.fail.add("bad.example.com")
+        with _issuer(tmp_path, ca) as issuer:
+            ok, error = issuer.issue("bad.example.com")
+        assert not ok
+        assert "validation invalid: Invalid response" in error
+        assert not (tmp_path / "letsencrypt" / "live" / "bad.example.com").exists()
@@ -0,0 +1,107 @@
+"""
+CLI tests for nrp backend
+"""
+import pytest
+from click.testing import CliRunner
+
+from nrp.commands import backend as backend_cmd
+from nrp.core.nginx import NginxManager, ConfigTransaction
+from nrp.core.registry import HostRegistry
+from nrp.core import upstream as upstream_core
+
+FQDN = "api.example.com"
+
+
+@pytest.fixture
+def nginx(tmp_path, monkeypatch):
+    manager = NginxManager()
+    manager.conf_dir = tmp_path / "conf.d"
+    manager.conf_dir.mkdir()
+    manager.main_conf = tmp_path / "nginx.conf"
+    manager.upstream_dir = tmp_path / "upstreams"
+    manager.snippet_dir = tmp_path / "snippets"
+    manager.registry = HostRegistry(tmp_path / "hosts.db")
+    monkeypatch.setattr(manager, "test_config", lambda: True)
+    monkeypatch.setattr(manager, "reload", lambda: True)
+    monkeypatch.setattr(manager, "transaction", lambda: ConfigTransaction(manager, staging_dir=tmp_path / "staging"))
+    monkeypatch.setattr(backend_cmd, "NginxManager", lambda: manager)
+    # Certificates and certbot includes of rendered hosts live outside tmp_path
+    lint_config = manager.lint_config
+    monkeypatch.setattr(
+        manager, "lint_config", lambda files, changed, exists: lint_config(files, changed, lambda path: True)
+    )
+
+    with manager.transaction() as tx:
+        for path, content in manager.render_files(FQDN, "10.0.0.1", 8080).items():
+            tx.write(path, content)
+        assert tx.commit()
+    return manager
+
+
+def _invoke(*args):
+    return CliRunner().invoke(backend_cmd.backend, list(args))
+
+
+def _files(tmp_path):
+    return {
+        path: path.read_bytes()
+        for path in tmp_path.rglob("*")
+        if path.is_file() and "staging" not in path.parts and path.name != "hosts.db"
+    }
+
+
+class TestBackendCommand:
+    """Tests for nrp backend list/add/remove/policy"""
+
+    def test_add_changes_only_the_upstream_file(self, nginx, tmp_path):
+        before = _files(tmp_path)
+        result = _invoke("add", FQDN, "10.0.0.2:8080", "--weight", "2")
+        assert result.exit_code == 0, result.output
+
+        after = _files(tmp_path)
+        assert [path for path in after if after[path] != before.get(path)] == [nginx.upstream_path(FQDN)]
+        assert set(after) == set(before)
+        backends = nginx.read_upstream(FQDN)["backends"]
+        assert [(upstream_core.backend_label(b), b["weight"]) for b in backends] == [
+            ("10.0.0.1:8080", 1), ("10.0.0.2:8080", 2)
+        ]
+
+        result = _invoke("list", FQDN)
+        assert "10.0.0.2:8080" in result.output
+
+    def test_add_duplicate_backend(self, nginx, tmp_path):
+        before = _files(tmp_path)
+        result = _invoke("add", FQDN, "10.0.0.1:8080")
+        assert result.exit_code == 1
+        assert "Backend doppelt: 10.0.0.1:8080" in result.output
+        assert _files(tmp_path) == before
+
+    def test_remove(self, nginx):
+        assert _invoke("add", FQDN, "10.0.0.2:8080").exit_code == 0
+        result = _invoke("remove", FQDN, "10.0.0.1:8080")
+        assert result.exit_code == 0, result.output
+        assert [upstream_core.backend_label(b) for b in nginx.read_upstream(FQDN)["backends"]] == ["10.0.0.2:8080"]
+
+    def test_remove_unknown_backend(self, nginx, tmp_path):
+        before = _files(tmp_path)
+        result = _invoke("remove", FQDN, "10.0.0.9:8080")
+        assert result.exit_code == 1
+        assert "nicht konfiguriert" in result.output
+        assert _files(tmp_path) == before
+
+    def test_policy_hash(self, nginx):
+        result = _invoke("policy", FQDN, "hash")
+        assert result.exit_code == 0, result.output
+        assert nginx.read_upstream(FQDN)["hash_key"] == "$remote_addr"
+        assert "hash $remote_addr consistent;" in nginx.upstream_path(FQDN).read_text()
+
+        result = _invoke("policy", FQDN, "hash", "--hash-key", "$cookie_session")
+        assert result.exit_code == 0, result.output
+        assert "hash $cookie_session consistent;" in nginx.upstream_path(FQDN).read_text()
+
+    def test_policy_rejects_invalid_hash_key(self, nginx, tmp_path):
+        before = _files(tmp_path)
+        result = _invoke("policy", FQDN, "hash", "--hash-key", "$a; include /etc/passwd")
+        assert result.exit_code == 1
+        assert "Ungültiger Hash-Schlüssel" in result.output
+        assert _files(tmp_path) == before
@@ -0,0 +1,48 @@
+"""
+Unit tests for cache statistics and purge
+"""
+import pytest
+from nrp.core import cache as cache_core
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_core, "NGINX_CACHE_DIR", tmp_path)
+    return tmp_path / "app.example.com"
+
+
+def _entry(cache_dir, name, uri):
+    path = cache_dir / name[-1] / name[-3:-1] / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Binary header, then the key line, then the cached response
+    path.write_bytes(b"\x05\x00\x00\x00" * 8 + f"\nKEY: httpsapp.example.com{uri}\n".encode() + b"HTTP/1.1 200 OK\r\n")
+    return path
+
+
+class TestCache:
+    """Tests for the cache helpers"""
+
+    def test_read_key(self, cache_dir):
+        path = _entry(cache_dir, "a1b2c3", "/static/app.js")
+        assert cache_core.read_key(path) == "httpsapp.example.com/static/app.js"
+
+    def test_stats(self, cache_dir):
+        assert cache_core.get_stats("app.example.com")["exists"] is False
+        _entry(cache_dir, "a1b2c3", "/a")
+        _entry(cache_dir, "d4e5f6", "/b")
+        stats = cache_core.get_stats("app.example.com")
+        assert stats["entries"] == 2
+        assert stats["size_bytes"] > 0
+
+    def test_purge_prefix(self, cache_dir):
+        keep = _entry(cache_dir, "a1b2c3", "/api/users")
+        drop = _entry(cache_dir, "d4e5f6", "/static/app.css")
+        assert cache_core.purge("app.example.com", "/static/") == 1
+        assert keep.exists()
+        assert not drop.exists()
+
+    def test_purge_all(self, cache_dir):
+        _entry(cache_dir, "a1b2c3", "/a")
+        _entry(cache_dir, "d4e5f6", "/b")
+        assert cache_core.purge("app.example.com") == 2
+        assert cache_core.get_stats("app.example.com")["entries"] == 0
@@ -0,0 +1,122 @@
+"""
+Unit tests for the certificate inventory
+"""
+import os
+
+import pytest
+from click.testing import CliRunner
+
+pytest.importorskip("cryptography")
+
+from nrp.commands.cert import cert as cert_cmd  # noqa: E402
+from nrp.core import certbot as certbot_core  # noqa: E402
+from nrp.core import certindex  # noqa: E402
+from nrp.core.certindex import CertIndex  # noqa: E402
+
+# ECDSA certificate signed with RSA, valid until 2099
+APP_CERT = """-----BEGIN CERTIFICATE-----
+MIIBpDCCAQ2gAwIBAgICA+gwDQYJKoZIhvcNAQELBQAwJTEWMBQGA1UECgwNTGV0
+J3MgRW5jcnlwdDELMAkGA1UEAwwCRTUwIBcNMjYwMTAxMDAwMDAwWhgPMjA5OTAx
+MDEwMDAwMDBaMBoxGDAWBgNVBAMMD2FwcC5leGFtcGxlLmNvbTBZMBMGByqGSM49
+AgEGCCqGSM49AwEHA0IABJuaRLf1fXfDT3lhp84rxAJ01Jq9bmlAsqCy/OChiayP
+W9XlfUAvXiMPC8qrsctZc4RpXSXLuKPYxkaXhuyS2jejMzAxMC8GA1UdEQQoMCaC
+D2FwcC5leGFtcGxlLmNvbYITd3d3LmFwcC5leGFtcGxlLmNvbTANBgkqhkiG9w0B
+AQsFAAOBgQAeTGH6Ktu04AaXGBeNjPb9QgPgw8Rxj0hESbSQmcpSKoOG3k5eEoFA
+7n/VN+8pzcdJhM4yUb4TGmNLWQY2AKP6EcVf5eOCNuWhPOhu7WsYg9cAwJJhTTmG
+1XAllYrWLOMIv3w1ZL7HqevhEejkjjlPxKBFetGCxiR3DqfPgvUYtQ==
+-----END CERTIFICATE-----
+"""
+
+# RSA certificate signed with ECDSA, expired 2021-01-01
+OLD_CERT = """-----BEGIN CERTIFICATE-----
+MIIBljCCATugAwIBAgICA+gwCgYIKoZIzj0EAwMwJjEWMBQGA1UECgwNTGV0J3Mg
+RW5jcnlwdDEMMAoGA1UEAwwDUjExMB4XDTIwMTAwMTAwMDAwMFoXDTIxMDEwMTAw
+MDAwMFowGjEYMBYGA1UEAwwPb2xkLmV4YW1wbGUuY29tMIGfMA0GCSqGSIb3DQEB
+AQUAA4GNADCBiQKBgQCdZQA3mMQ1HiVqnhj05IW0Xv2aINOmmgeQ0cJUNdAI8bsr
+KAby+hiiT8Z5GqpKV2X4GD5D6aLIqCHcycq0M4ZS9NUWYKZsPNxsMLyEbq/e2iGC
+zZOmo2wXyBSQEhLiMwaKIFN4nHFenQhrpluHxXjt+EAYNHKYTGQAVo5+tqUZmQID
+AQABox4wHDAaBgNVHREEEzARgg9vbGQuZXhhbXBsZS5jb20wCgYIKoZIzj0EAwMD
+SQAwRgIhAMxYZrpyNRFoFghazE0yve2pw0hMRx9k2iG0UYwPgXI4AiEAzrMRCJWF
+fTVMgvPXEhaUTPz5S5AYLNYiC+OEzgC12ow=
+-----END CERTIFICATE-----
+"""
+
+
+def _install(letsencrypt, name, pem, version=1):
+    """Certificate in certbot's layout (archive file + live symlink)."""
+    archive = letsencrypt / "archive" / name
+    live = letsencrypt / "live" / name
+    archive.mkdir(parents=True, exist_ok=True)
+    live.mkdir(parents=True, exist_ok=True)
+    (archive / f"fullchain{version}.pem").write_text(pem + OLD_CERT)
+    link = live / "fullchain.pem"
+    if link.is_symlink():
+        link.unlink()
+    link.symlink_to(os.path.relpath(archive / f"fullchain{version}.pem", live))
+
+
+class TestCertIndex:
+    """Tests for CertIndex and decode()"""
+
+    def test_decode_reads_leaf_certificate(self, tmp_path):
+        (tmp_path / "fullchain.pem").write_text(APP_CERT + OLD_CERT)
+        cert = certindex.decode(tmp_path / "fullchain.pem")
+        assert cert["sans"] == ["app.example.com", "www.app.example.com"]
+        assert cert["key_type"] == "ecdsa"
+        assert cert["issuer"] == "Let's Encrypt (E5)"
+        assert cert["not_after"] == 4070908800.0
+
+        (tmp_path / "old.pem").write_text(OLD_CERT)
+        assert certindex.decode(tmp_path / "old.pem")["key_type"] == "rsa"
+
+    def test_index_decodes_only_changed_certificates(self, tmp_path):
+        letsencrypt = tmp_path / "letsencrypt"
+        _install(letsencrypt, "app.example.com", APP_CERT)
+        _install(letsencrypt, "old.example.com", OLD_CERT)
+        (letsencrypt / "renewal").mkdir()
+        (letsencrypt / "renewal" / "old.example.com.conf").write_text("")
+
+        index = CertIndex(tmp_path / "cert-index.db", letsencrypt / "live")
+        certs = index.certificates()
+        assert [cert["name"] for cert in certs] == ["old.example.com", "app.example.com"]
+        assert [cert["certbot"] for cert in certs] == [True, False]
+        assert certs[0]["days"] < 0
+        assert index.decoded == 2
+
+        # A second process reuses the index; expiry filter is served from it
+        index = CertIndex(tmp_path / "cert-index.db", letsencrypt / "live")
+        assert [cert["name"] for cert in index.certificates(expiring=30)] == ["old.example.com"]
+        assert index.decoded == 0
+
+        # Renewal points the symlink at a new archive file
+        _install(letsencrypt, "old.example.com", APP_CERT, version=2)
+        (letsencrypt / "live" / "app.example.com" / "fullchain.pem").unlink()
+        assert [cert["name"] for cert in index.certificates()] == ["old.example.com"]
+        assert index.certificates(expiring=30) == []
+        assert index.decoded == 1
+
+    def test_unwritable_index_falls_back_to_memory(self, tmp_path):
+        _install(tmp_path / "letsencrypt", "app.example.com", APP_CERT)
+        (tmp_path / "ro").write_text("")
+        index = CertIndex(tmp_path / "ro" / "cert-index.db", tmp_path / "letsencrypt" / "live")
+        assert [cert["name"] for cert in index.certificates()] == ["app.example.com"]
+
+    def test_missing_cryptography_is_reported(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(certindex, "x509", None)
+        index = CertIndex(tmp_path / "cert-index.db", tmp_path / "live")
+        with pytest.raises(ValueError, match="nrp\\[acme\\]"):
+            index.certificates()
+
+    def test_cert_list_without_cryptography_lists_names(self, tmp_path, monkeypatch):
+        _install(tmp_path / "letsencrypt", "app.example.com", APP_CERT)
+        _install(tmp_path / "letsencrypt", "old.example.com", OLD_CERT)
+        monkeypatch.setattr(certindex, "x509", None)
+        monkeypatch.setattr(certbot_core, "LETSENCRYPT_LIVE_DIR", tmp_path / "letsencrypt" / "live")
+
+        result = CliRunner().invoke(cert_cmd, ["list"])
+        assert result.exit_code == 0, result.output
+        assert result.output.startswith("app.example.com\nold.example.com\n")
+        assert "nrp[acme]" in result.output
+
+        result = CliRunner().invoke(cert_cmd, ["list", "--expiring", "30"])
+        assert result.exit_code == 1
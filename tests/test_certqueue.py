@@ -0,0 +1,165 @@
+"""
+Unit tests for the certificate job queue
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from nrp.core import certqueue
+from nrp.core.certqueue import CertQueue
+
+NOW = 1_700_000_000.0
+
+
+class TestCertQueue:
+    """Tests for CertQueue, the rate limits and the worker pool"""
+
+    def test_reading_does_not_create_database(self, tmp_path):
+        assert CertQueue(tmp_path / "queue.db").jobs() == []
+        assert not (tmp_path / "queue.db").exists()
+
+    def test_reading_closes_temporary_connections(self, tmp_path, monkeypatch):
+        writer = CertQueue(tmp_path / "queue.db")
+        writer.enqueue("app.example.com")
+        writer.close()
+
+        opened = []
+        connect = sqlite3.connect
+
+        def tracked(*args, **kwargs):
+            opened.append(connect(*args, **kwargs))
+            return opened[-1]
+
+        monkeypatch.setattr(certqueue.sqlite3, "connect", tracked)
+        reader = CertQueue(tmp_path / "queue.db")
+        assert [job["fqdn"] for job in reader.jobs()] == ["app.example.com"]
+        assert reader.jobs([certqueue.FAILED]) == []
+        assert len(opened) == 2
+        for conn in opened:
+            with pytest.raises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_renewal_keeps_pending_activation(self):
+        queue = CertQueue(None)
+        queue.enqueue("app.example.com", {"fqdn": "app.example.com"}, key_type="ecdsa")
+        certqueue.enqueue_renewals(queue, [{
+            "name": "app.example.com", "key_type": "rsa", "sans": ["www.app.example.com", "app.example.com"],
+        }])
+        [job] = queue.jobs()
+        assert job["params"] == {"fqdn": "app.example.com"}
+        assert job["sans"] == ["app.example.com", "www.app.example.com"]
+        assert job["key_type"] == "rsa"
+
+        # An activated job's parameters are not activated again
+        [job] = queue.claim(1, NOW)
+        queue.finish("app.example.com", True, None, NOW)
+        queue.mark_active(["app.example.com"])
+        queue.enqueue("app.example.com")
+        [job] = queue.jobs()
+        assert (job["params"], job["sans"]) == (None, None)
+
+    def test_version_1_database_is_migrated(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "queue.db")
+        conn.executescript(certqueue._SCHEMA.replace("    sans TEXT,\n", ""))
+        conn.execute(
+            "INSERT INTO jobs (fqdn, state, params, created) VALUES (?, ?, ?, ?)",
+            ("app.example.com", certqueue.ISSUED, '{"fqdn": "app.example.com"}', NOW)
+        )
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+
+        queue = CertQueue(tmp_path / "queue.db")
+        queue.enqueue("new.example.com", sans=["new.example.com", "www.new.example.com"])
+        assert [(job["fqdn"], job["state"], job["sans"]) for job in queue.jobs()] == [
+            ("app.example.com", certqueue.ISSUED, None),
+            ("new.example.com", certqueue.PENDING, ["new.example.com", "www.new.example.com"]),
+        ]
+
+    def test_registered_domain_and_retry_after(self):
+        assert certqueue.registered_domain("a.b.example.com") == "example.com"
+        assert certqueue.registered_domain("shop.example.co.uk") == "example.co.uk"
+        error = "too many certificates (50) already issued for \"example.com\": retry after 2023-11-15 01:00:00 UTC"
+        assert certqueue.retry_after(error, NOW) == 1700010000.0
+        assert certqueue.retry_after("urn:ietf:params:acme:error:rateLimited", NOW) == NOW + 3600
+        assert certqueue.retry_after("Connection refused", NOW) is None
+
+    def test_failed_job_backs_off_until_exhausted(self):
+        queue = CertQueue(None)
+        queue.enqueue("app.example.com", {"fqdn": "app.example.com"})
+        for attempt in range(1, 4):
+            now = queue.jobs()[0]["not_before"]
+            assert [job["fqdn"] for job in queue.claim(4, now)] == ["app.example.com"]
+            state = queue.finish("app.example.com", False, "Connection refused", now, max_attempts=3)
+            job = queue.jobs()[0]
+            if attempt < 3:
+                assert state == certqueue.PENDING
+                assert job["not_before"] == now + 60 * 2 ** (attempt - 1)
+                assert queue.claim(4, now) == []
+        assert state == certqueue.FAILED
+        assert queue.retry() == 1
+        assert queue.jobs()[0]["state"] == certqueue.PENDING
+
+    def test_rate_limits_delay_jobs(self, monkeypatch):
+        monkeypatch.setattr(certqueue, "LE_CERTS_PER_DOMAIN", 2)
+        queue = CertQueue(None)
+        for index, fqdn in enumerate(("a.example.com", "b.example.com")):
+            queue.enqueue(fqdn)
+            queue.claim(1, NOW + index)
+            assert queue.finish(fqdn, True, None, NOW + index) == certqueue.ACTIVE
+        queue.enqueue("c.example.com")
+        queue.enqueue("x.example.org")
+        # Third certificate for example.com waits until the first leaves the week
+        assert [job["fqdn"] for job in queue.claim(4, NOW + 10)] == ["x.example.org"]
+        delayed = queue.jobs([certqueue.PENDING])[0]
+        assert delayed["fqdn"] == "c.example.com"
+        assert delayed["not_before"] == NOW + certqueue.WEEK
+
+    def test_run_issues_in_parallel_and_activates_in_batches(self):
+        queue = CertQueue(None)
+        for index in range(5):
+            queue.enqueue(f"h{index}.example.com", {"fqdn": f"h{index}.example.com"})
+        queue.enqueue("broken.example.com", {"fqdn": "broken.example.com"})
+
+        active, peak, lock = [0], [0], threading.Lock()
+        batches = []
+
+        def issue(job):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return job["fqdn"] != "broken.example.com", "Timeout during connect"
+
+        def activate(jobs):
+            batches.append(sorted(job["fqdn"] for job in jobs))
+            return True
+
+        summary = certqueue.run(queue, issue, activate, workers=3, batch=2)
+        assert peak[0] == 3
+        assert summary[certqueue.ACTIVE] == 5
+        assert summary[certqueue.PENDING] == 1
+        assert sum(len(batch) for batch in batches) == 5
+        assert all(len(batch) >= 2 for batch in batches[:-1])
+        assert len(batches) == summary["batches"] < 5
+        assert [job["fqdn"] for job in queue.jobs([certqueue.PENDING])] == ["broken.example.com"]
+
+    def test_failed_activation_stops_batches(self):
+        queue = CertQueue(None)
+        for index in range(6):
+            queue.enqueue(f"h{index}.example.com", {"fqdn": f"h{index}.example.com"})
+        batches = []
+
+        def activate(jobs):
+            batches.append(len(jobs))
+            return False
+
+        summary = certqueue.run(queue, lambda job: (True, None), activate, workers=1, batch=2)
+        assert batches == [2]
+        assert summary["activation_failed"] is True
+        assert summary[certqueue.ISSUED] == 6
+        assert len(queue.jobs([certqueue.ISSUED])) == 6
@@ -0,0 +1,45 @@
+"""
+Unit tests for rate/connection limit helpers
+"""
+import pytest
+from nrp.core import limits as limits_core
+from nrp.core.nginx import NginxManager
+
+
+class TestParseRateLimit:
+    """Tests for parse_rate_limit"""
+
+    def test_rate_and_burst(self):
+        assert limits_core.parse_rate_limit("10:20") == (10, 20)
+
+    def test_burst_defaults_to_rate(self):
+        assert limits_core.parse_rate_limit("10") == (10, 10)
+
+    @pytest.mark.parametrize("value", ["", "0", "10r/s", "10:", "-1", "a:b"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            limits_core.parse_rate_limit(value)
+
+
+class TestLimitsConf:
+    """Tests for the shared zone file"""
+
+    def test_zone_size_scales_with_keys(self):
+        assert limits_core.zone_size(1000, 192) == "1m"
+        assert limits_core.zone_size(100000, 192) == "19m"
+
+    def test_nothing_to_render(self):
+        assert limits_core.render(NginxManager().env, [], False, []) is None
+
+    def test_render(self):
+        content = limits_core.render(NginxManager().env, [10, 50], True, ["192.168.0.0/16"])
+        assert limits_core.parse_header(content) == {"allowlist": ["192.168.0.0/16"]}
+        assert "    192.168.0.0/16 1;" in content
+        assert "limit_req_zone $nrp_limit_key zone=nrp_req_10r:19m rate=10r/s;" in content
+        assert "limit_req_zone $nrp_limit_key zone=nrp_req_50r:19m rate=50r/s;" in content
+        assert "limit_conn_zone $nrp_limit_key zone=nrp_conn:16m;" in content
+
+    def test_validate_allow(self):
+        assert limits_core.validate_allow("10.1.2.3/8") == "10.0.0.0/8"
+        with pytest.raises(ValueError):
+            limits_core.validate_allow("example.com")
@@ -0,0 +1,74 @@
+"""
+Unit tests for the in-process configuration checks
+"""
+from pathlib import Path
+
+from nrp.core import lint as lint_core
+from nrp.core.nginx import NginxManager
+
+
+def _server(name, *listens):
+    lines = "".join(f"    listen {listen};\n" for listen in listens)
+    return f"server {{\n{lines}    server_name {name};\n}}\n"
+
+
+class TestLint:
+    """Tests for nrp.core.lint"""
+
+    def test_braces_ignore_comments_and_strings(self):
+        path = Path("a.conf")
+        content = 'server {\n    # }\n    return 200 "}{";\n}\n'
+        assert lint_core.check_braces(path, content) == []
+        assert lint_core.check_braces(path, "server {\n") == ['a.conf:1: unclosed "{"']
+        assert lint_core.check_braces(path, "}\n") == ['a.conf:1: unexpected "}"']
+
+    def test_duplicate_server_name_on_same_port(self):
+        a, b = Path("a.conf"), Path("b.conf")
+        files = {a: _server("app.example.com", "443 ssl"), b: _server("APP.example.com", "443 ssl")}
+        errors = lint_core.check_servers(files, [b])
+        assert errors == ['b.conf:3: conflicting server name "app.example.com" on *:443, first defined in a.conf:3']
+        # Other port or protocol is no conflict
+        files[b] = _server("app.example.com", "8443 ssl", "443 quic")
+        assert lint_core.check_servers(files, [b]) == []
+
+    def test_only_changed_files_are_reported(self):
+        a, b, c = Path("a.conf"), Path("b.conf"), Path("c.conf")
+        files = {a: _server("x.example.com", "443 ssl"), b: _server("x.example.com", "443 ssl"), c: ""}
+        assert lint_core.check_servers(files, [c]) == []
+
+    def test_listen_conflicts(self):
+        a, b = Path("a.conf"), Path("b.conf")
+        files = {a: _server("_", "80 default_server"), b: _server("_", "80 default_server")}
+        assert "duplicate default server for *:80" in lint_core.check_servers(files, [b])[0]
+        files = {a: _server("a.example.com", "443 quic reuseport"), b: _server("b.example.com", "443 quic reuseport")}
+        assert "duplicate listen options for *:443 (quic)" in lint_core.check_servers(files, [b])[0]
+        files[b] = _server("b.example.com", "443 quic", "[::]:443 quic reuseport")
+        assert lint_core.check_servers(files, [b]) == []
+
+    def test_missing_referenced_files(self, tmp_path):
+        cert = tmp_path / "fullchain.pem"
+        cert.write_text("")
+        content = (
+            f"ssl_certificate {cert};\n"
+            f"ssl_certificate_key {tmp_path}/privkey.pem;\n"
+            "ssl_certificate /etc/letsencrypt/live/$ssl_server_name/fullchain.pem;\n"
+            "include /etc/nginx/nrp/http.d/*.conf;\n"
+            "coraza_rules_file /etc/nginx/coraza/missing.conf;\n"
+        )
+        errors = lint_core.check_paths(Path("a.conf"), content, Path.exists)
+        assert errors == [
+            f'a.conf:2: ssl_certificate_key "{tmp_path}/privkey.pem" not found',
+            'a.conf:5: coraza_rules_file "/etc/nginx/coraza/missing.conf" not found',
+        ]
+
+    def test_rendered_hosts_pass(self, tmp_path):
+        nginx = NginxManager()
+        nginx.conf_dir = tmp_path / "conf.d"
+        rendered = nginx.render_many([
+            {"fqdn": "a.example.com", "internal_ip": "10.0.0.1", "internal_port": 80, "http3": True},
+            {"fqdn": "b.example.com", "internal_ip": "10.0.0.2", "internal_port": 80, "websockets_enabled": True},
+            {"fqdn": "c.example.com", "internal_ip": "10.0.0.3", "internal_port": 80, "external_port": 8443},
+        ])
+        files = {path: content for host in rendered.values() for path, content in host.items()}
+        conf_files = {path: content for path, content in files.items() if path.parent == nginx.conf_dir}
+        assert lint_core.lint(conf_files, files, exists=lambda path: True) == []
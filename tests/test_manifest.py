@@ -0,0 +1,79 @@
+"""
+Unit tests for manifest module
+"""
+import json
+import pytest
+from nrp.core.manifest import (
+    load_manifest,
+    normalize_hosts,
+    plan
+)
+
+
+class TestLoadManifest:
+    """Tests for manifest loading"""
+
+    def test_json_manifest(self, tmp_path):
+        path = tmp_path / "hosts.json"
+        path.write_text(json.dumps({"hosts": [{"fqdn": "example.com"}]}))
+        assert load_manifest(path)["hosts"] == [{"fqdn": "example.com"}]
+
+    def test_bare_list(self, tmp_path):
+        path = tmp_path / "hosts.json"
+        path.write_text(json.dumps([{"fqdn": "example.com"}]))
+        assert load_manifest(path)["hosts"] == [{"fqdn": "example.com"}]
+
+    def test_invalid_structure(self, tmp_path):
+        path = tmp_path / "hosts.json"
+        path.write_text(json.dumps({"servers": []}))
+        with pytest.raises(ValueError):
+            load_manifest(path)
+
+
+class TestNormalizeHosts:
+    """Tests for host normalization"""
+
+    def test_defaults_are_merged(self):
+        hosts = normalize_hosts({
+            "email": "admin@example.com",
+            "defaults": {"protocol": "HTTPS", "websockets": True},
+            "hosts": [{"fqdn": "example.com", "internal_ip": "10.0.0.1", "internal_port": 8080}],
+        })
+        assert hosts[0]["forward_scheme"] == "https"
+        assert hosts[0]["websockets_enabled"] is True
+        assert hosts[0]["external_port"] == 443
+        assert hosts[0]["email"] == "admin@example.com"
+
+    def test_all_errors_reported(self):
+        with pytest.raises(ValueError) as exc:
+            normalize_hosts({"hosts": [
+                {"fqdn": "example", "internal_ip": "10.0.0.1", "internal_port": 80},
+                {"fqdn": "ok.example.com", "internal_ip": "999.0.0.1", "internal_port": 80},
+                {"fqdn": "ok.example.com", "internal_ip": "10.0.0.1", "internal_port": 80, "foo": 1},
+            ]})
+        message = str(exc.value)
+        assert "example" in message
+        assert "999.0.0.1" in message
+        assert "foo" in message
+
+    def test_duplicate_fqdn(self):
+        entry = {"fqdn": "example.com", "internal_ip": "10.0.0.1", "internal_port": 80}
+        with pytest.raises(ValueError):
+            normalize_hosts({"hosts": [entry, dict(entry)]})
+
+
+class TestPlan:
+    """Tests for change planning"""
+
+    def test_plan_classifies_hosts(self):
+        hosts = [{"fqdn": "new.com"}, {"fqdn": "changed.com"}, {"fqdn": "same.com"}]
+        rendered = {"new.com": "a", "changed.com": "b", "same.com": "c"}
+        existing = {"changed.com": "old", "same.com": "c", "stale.com": "x"}
+
+        result = plan(hosts, rendered, existing)
+        assert result["create"] == ["new.com"]
+        assert result["update"] == ["changed.com"]
+        assert result["unchanged"] == ["same.com"]
+        assert result["remove"] == []
+
+        assert plan(hosts, rendered, existing, prune=True)["remove"] == ["stale.com"]
@@ -0,0 +1,328 @@
+"""
+Unit tests for NGINX config rendering
+"""
+import pytest
+from nrp.core.nginx import NginxManager, parse_host_header
+from nrp.core import upstream as upstream_core
+from nrp.core import routing as routing_core
+
+
+def _render(fqdn="app.example.com", ip="10.0.0.1", port=8080, **options):
+    nginx = NginxManager()
+    files = nginx.render_files(fqdn, ip, port, **options)
+    return files[nginx.config_path(fqdn)], files[nginx.upstream_path(fqdn)]
+
+
+class TestRenderUpstream:
+    """Tests for upstream/keepalive rendering"""
+
+    def test_upstream_with_keepalive(self):
+        host, upstream = _render()
+        assert "include /etc/nginx/nrp/upstreams/app.example.com.conf;" in host
+        assert "upstream nrp_app.example.com {" in upstream
+        assert "server 10.0.0.1:8080 weight=1 max_fails=1 fail_timeout=10s;" in upstream
+        assert "keepalive 16;" in upstream
+        assert "proxy_pass http://nrp_app.example.com/;" in host
+        assert "include /etc/nginx/nrp/snippets/nrp-proxy-v1.conf;" in host
+        assert "proxy_http_version 1.1;" in NginxManager().render_snippet("proxy")
+        assert 'proxy_set_header Connection "";' in host
+        assert "proxy_ssl_server_name" not in host
+
+    def test_keepalive_disabled(self):
+        _, upstream = _render(upstream_keepalive=0)
+        assert "keepalive " not in upstream
+
+    def test_https_backend_uses_sni_and_session_reuse(self):
+        host, _ = _render(port=8443, forward_scheme="https")
+        assert "proxy_pass https://nrp_app.example.com/;" in host
+        assert "proxy_ssl_server_name on;" in host
+        assert "proxy_ssl_session_reuse on;" in host
+
+    def test_websockets_keep_upgrade_headers(self):
+        host, _ = _render(websockets_enabled=True)
+        assert "proxy_set_header Upgrade $http_upgrade;" in host
+        assert 'proxy_set_header Connection "";' not in host
+
+    def test_multiple_backends_with_policy(self):
+        backends = [
+            upstream_core.parse_backend("10.0.0.1:8080"),
+            upstream_core.parse_backend("10.0.0.2:8080:3"),
+        ]
+        _, upstream = _render(backends=backends, lb_method="hash")
+        assert "hash $remote_addr consistent;" in upstream
+        assert "server 10.0.0.2:8080 weight=3" in upstream
+        # Balancing method must precede keepalive
+        assert upstream.index("hash $remote_addr") < upstream.index("keepalive 16;")
+
+    def test_header_roundtrip(self):
+        _, upstream = _render(lb_method="least_conn")
+        spec = upstream_core.parse_header(upstream)
+        assert spec["lb_method"] == "least_conn"
+        assert spec["backends"][0]["address"] == "10.0.0.1"
+
+
+class TestUpstreamSpec:
+    """Tests for backend parsing and validation"""
+
+    def test_parse_backend(self):
+        backend = upstream_core.parse_backend("192.168.1.10:8080:2", max_fails=3)
+        assert backend["port"] == 8080
+        assert backend["weight"] == 2
+        assert backend["max_fails"] == 3
+
+    def test_invalid_backend(self):
+        for value in ("192.168.1.10", "192.168.1.10:http", "host:80", "10.0.0.1:70000"):
+            with pytest.raises(ValueError):
+                upstream_core.parse_backend(value)
+
+    def test_backup_not_allowed_with_ip_hash(self):
+        backends = [
+            upstream_core.make_backend("10.0.0.1", 80),
+            upstream_core.make_backend("10.0.0.2", 80, backup=True),
+        ]
+        with pytest.raises(ValueError):
+            upstream_core.make_spec(backends, "ip_hash")
+
+    def test_duplicate_backend(self):
+        backend = upstream_core.make_backend("10.0.0.1", 80)
+        with pytest.raises(ValueError):
+            upstream_core.make_spec([backend, dict(backend)])
+
+    def test_hash_key(self):
+        backends = [upstream_core.make_backend("10.0.0.1", 80)]
+        spec = upstream_core.make_spec(backends, "hash", "$cookie_session$request_uri")
+        assert spec["hash_key"] == "$cookie_session$request_uri"
+        for value in ("$a; include /etc/passwd", "$a }", "$host\nreturn 200"):
+            with pytest.raises(ValueError):
+                upstream_core.make_spec(backends, "hash", value)
+
+
+class TestRenderCache:
+    """Tests for per-host response cache rendering"""
+
+    def test_no_cache_by_default(self):
+        host, _ = _render()
+        assert "proxy_cache" not in host
+
+    def test_cache_profile(self):
+        host, _ = _render(cache_profile="small")
+        assert (
+            "proxy_cache_path /var/cache/nginx/nrp/app.example.com levels=1:2 "
+            "keys_zone=nrp_cache_app.example.com:10m max_size=256m inactive=30m use_temp_path=off;"
+        ) in host
+        assert "proxy_cache nrp_cache_app.example.com;" in host
+        assert "proxy_cache_valid 200 301 302 5m;" in host
+        # proxy_cache_path is only valid in http context
+        assert host.index("proxy_cache_path") < host.index("server {")
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError):
+            _render(cache_profile="huge")
+
+    def test_microcache(self):
+        host, _ = _render(microcache=2)
+        assert "keys_zone=nrp_cache_app.example.com:10m" in host
+        assert "proxy_cache_valid 200 301 302 2s;" in host
+        assert "proxy_cache_bypass $http_authorization $http_cookie;" in host
+        assert "proxy_no_cache $http_authorization $http_cookie;" in host
+        assert "proxy_cache_methods GET HEAD;" in host
+        assert "proxy_cache_background_update on;" in host
+        # background_update needs stale responses while updating
+        assert "proxy_cache_use_stale error timeout updating" in host
+
+    def test_microcache_out_of_range(self):
+        with pytest.raises(ValueError):
+            _render(microcache=600)
+
+
+class TestRenderProtocols:
+    """Tests for HTTP/2 and HTTP/3 listeners"""
+
+    def test_http2_default(self, monkeypatch):
+        monkeypatch.setattr("nrp.core.protocols.nginx_build", lambda: None)
+        host, _ = _render()
+        assert "    listen 443 ssl;" in host
+        assert "    http2 on;" in host
+        assert "quic" not in host
+        assert "Alt-Svc" not in host
+
+    def test_http2_listen_parameter_on_old_nginx(self, monkeypatch):
+        monkeypatch.setattr(
+            "nrp.core.protocols.nginx_build",
+            lambda: {"version": (1, 22, 1), "http2": True, "http3": False}
+        )
+        host, _ = _render()
+        assert "listen 443 ssl http2;" in host
+        assert "http2 on;" not in host
+
+    def test_http3(self, tmp_path):
+        nginx = NginxManager()
+        nginx.conf_dir = tmp_path
+        host = nginx.render_config("app.example.com", "10.0.0.1", 8080, http3=True)
+        assert "listen 443 quic reuseport;" in host
+        assert "add_header Alt-Svc 'h3=\":443\"; ma=86400' always;" in host
+
+        # reuseport is claimed by another host already
+        (tmp_path / "other.example.com.conf").write_text("    listen 443 quic reuseport;\n")
+        host = nginx.render_config("app.example.com", "10.0.0.1", 8080, http3=True)
+        assert "listen 443 quic;" in host
+
+
+class TestRenderCompression:
+    """Tests for compression profiles"""
+
+    def test_no_compression_by_default(self):
+        host, _ = _render()
+        assert "gzip" not in host
+
+    def test_gzip_only_without_brotli_module(self, monkeypatch):
+        monkeypatch.setattr("nrp.core.compression.is_brotli_available", lambda: False)
+        host, _ = _render(compression="default")
+        assert "gzip on;" in host
+        assert "gzip_comp_level 5;" in host
+        assert "gzip_proxied any;" in host
+        assert "gzip_vary on;" in host
+        assert "application/json" in host
+        assert "brotli" not in host
+
+    def test_low_cpu_with_brotli(self, monkeypatch):
+        monkeypatch.setattr("nrp.core.compression.is_brotli_available", lambda: True)
+        host, _ = _render(compression="low-cpu")
+        assert "gzip_min_length 10240;" in host
+        assert "brotli on;" in host
+        assert "brotli_comp_level 1;" in host
+        assert "brotli_min_length 10240;" in host
+
+    def test_brotli_needs_loaded_module(self, tmp_path, monkeypatch):
+        from nrp.core import compression
+        module = tmp_path / "ngx_http_brotli_filter_module.so"
+        module.touch()
+        enabled = tmp_path / "modules-enabled"
+        enabled.mkdir()
+        monkeypatch.setattr(compression, "BROTLI_MODULE_PATH", module)
+        monkeypatch.setattr(compression, "NGINX_MODULES_ENABLED_DIR", enabled)
+        assert compression.is_brotli_available() is False
+        (enabled / "50-mod-http-brotli-filter.conf").write_text(f"load_module {module};\n")
+        assert compression.is_brotli_available() is True
+
+
+class TestRenderTrafficProfile:
+    """Tests for traffic profiles and the host parameter header"""
+
+    def test_default_keeps_nginx_defaults(self):
+        host, _ = _render()
+        assert "# proxy_buffering off;" in host
+        assert "proxy_read_timeout" not in host
+
+    def test_streaming(self):
+        host, _ = _render(traffic_profile="streaming")
+        assert "proxy_buffering off;" in host
+        assert "proxy_read_timeout 1h;" in host
+
+    def test_upload_streams_request_body(self):
+        host, _ = _render(traffic_profile="upload")
+        assert "proxy_request_buffering off;" in host
+        assert "client_body_timeout 300s;" in host
+
+    def test_streaming_conflicts_with_cache(self):
+        with pytest.raises(ValueError):
+            _render(traffic_profile="streaming", microcache=1)
+
+    def test_host_header_roundtrip(self):
+        host, _ = _render(traffic_profile="api", compression="default", http3=False)
+        params = parse_host_header(host)
+        assert params["traffic_profile"] == "api"
+        assert params["http2"] is None
+        assert NginxManager().render_config("app.example.com", **params) == host
+
+
+class TestRenderStatic:
+    """Tests for static asset locations"""
+
+    def test_static_location(self):
+        host, _ = _render(static_locations={"/assets/": "/srv/app/dist"})
+        assert "location ^~ /assets/ {" in host
+        assert "alias /srv/app/dist/;" in host
+        assert "sendfile on;" in host
+        assert "open_file_cache max=10000 inactive=5m;" in host
+        assert "gzip_static on;" in host
+        assert "expires 30d;" in host
+        # Static locations must precede the catch-all proxy location
+        assert host.index("location ^~ /assets/") < host.index("location / {")
+
+
+class TestRenderLimits:
+    """Tests for per-host rate and connection limits"""
+
+    def test_no_limits_by_default(self):
+        host, _ = _render()
+        assert "limit_req" not in host
+        assert "limit_conn" not in host
+
+    def test_rate_and_conn_limit(self):
+        host, _ = _render(rate_limit=10, rate_burst=20, conn_limit=5)
+        assert "limit_req zone=nrp_req_10r burst=20 nodelay;" in host
+        assert "limit_conn nrp_conn 5;" in host
+
+    def test_burst_defaults_to_rate(self):
+        host, _ = _render(rate_limit=10)
+        assert "limit_req zone=nrp_req_10r burst=10 nodelay;" in host
+
+    def test_limits_in_host_header(self):
+        nginx = NginxManager()
+        host, _ = _render(rate_limit=10, rate_burst=20)
+        params = parse_host_header(host)
+        assert params["rate_limit"] == 10
+        assert params["rate_burst"] == 20
+        assert nginx.render_config("app.example.com", **params) == host
+
+
+class TestRenderRouted:
+    """Tests for the consolidated map routing mode"""
+
+    def _manager(self):
+        nginx = NginxManager()
+        nginx.routing_mode = "map"
+        return nginx
+
+    def test_plain_host_is_routed(self):
+        nginx = self._manager()
+        host = nginx.render_config("app.example.com", "10.0.0.1", 8080)
+        assert routing_core.is_routed(host)
+        assert "server {" not in host
+        assert nginx.render_config("app.example.com", **parse_host_header(host)) == host
+
+    @pytest.mark.parametrize("options", [
+        {"external_port": 8443},
+        {"waf_enabled": True},
+        {"websockets_enabled": True},
+        {"cache_profile": "small"},
+        {"rate_limit": 10},
+        {"client_max_body_size": "1G"},
+    ])
+    def test_special_hosts_keep_server_blocks(self, options):
+        host = self._manager().render_config("app.example.com", "10.0.0.1", 8080, **options)
+        assert not routing_core.is_routed(host)
+        assert "server {" in host
+
+    def test_files_mode_never_routes(self):
+        host = NginxManager().render_config("app.example.com", "10.0.0.1", 8080)
+        assert not routing_core.is_routed(host)
+
+    def test_routes_file(self):
+        nginx = self._manager()
+        content = nginx.render_routes({
+            "a.example.com": {"forward_scheme": "http", "hsts_max_age": 31536000},
+            "b.example.com": {"forward_scheme": "https", "hsts_max_age": 600},
+        })
+        assert f"include {nginx.upstream_path('a.example.com')};" in content
+        assert "    a.example.com nrp_a.example.com;" in content
+        assert "    b.example.com https;" in content
+        assert '    b.example.com "max-age=600; includeSubDomains; preload";' in content
+        assert "    a.example.com https;" not in content
+        assert "proxy_pass $nrp_scheme://$nrp_upstream;" in content
+        assert "ssl_certificate /etc/letsencrypt/live/$ssl_server_name/fullchain.pem;" in content
+        # Port 80 is served by the shared redirect server
+        assert content.count("        b.example.com\n") == 1
+        assert "listen 80;" not in content
+        assert nginx.render_routes({}) is None
@@ -0,0 +1,413 @@
+"""
+Unit tests for staged NGINX config transactions
+"""
+import pytest
+from nrp.core.nginx import NginxManager, ConfigTransaction
+from nrp.core.registry import HostRegistry
+from nrp.core import limits as limits_core
+from nrp.core import tuning as tuning_core
+
+
+@pytest.fixture
+def nginx(tmp_path, monkeypatch):
+    manager = NginxManager()
+    manager.conf_dir = tmp_path / "conf.d"
+    manager.conf_dir.mkdir()
+    manager.main_conf = tmp_path / "nginx.conf"
+    manager.upstream_dir = tmp_path / "upstreams"
+    manager.snippet_dir = tmp_path / "snippets"
+    manager.registry = HostRegistry(tmp_path / "hosts.db")
+    manager.test_result = True
+    manager.reloads = 0
+
+    def fake_reload():
+        manager.reloads += 1
+        return True
+
+    monkeypatch.setattr(manager, "test_config", lambda: manager.test_result)
+    monkeypatch.setattr(manager, "reload", fake_reload)
+    # Certificates and certbot includes of rendered hosts live outside tmp_path
+    lint_config = manager.lint_config
+    monkeypatch.setattr(
+        manager, "lint_config", lambda files, changed, exists: lint_config(files, changed, lambda path: True)
+    )
+    return manager
+
+
+# Host file as written by nrp 2.0 (nginx_standard.conf.j2, no nrp-host header)
+BASELINE_HOST = """# NGINX Reverse Proxy Configuration for old.example.com
+# Generated by NRP v2.0
+
+server {
+    listen 80;
+    server_name old.example.com;
+
+    # Weiterleitung zum verschlüsselten https Port
+    return 301 https://$host$request_uri;
+}
+
+server {
+    listen 443 ssl;
+    server_name old.example.com;
+
+    ssl_certificate /etc/letsencrypt/live/old.example.com/fullchain.pem;
+    ssl_certificate_key /etc/letsencrypt/live/old.example.com/privkey.pem;
+    include /etc/letsencrypt/options-ssl-nginx.conf;
+    ssl_dhparam /etc/letsencrypt/ssl-dhparams.pem;
+
+    add_header Strict-Transport-Security "max-age=63072000; includeSubDomains; preload" always;
+
+    client_max_body_size 50M;
+
+    # Coraza WAF mit globalem Regelwerk (OWASP Core Rule Set)
+    coraza on;
+    coraza_rules_file /etc/nginx/coraza/main.conf;
+    location / {
+        proxy_pass https://192.168.1.20:8443/;
+
+        add_header Strict-Transport-Security "max-age=63072000; includeSubDomains; preload" always;
+
+        proxy_set_header Host $host;
+        # Websocket Header (disabled)
+        # proxy_set_header Upgrade $http_upgrade;
+        # proxy_set_header Connection $http_connection;
+        # proxy_http_version 1.1;
+    }
+}
+"""
+
+
+def _transaction(nginx, tmp_path):
+    return ConfigTransaction(nginx, staging_dir=tmp_path / "staging")
+
+
+class TestConfigTransaction:
+    """Tests for ConfigTransaction"""
+
+    def test_commit_swaps_in_and_reloads_once(self, nginx, tmp_path):
+        old = nginx.config_path("old.example.com")
+        old.write_text("old")
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), "a")
+            tx.write(nginx.config_path("b.example.com"), "b")
+            tx.remove(old)
+            assert tx.commit() is True
+
+        assert nginx.config_path("a.example.com").read_text() == "a"
+        assert nginx.config_path("b.example.com").read_text() == "b"
+        assert not old.exists()
+        assert nginx.reloads == 1
+        assert list((tmp_path / "staging").iterdir()) == []
+
+    def test_failed_validation_rolls_back(self, nginx, tmp_path):
+        existing = nginx.config_path("a.example.com")
+        existing.write_text("working")
+        kept = nginx.config_path("b.example.com")
+        kept.write_text("keep")
+        nginx.test_result = False
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(existing, "broken")
+            tx.write(nginx.config_path("new.example.com"), "new")
+            tx.remove(kept)
+            assert tx.commit() is False
+
+        assert existing.read_text() == "working"
+        assert kept.read_text() == "keep"
+        assert not nginx.config_path("new.example.com").exists()
+        assert nginx.reloads == 0
+
+    def test_failed_check_skips_nginx_test(self, nginx, tmp_path, monkeypatch):
+        existing = nginx.config_path("a.example.com")
+        existing.write_text("server {\n}\n")
+        tests = []
+        monkeypatch.setattr(nginx, "test_config", lambda: tests.append(1) or True)
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(existing, "server {\n")
+            assert tx.commit() is False
+
+        assert existing.read_text() == "server {\n}\n"
+        assert tests == []
+        assert nginx.reloads == 0
+
+    def test_uncommitted_changes_are_discarded(self, nginx, tmp_path):
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), "a")
+        assert not nginx.config_path("a.example.com").exists()
+
+    def test_unchanged_content_skips_test_and_reload(self, nginx, tmp_path):
+        existing = nginx.config_path("a.example.com")
+        existing.write_text("same")
+        nginx.test_result = False  # would fail if nginx -t ran
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(existing, "same")
+            tx.remove(nginx.config_path("missing.example.com"))
+            assert tx.commit() is True
+            assert tx.targets == []
+        assert nginx.reloads == 0
+        assert existing.read_text() == "same"
+
+    def test_only_changed_files_are_swapped(self, nginx, tmp_path):
+        same = nginx.config_path("a.example.com")
+        same.write_text("a")
+        inode = same.stat().st_ino
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(same, "a")
+            tx.write(nginx.config_path("b.example.com"), "b")
+            assert tx.commit() is True
+            assert tx.targets == [nginx.config_path("b.example.com")]
+        assert same.stat().st_ino == inode
+        assert nginx.reloads == 1
+
+    def test_rewrite_after_staged_change_is_kept(self, nginx, tmp_path):
+        existing = nginx.config_path("a.example.com")
+        existing.write_text("old")
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(existing, "new")
+            tx.write(existing, "old")
+            assert tx.commit() is True
+        assert existing.read_text() == "old"
+
+    def test_mode_change_is_not_skipped(self, nginx, tmp_path):
+        key = tmp_path / "ticket.key"
+        key.write_bytes(b"k")
+        key.chmod(0o644)
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(key, b"k", mode=0o600)
+            assert tx.commit() is True
+        assert key.stat().st_mode & 0o777 == 0o600
+
+    def test_removing_reuseport_owner_moves_it(self, nginx, tmp_path):
+        owner = nginx.config_path("a.example.com")
+        owner.write_text("listen 443 quic reuseport;\n")
+        other = nginx.config_path("b.example.com")
+        other.write_text("listen 443 quic;\n")
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(owner)
+            assert tx.commit() is True
+        assert other.read_text() == "listen 443 quic reuseport;\n"
+
+    def test_rollback_restores_reuseport_fix(self, nginx, tmp_path):
+        other = nginx.config_path("b.example.com")
+        other.write_text("listen 443 quic;\n")
+        nginx.test_result = False
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("c.example.com"), "listen 443 quic;\n")
+            assert tx.commit() is False
+        assert other.read_text() == "listen 443 quic;\n"
+        assert not nginx.config_path("c.example.com").exists()
+
+    def test_binary_write_with_mode(self, nginx, tmp_path):
+        key = tmp_path / "tickets" / "ticket.0.key"
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(key, b"\x00" * 80, mode=0o600)
+            assert tx.commit() is True
+        assert key.read_bytes() == b"\x00" * 80
+        assert key.stat().st_mode & 0o777 == 0o600
+
+
+class TestDerivedLimits:
+    """Tests for the shared limit zones derived on commit"""
+
+    @pytest.fixture
+    def limited(self, nginx, tmp_path):
+        nginx.http_dir = tmp_path / "http.d"
+        return nginx
+
+    def _host(self, nginx, fqdn, **options):
+        return nginx.render_config(fqdn, "10.0.0.1", 8080, **options)
+
+    def test_zones_follow_hosts(self, limited, tmp_path):
+        nginx = limited
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), self._host(nginx, "a.example.com", rate_limit=10, conn_limit=5))
+            tx.write(nginx.config_path("b.example.com"), self._host(nginx, "b.example.com", rate_limit=50))
+            assert tx.commit() is True
+
+        zones = nginx.limits_conf.read_text()
+        assert "zone=nrp_req_10r:" in zones
+        assert "zone=nrp_req_50r:" in zones
+        assert "limit_conn_zone $nrp_limit_key zone=nrp_conn:" in zones
+        assert f"include {nginx.http_dir}/*.conf;" in nginx.http_include.read_text()
+        assert "a.example.com" in nginx.list_configs()
+        assert "nrp-http" not in nginx.list_configs()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("a.example.com"))
+            assert tx.commit() is True
+        zones = nginx.limits_conf.read_text()
+        assert "nrp_req_10r" not in zones
+        assert "limit_conn_zone" not in zones
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("b.example.com"))
+            assert tx.commit() is True
+        assert not nginx.limits_conf.exists()
+
+    def test_allowlist_survives_rerender(self, limited, tmp_path):
+        nginx = limited
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.limits_conf, limits_core.render(nginx.env, [], False, ["10.0.0.0/8"]))
+            tx.write(nginx.config_path("a.example.com"), self._host(nginx, "a.example.com", rate_limit=10))
+            assert tx.commit() is True
+        zones = nginx.limits_conf.read_text()
+        assert "    10.0.0.0/8 1;" in zones
+        assert "zone=nrp_req_10r:" in zones
+
+    def test_no_limits_file_without_limits(self, limited, tmp_path):
+        nginx = limited
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), self._host(nginx, "a.example.com"))
+            assert tx.commit() is True
+        assert not nginx.limits_conf.exists()
+        assert not nginx.http_include.exists()
+
+
+class TestDerivedTuning:
+    """Tests for server_names_hash sizing derived on commit"""
+
+    def test_follows_hosts_once_tuned(self, nginx, tmp_path):
+        nginx.http_dir = tmp_path / "http.d"
+        long_name = "x" * 100 + ".example.com"
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path(long_name), "server {}\n")
+            assert tx.commit() is True
+        assert not nginx.tuning_conf.exists()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.tuning_conf, tuning_core.render_http(nginx.env, []))
+            assert tx.commit() is True
+        assert "server_names_hash_bucket_size 128;" in nginx.tuning_conf.read_text()
+        assert nginx.http_include.exists()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path(long_name))
+            assert tx.commit() is True
+        assert "server_names_hash_bucket_size 64;" in nginx.tuning_conf.read_text()
+
+
+class TestDerivedRoutes:
+    """Tests for the routing file derived on commit"""
+
+    def test_routes_follow_routed_hosts(self, nginx, tmp_path):
+        nginx.routing_mode = "map"
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), nginx.render_config("a.example.com", "10.0.0.1", 80))
+            tx.write(nginx.config_path("b.example.com"), nginx.render_config("b.example.com", "10.0.0.2", 80))
+            tx.write(nginx.config_path("waf.example.com"), nginx.render_config("waf.example.com", "10.0.0.3", 80, waf_enabled=True))
+            assert tx.commit() is True
+
+        routes = nginx.routes_conf.read_text()
+        assert "    a.example.com nrp_a.example.com;" in routes
+        assert "    b.example.com nrp_b.example.com;" in routes
+        assert "waf.example.com" not in routes
+        assert "nrp-routes" not in nginx.list_configs()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("a.example.com"))
+            assert tx.commit() is True
+        assert "a.example.com" not in nginx.routes_conf.read_text()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("b.example.com"))
+            assert tx.commit() is True
+        assert not nginx.routes_conf.exists()
+
+    def test_routes_release_map_hash_of_nginx_conf(self, nginx, tmp_path):
+        nginx.routing_mode = "map"
+        nginx.main_conf.write_text("http {\n    map_hash_bucket_size 128;\n    include conf.d/*.conf;\n}\n")
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), nginx.render_config("a.example.com", "10.0.0.1", 80))
+            assert tx.commit() is True
+
+        assert "map_hash_bucket_size" in nginx.routes_conf.read_text()
+        assert nginx.main_conf.read_text() == (
+            "http {\n    # map_hash_bucket_size 128;  # nrp tune: conf.d/nrp-routes.conf\n"
+            "    include conf.d/*.conf;\n}\n"
+        )
+
+
+class TestDerivedRedirects:
+    """Tests for the shared port-80 server and snippets derived on commit"""
+
+    def test_redirects_and_snippets_follow_hosts(self, nginx, tmp_path):
+        old_snippet = nginx.snippet_dir / "nrp-proxy-v0.conf"
+        old_snippet.parent.mkdir()
+        old_snippet.write_text("# old\n")
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("a.example.com"), nginx.render_config("a.example.com", "10.0.0.1", 80))
+            tx.write(nginx.config_path("b.example.com"), nginx.render_config("b.example.com", "10.0.0.2", 80, external_port=8443))
+            assert tx.commit() is True
+
+        redirects = nginx.redirect_conf.read_text()
+        assert "        a.example.com\n" in redirects
+        assert "b.example.com" not in redirects
+        assert f"include {nginx.snippet_path('acme')};" in redirects
+        assert "X-Real-IP" in nginx.snippet_path("proxy").read_text()
+        assert "acme-challenge" in nginx.snippet_path("acme").read_text()
+        assert not old_snippet.exists()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("a.example.com"))
+            assert tx.commit() is True
+        assert not nginx.redirect_conf.exists()
+        assert not nginx.snippet_path("acme").exists()
+        assert nginx.snippet_path("proxy").exists()
+
+        with _transaction(nginx, tmp_path) as tx:
+            tx.remove(nginx.config_path("b.example.com"))
+            assert tx.commit() is True
+        assert list(nginx.snippet_dir.iterdir()) == []
+
+    def test_host_with_own_port_80_server_is_not_redirected(self, nginx, tmp_path):
+        legacy = nginx.render_config("old.example.com", "10.0.0.1", 80).replace(
+            "server {", "server {\n    listen 80;\n    server_name old.example.com;\n}\n\nserver {", 1
+        )
+        with _transaction(nginx, tmp_path) as tx:
+            tx.write(nginx.config_path("old.example.com"), legacy)
+            tx.write(nginx.config_path("new.example.com"), nginx.render_config("new.example.com", "10.0.0.2", 80))
+            assert tx.commit() is True
+        redirects = nginx.redirect_conf.read_text()
+        assert "new.example.com" in redirects
+        assert "old.example.com" not in redirects
+
+        # nrp migrate: re-rendering moves the legacy host into the shared server
+        with _transaction(nginx, tmp_path) as tx:
+            assert nginx.rerender_hosts(tx) == (["old.example.com"], [])
+            assert tx.commit() is True
+        assert "old.example.com" in nginx.redirect_conf.read_text()
+        assert "listen 80;" not in nginx.config_path("old.example.com").read_text()
+
+    def test_migrate_baseline_host_without_header(self, nginx, tmp_path):
+        nginx.config_path("old.example.com").write_text(BASELINE_HOST)
+        nginx.config_path("static.example.com").write_text(
+            "server {\n    listen 443 ssl;\n    server_name static.example.com;\n    root /srv/www;\n}\n"
+        )
+        assert nginx.legacy_params("old.example.com") == {
+            "internal_ip": "192.168.1.20",
+            "internal_port": 8443,
+            "external_port": 443,
+            "forward_scheme": "https",
+            "websockets_enabled": False,
+            "waf_enabled": True,
+            "client_max_body_size": "50M",
+            "hsts_max_age": 63072000,
+        }
+
+        with _transaction(nginx, tmp_path) as tx:
+            assert nginx.rerender_hosts(tx) == (["old.example.com"], ["static.example.com"])
+            assert tx.commit() is True
+        migrated = nginx.config_path("old.example.com").read_text()
+        assert "listen 80;" not in migrated
+        assert nginx.read_host("old.example.com")["waf_enabled"] is True
+        assert nginx.upstream_path("old.example.com").exists()
+        assert "old.example.com" in nginx.redirect_conf.read_text()
+        assert nginx.snippet_path("proxy").exists()
+        assert nginx.config_path("static.example.com").read_text().endswith("root /srv/www;\n}\n")
+
+        # Second run: nothing left to do
+        with _transaction(nginx, tmp_path) as tx:
+            assert nginx.rerender_hosts(tx) == ([], ["static.example.com"])
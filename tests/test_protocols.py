@@ -0,0 +1,39 @@
+"""
+Unit tests for HTTP/3 listen address handling
+"""
+from pathlib import Path
+from nrp.core import protocols
+
+
+class TestBalanceReuseport:
+    """Tests for balance_reuseport"""
+
+    def test_first_file_gets_reuseport(self):
+        files = {
+            Path("b.conf"): "    listen 443 quic;\n",
+            Path("a.conf"): "    listen 443 quic;\n",
+        }
+        changed = protocols.balance_reuseport(files)
+        assert changed == {Path("a.conf"): "    listen 443 quic reuseport;\n"}
+
+    def test_existing_owner_is_kept(self):
+        files = {
+            Path("a.conf"): "listen 443 quic;\n",
+            Path("b.conf"): "listen 443 quic reuseport;\n",
+        }
+        assert protocols.balance_reuseport(files) == {}
+
+    def test_duplicates_are_stripped_per_address(self):
+        files = {
+            Path("a.conf"): "listen 443 quic reuseport;\nlisten 8443 quic;\n",
+            Path("b.conf"): "listen 443 quic reuseport;\n",
+        }
+        changed = protocols.balance_reuseport(files)
+        assert changed == {
+            Path("a.conf"): "listen 443 quic reuseport;\nlisten 8443 quic reuseport;\n",
+            Path("b.conf"): "listen 443 quic;\n",
+        }
+
+    def test_ssl_listen_is_ignored(self):
+        files = {Path("a.conf"): "listen 443 ssl;\n"}
+        assert protocols.balance_reuseport(files) == {}
@@ -0,0 +1,120 @@
+"""
+Unit tests for the host registry
+"""
+import pytest
+from nrp.core.nginx import NginxManager, ConfigTransaction
+from nrp.core.registry import HostRegistry
+
+
+@pytest.fixture
+def nginx(tmp_path, monkeypatch):
+    manager = NginxManager()
+    manager.conf_dir = tmp_path / "conf.d"
+    manager.conf_dir.mkdir()
+    manager.upstream_dir = tmp_path / "upstreams"
+    manager.snippet_dir = tmp_path / "snippets"
+    manager.registry = HostRegistry(tmp_path / "hosts.db")
+    monkeypatch.setattr(manager, "test_config", lambda: True)
+    monkeypatch.setattr(manager, "reload", lambda: True)
+    # Certificates and certbot includes of rendered hosts live outside tmp_path
+    lint_config = manager.lint_config
+    monkeypatch.setattr(
+        manager, "lint_config", lambda files, changed, exists: lint_config(files, changed, lambda path: True)
+    )
+    return manager
+
+
+def _add(nginx, tmp_path, fqdn, *args, **options):
+    with ConfigTransaction(nginx, staging_dir=tmp_path / "staging") as tx:
+        for path, content in nginx.render_files(fqdn, *args, **options).items():
+            tx.write(path, content)
+        assert tx.commit()
+
+
+class TestHostRegistry:
+    """Tests for HostRegistry and its use by NginxManager"""
+
+    def test_reading_does_not_create_database(self, tmp_path):
+        registry = HostRegistry(tmp_path / "hosts.db")
+        assert registry.stamp() is None
+        assert registry.fqdns() == []
+        assert not (tmp_path / "hosts.db").exists()
+
+    def test_transactions_keep_registry_current(self, nginx, tmp_path):
+        _add(nginx, tmp_path, "a.example.com", "10.0.0.1", 8080, waf_enabled=True, site="home")
+        _add(nginx, tmp_path, "b.example.com", "10.0.0.2", 80)
+        assert nginx.registry_current()
+        assert nginx.list_configs() == ["a.example.com", "b.example.com"]
+
+        host = nginx.hosts(waf=True)[0]
+        assert host["fqdn"] == "a.example.com"
+        assert host["site"] == "home"
+        assert host["backends"] == [{"address": "10.0.0.1", "port": 8080}]
+        assert host["params"]["internal_port"] == 8080
+        assert [h["fqdn"] for h in nginx.hosts(site="home")] == ["a.example.com"]
+
+        with ConfigTransaction(nginx, staging_dir=tmp_path / "staging") as tx:
+            for path in nginx.host_files("a.example.com"):
+                tx.remove(path)
+            assert tx.commit()
+        assert nginx.registry_current()
+        assert nginx.registry.fqdns() == ["b.example.com"]
+        assert nginx.hosts(waf=True) == []
+
+    def test_outside_change_triggers_rebuild(self, nginx, tmp_path):
+        _add(nginx, tmp_path, "a.example.com", "10.0.0.1", 8080)
+        (nginx.conf_dir / "manual.example.com.conf").write_text(
+            "server {\n    listen 8443 ssl;\n    coraza on;\n"
+            "    ssl_certificate /etc/letsencrypt/live/manual.example.com/fullchain.pem;\n"
+            "    location / {\n        proxy_pass https://192.168.1.5:9000;\n    }\n}\n"
+        )
+        assert not nginx.registry_current()
+        assert nginx.list_configs() == ["a.example.com", "manual.example.com"]
+
+        legacy = nginx.hosts(waf=True)
+        assert nginx.registry_current()
+        assert [h["fqdn"] for h in legacy] == ["manual.example.com"]
+        assert legacy[0]["params"] is None
+        assert legacy[0]["external_port"] == 8443
+        assert legacy[0]["forward_scheme"] == "https"
+        assert legacy[0]["backends"] == [{"address": "192.168.1.5", "port": 9000}]
+        assert legacy[0]["cert"] == "/etc/letsencrypt/live/manual.example.com"
+
+    def test_in_place_edit_triggers_rebuild(self, nginx, tmp_path):
+        _add(nginx, tmp_path, "a.example.com", "10.0.0.1", 8080)
+        config = nginx.config_path("a.example.com")
+        directory_mtime = nginx.conf_dir.stat().st_mtime_ns
+        with config.open("a") as handle:
+            handle.write("# edited\n")
+        assert nginx.conf_dir.stat().st_mtime_ns == directory_mtime
+        assert not nginx.registry_current()
+        nginx.hosts()
+        assert nginx.registry_current()
+
+    def test_unwritable_registry_answers_from_files(self, nginx, tmp_path):
+        _add(nginx, tmp_path, "a.example.com", "10.0.0.1", 8080)
+        blocker = tmp_path / "blocker"
+        blocker.write_text("")
+        nginx.registry = HostRegistry(blocker / "hosts.db")
+        assert [h["fqdn"] for h in nginx.hosts()] == ["a.example.com"]
+
+    def test_backend_and_site_filters(self, nginx, tmp_path):
+        _add(nginx, tmp_path, "a.example.com", "10.240.12.10", 8080, site="home")
+        _add(nginx, tmp_path, "b.example.com", "192.168.1.20", 80)
+        _add(nginx, tmp_path, "c.example.com", "192.168.2.5", 80, external_port=8443, waf_enabled=True)
+        (nginx.conf_dir / "legacy.example.com.conf").write_text(
+            "server {\n    location / {\n        proxy_pass http://app.internal:80;\n    }\n}\n"
+        )
+
+        def fqdns(**filters):
+            return [host["fqdn"] for host in nginx.hosts(**filters)]
+
+        assert fqdns(backend="192.168.1.20") == ["b.example.com"]
+        assert fqdns(backend="192.168.0.0/16") == ["b.example.com", "c.example.com"]
+        assert fqdns(backend="app.internal") == ["legacy.example.com"]
+        assert fqdns(backend="192.168.0.0/16", waf=True, external_port=8443) == ["c.example.com"]
+        # Recorded site or backend inside the site's overlay subnet / LAN
+        assert fqdns(site="home", site_networks=["10.240.12.0/29", "192.168.1.0/24"]) == [
+            "a.example.com", "b.example.com"
+        ]
+        assert fqdns(site="home") == ["a.example.com"]
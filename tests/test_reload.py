@@ -0,0 +1,62 @@
+"""
+Unit tests for reload coalescing
+"""
+import threading
+import time
+from nrp.core.reload import ReloadScheduler
+
+
+def _scheduler(tmp_path, reload_func, window=0.0):
+    return ReloadScheduler(
+        reload_func,
+        window=window,
+        lock_path=tmp_path / "reload.lock",
+        state_path=tmp_path / "reload.json"
+    )
+
+
+class TestReloadScheduler:
+    """Tests for ReloadScheduler"""
+
+    def test_sequential_requests_each_reload(self, tmp_path):
+        calls = []
+        scheduler = _scheduler(tmp_path, lambda: calls.append(1) or True)
+        assert scheduler.request() is True
+        assert scheduler.request() is True
+        assert len(calls) == 2
+        stats = scheduler.stats()
+        assert stats["requested"] == 2
+        assert stats["performed"] == 2
+
+    def test_concurrent_requests_are_coalesced(self, tmp_path):
+        calls = []
+
+        def slow_reload():
+            calls.append(1)
+            time.sleep(0.05)
+            return True
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(_scheduler(tmp_path, slow_reload, window=0.2).request())
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = _scheduler(tmp_path, slow_reload).stats()
+        assert results == [True] * 5
+        assert stats["requested"] == 5
+        assert stats["performed"] == len(calls) < 5
+        assert stats["coalesced"] == 5 - len(calls)
+
+    def test_failed_reload_is_not_counted_as_performed(self, tmp_path):
+        scheduler = _scheduler(tmp_path, lambda: False)
+        assert scheduler.request() is False
+        stats = scheduler.stats()
+        assert stats["performed"] == 0
+        assert stats["failed"] == 1
@@ -0,0 +1,49 @@
+"""
+Unit tests for static asset offload
+"""
+import os
+import pytest
+from nrp.core import static as static_core
+
+
+class TestParseStatic:
+    """Tests for parse_static"""
+
+    def test_prefix_and_directory(self):
+        assert static_core.parse_static("/assets=/srv/app/dist/", "app.example.com") == ("/assets/", "/srv/app/dist")
+
+    def test_default_directory(self):
+        prefix, directory = static_core.parse_static("/static/img/", "app.example.com")
+        assert prefix == "/static/img/"
+        assert directory.endswith("/app.example.com/static-img")
+
+    @pytest.mark.parametrize("value", ["assets=/srv", "/=/srv", "/assets/=relative/dir"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            static_core.parse_static(value, "app.example.com")
+
+
+class TestSync:
+    """Tests for sync"""
+
+    def test_copy_skip_and_delete(self, tmp_path):
+        src = tmp_path / "src"
+        dest = tmp_path / "dest"
+        (src / "js").mkdir(parents=True)
+        (src / "js" / "app.js").write_text("console.log(1)")
+        (src / "index.css").write_text("body{}")
+
+        assert static_core.sync(src, dest) == {"copied": 2, "unchanged": 0, "deleted": 0}
+        assert (dest / "js" / "app.js").read_text() == "console.log(1)"
+
+        (src / "index.css").unlink()
+        stats = static_core.sync(src, dest, delete=True)
+        assert stats == {"copied": 0, "unchanged": 1, "deleted": 1}
+        assert not (dest / "index.css").exists()
+        assert not any(name.endswith(".nrp-tmp") for _, _, files in os.walk(dest) for name in files)
+
+    def test_resolve_target(self):
+        locations = {"/assets/": "/srv/a", "/media/": "/srv/m"}
+        with pytest.raises(ValueError):
+            static_core.resolve_target(locations, None)
+        assert static_core.resolve_target(locations, "media")[1].name == "m"
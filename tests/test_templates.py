@@ -0,0 +1,78 @@
+"""
+Unit tests for the shared template environment and batch rendering
+"""
+from nrp.core import templates
+from nrp.core.nginx import NginxManager
+from nrp.config import TEMPLATE_DIR
+
+
+class TestEnvironment:
+    """Tests for the shared environment and bytecode cache"""
+
+    def test_shared_between_managers(self):
+        assert NginxManager().env is NginxManager().env
+
+    def test_bytecode_cache_written_and_reused(self, tmp_path):
+        env = templates.environment(str(TEMPLATE_DIR), str(tmp_path))
+        rendered = env.get_template("upstream.conf.j2").render(
+            header="", fqdn="a", upstream_name="nrp_a", backends=[], keepalive=0
+        )
+        assert len(list(tmp_path.glob("nrp-*.cache"))) == 1
+
+        templates._environment.cache_clear()
+        env = templates.environment(str(TEMPLATE_DIR), str(tmp_path))
+        source, filename, _ = env.loader.get_source(env, "upstream.conf.j2")
+        assert env.bytecode_cache.get_bucket(env, "upstream.conf.j2", filename, source).code is not None
+        assert env.get_template("upstream.conf.j2").render(
+            header="", fqdn="a", upstream_name="nrp_a", backends=[], keepalive=0
+        ) == rendered
+
+    def test_changed_source_invalidates(self, tmp_path):
+        cache = templates.bytecode_cache(tmp_path / "cache")
+        env = templates.environment(str(TEMPLATE_DIR), str(tmp_path / "cache"))
+        env.get_template("upstream.conf.j2")
+        _, filename, _ = env.loader.get_source(env, "upstream.conf.j2")
+        assert cache.get_bucket(env, "upstream.conf.j2", filename, "source").code is None
+
+    def test_default_cache_dir_resolved_per_call(self, template_cache):
+        env = NginxManager().env
+        env.get_template("upstream.conf.j2")
+        assert env.bytecode_cache.directory == str(template_cache)
+        assert len(list(template_cache.glob("nrp-*.cache"))) == 1
+
+    def test_prune_keeps_newest_entries(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(templates, "MAX_CACHE_ENTRIES", 3)
+        env = templates.environment(str(TEMPLATE_DIR), str(tmp_path / "cache"))
+        names = sorted(env.list_templates())[:5]
+        for name in names:
+            env.get_template(name)
+        assert len(list((tmp_path / "cache").glob("nrp-*.cache"))) == 3
+
+    def test_unwritable_cache_is_ignored(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        assert templates.bytecode_cache(blocker / "cache") is None
+        env = templates.environment(str(TEMPLATE_DIR), str(blocker / "cache"))
+        assert env.get_template("nrp-http.conf.j2").render(http_dir="/x") == "# NRP http-Kontext: gemeinsame Includes (Limits, Tuning, ...)\n# Generated by NRP\ninclude /x/*.conf;\n"
+
+
+class TestRenderMany:
+    """Tests for batch rendering"""
+
+    def test_matches_single_renders(self):
+        nginx = NginxManager()
+        specs = [
+            {"fqdn": "a.example.com", "internal_ip": "10.0.0.1", "internal_port": 80},
+            {"fqdn": "b.example.com", "internal_ip": "10.0.0.2", "internal_port": 8080, "waf_enabled": True},
+        ]
+        rendered = nginx.render_many(specs)
+        for spec in specs:
+            assert rendered[spec["fqdn"]] == nginx.render_files(**spec)
+
+    def test_quic_owner_read_once(self, tmp_path):
+        nginx = NginxManager()
+        nginx.conf_dir = tmp_path
+        (tmp_path / "owner.example.com.conf").write_text("listen 443 quic reuseport;\n")
+        rendered = nginx.render_many([{"fqdn": "a.example.com", "internal_ip": "10.0.0.1", "internal_port": 80, "http3": True}])
+        host = rendered["a.example.com"][nginx.config_path("a.example.com")]
+        assert "listen 443 quic;" in host
@@ -0,0 +1,58 @@
+"""
+Unit tests for the shared TLS profile
+"""
+import pytest
+from nrp.core import tls as tls_core
+from nrp.core.nginx import NginxManager
+from nrp.config import LETSENCRYPT_OPTIONS_SSL, TLS_SNIPPET, TLS_TICKET_KEYS
+
+
+class TestTLSProfile:
+    """Tests for snippet rendering, include switching and ticket keys"""
+
+    def test_render_balanced(self):
+        snippet = tls_core.render_snippet(NginxManager().env, "balanced")
+        assert snippet.startswith("# nrp-tls-profile: balanced\n")
+        assert "ssl_session_cache shared:nrp_tls:50m;" in snippet
+        assert "ssl_session_tickets on;" in snippet
+        assert snippet.count("ssl_session_ticket_key ") == TLS_TICKET_KEYS
+        assert "ssl_session_ticket_key /etc/nginx/nrp/tickets/ticket.0.key;" in snippet
+        assert "ssl_buffer_size 4k;" in snippet
+
+    def test_render_strict_without_tickets(self):
+        snippet = tls_core.render_snippet(NginxManager().env, "strict")
+        assert "ssl_session_tickets off;" in snippet
+        assert "ssl_session_ticket_key" not in snippet
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError):
+            tls_core.render_snippet(NginxManager().env, "fast")
+
+    def test_switch_include_roundtrip(self):
+        content = f"    include {LETSENCRYPT_OPTIONS_SSL};\n    ssl_dhparam x;\n"
+        switched = tls_core.switch_include(content, TLS_SNIPPET)
+        assert switched == f"    include {TLS_SNIPPET};\n    ssl_dhparam x;\n"
+        assert tls_core.switch_include(switched, LETSENCRYPT_OPTIONS_SSL) == content
+
+    def test_rotation_shifts_keys(self):
+        old = [b"a" * 80, b"b" * 80, b"c" * 80]
+        keys = tls_core.rotated_ticket_keys(old)
+        assert len(keys) == TLS_TICKET_KEYS
+        assert all(len(key) == tls_core.TICKET_KEY_SIZE for key in keys)
+        assert keys[0] not in old
+        assert keys[1:] == old[:TLS_TICKET_KEYS - 1]
+
+    def test_rotation_fills_missing_keys(self):
+        keys = tls_core.rotated_ticket_keys([None] * TLS_TICKET_KEYS)
+        assert len(set(keys)) == TLS_TICKET_KEYS
+
+    def test_host_uses_snippet_when_active(self, tmp_path, monkeypatch):
+        snippet = tmp_path / "tls.conf"
+        monkeypatch.setattr(tls_core, "TLS_SNIPPET", snippet)
+        host = NginxManager().render_config("app.example.com", "10.0.0.1", 8080)
+        assert f"include {LETSENCRYPT_OPTIONS_SSL};" in host
+
+        snippet.write_text("# nrp-tls-profile: balanced\n")
+        host = NginxManager().render_config("app.example.com", "10.0.0.1", 8080)
+        assert f"include {snippet};" in host
+        assert tls_core.active_profile() == "balanced"
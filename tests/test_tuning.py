@@ -0,0 +1,110 @@
+"""
+Unit tests for worker and OS limit sizing
+"""
+import re
+
+from nrp.core import templates
+from nrp.core import tuning as tuning_core
+
+GIB = 1024 ** 3
+
+DEBIAN_NGINX_CONF = """user www-data;
+worker_processes auto;
+pid /run/nginx.pid;
+include /etc/nginx/modules-enabled/*.conf;
+
+events {
+\tworker_connections 768;
+\t# multi_accept on;
+}
+
+http {
+\t# server_names_hash_bucket_size 64;
+}
+"""
+
+
+class TestRecommend:
+    """Tests for recommend"""
+
+    def test_scales_with_memory_and_cpus(self):
+        small = tuning_core.recommend(2, 2 * GIB, [])
+        large = tuning_core.recommend(2, 16 * GIB, [])
+        assert small["worker_processes"] == 2
+        assert large["worker_connections"] > small["worker_connections"]
+        assert large["max_clients"] == 2 * large["worker_connections"] // 2
+        assert large["worker_rlimit_nofile"] == 2 * large["worker_connections"]
+
+    def test_waf_and_caches_reduce_connections(self):
+        plain = tuning_core.recommend(4, 4 * GIB, [])
+        waf = tuning_core.recommend(4, 4 * GIB, [], waf_hosts=1)
+        cached = tuning_core.recommend(4, 4 * GIB, [], cache_zone_bytes=GIB)
+        assert waf["worker_connections"] < plain["worker_connections"]
+        assert cached["worker_connections"] < plain["worker_connections"]
+        assert cached["worker_rlimit_nofile"] > 2 * cached["worker_connections"]
+
+    def test_limits(self):
+        assert tuning_core.recommend(64, 256 * 1024 ** 2, [])["worker_connections"] == tuning_core.MIN_WORKER_CONNECTIONS
+        huge = tuning_core.recommend(1, 1024 * GIB, [])
+        assert huge["worker_connections"] == tuning_core.MAX_WORKER_CONNECTIONS
+        assert huge["somaxconn"] == tuning_core.MAX_SOMAXCONN
+        assert tuning_core.recommend(2, None, [])["worker_connections"] == tuning_core.DEFAULT_WORKER_CONNECTIONS
+
+    def test_server_names_hash_follows_hosts(self):
+        few = tuning_core.server_names_hash(["a.example.com"])
+        assert few == {"server_names_hash_bucket_size": 64, "server_names_hash_max_size": 512}
+        many = tuning_core.server_names_hash([f"{'x' * 60}-{i}.example.com" for i in range(1000)])
+        assert many == {"server_names_hash_bucket_size": 128, "server_names_hash_max_size": 2048}
+
+
+class TestMainConf:
+    """Tests for nginx.conf and catch-all editing"""
+
+    def test_tune_main(self):
+        settings = tuning_core.recommend(4, 8 * GIB, [])
+        content = tuning_core.tune_main(DEBIAN_NGINX_CONF, settings)
+        assert tuning_core.read_main(content) == {
+            "worker_processes": "4",
+            "worker_rlimit_nofile": str(settings["worker_rlimit_nofile"]),
+            "worker_connections": str(settings["worker_connections"]),
+            "multi_accept": "on",
+        }
+        assert content.index("worker_rlimit_nofile") < content.index("pid /run/nginx.pid;")
+        assert "\tmulti_accept on;  # nrp tune" in content
+        # Idempotent
+        assert tuning_core.tune_main(content, settings) == content
+
+    def test_adds_missing_directives_to_events(self):
+        settings = tuning_core.recommend(2, 2 * GIB, [])
+        content = tuning_core.tune_main("events {\n}\n", settings)
+        assert tuning_core.read_main(content)["worker_connections"] == str(settings["worker_connections"])
+        assert content.index("worker_connections") > content.index("events {")
+
+    def test_release_http_directives_of_nginx_conf(self):
+        content = DEBIAN_NGINX_CONF.replace(
+            "\t# server_names_hash_bucket_size 64;", "\tserver_names_hash_bucket_size 64; # distro default"
+        )
+        assert tuning_core.read_http(content) == {"server_names_hash_bucket_size": "64"}
+        released, lines = tuning_core.release_http(content)
+        assert lines == ["server_names_hash_bucket_size 64;"]
+        assert tuning_core.read_http(released) == {}
+        assert "\t# server_names_hash_bucket_size 64;  # nrp tune: http.d/tuning.conf" in released
+        # Commented-out directives stay untouched
+        assert tuning_core.release_http(released) == (released, [])
+        assert tuning_core.release_http(DEBIAN_NGINX_CONF) == (DEBIAN_NGINX_CONF, [])
+
+    def test_backlog(self):
+        content = "    listen 80 default_server;\n    listen [::]:443 ssl default_server;\n"
+        content = tuning_core.set_backlog(content, 8192)
+        assert "listen 80 default_server backlog=8192;" in content
+        assert "listen [::]:443 ssl default_server backlog=8192;" in content
+        assert tuning_core.read_backlog(content) == 8192
+        assert tuning_core.set_backlog(content, 4096).count("backlog=4096") == 2
+
+    def test_sysctl_port_range_keeps_registered_ports(self):
+        content = tuning_core.render_sysctl(templates.environment(), {
+            "backlog": 8192, "somaxconn": 8192, "tcp_max_syn_backlog": 8192,
+        })
+        low, high = re.search(r"^net\.ipv4\.ip_local_port_range = (\d+) (\d+)$", content, re.MULTILINE).groups()
+        assert int(low) > 5432
+        assert int(high) == 65535